@@ -48,6 +48,7 @@ CONSOLE_SCRIPTS = [
     "veros-copy-setup = veros.cli.veros_copy_setup:cli",
     "veros-resubmit = veros.cli.veros_resubmit:cli",
     "veros-create-mask = veros.cli.veros_create_mask:cli",
+    "veros-repartition-restart = veros.cli.veros_repartition_restart:cli",
 ]
 
 PACKAGE_DATA = ["setups/*/assets.json", "setups/*/*.npy", "setups/*/*.png"]
@@ -83,6 +84,7 @@ for line in jax_req:  # inject jaxlib requirement
 EXTRAS_REQUIRE = {
     "test": ["pytest", "pytest-cov", "pytest-forked", "xarray"],
     "jax": jax_req,
+    "zarr": ["zarr<3"],
 }
 
 
@@ -97,3 +97,30 @@ def test_import_isolation(tmpdir):
 
     # make sure using the CLI does not initialize MPI
     assert "mpi4py" not in imported_modules
+
+
+def test_veros_repartition_restart(runner, tmpdir):
+    import h5py
+    import numpy as np
+    from veros.setups.acc import ACCSetup
+
+    os.chdir(tmpdir)
+
+    sim = ACCSetup(override=dict(identifier="acc", runlen=86400 / 2, restart_output_filename="acc.restart.h5"))
+    sim.setup()
+    sim.run()
+
+    nx, ny, nz = (sim.state.dimensions[dim] for dim in ("xt", "yt", "zt"))
+
+    result = runner.invoke(
+        veros.cli.veros_repartition_restart.cli, ["acc.restart.h5", "acc.restart.2x2.h5", "--num-proc", "2", "2"]
+    )
+    assert result.exit_code == 0, result.output
+
+    with h5py.File("acc.restart.h5", "r") as src, h5py.File("acc.restart.2x2.h5", "r") as dest:
+        assert set(src["core"].keys()) == set(dest["core"].keys())
+        assert dest["core"]["temp"].chunks == (nx // 2, ny // 2, nz, 3)
+        assert dest["core"]["psi"].chunks == (nx // 2, ny // 2, 3)
+
+        for key, var in src["core"].items():
+            np.testing.assert_array_equal(dest["core"][key][...], var[...], err_msg=key)
@@ -28,6 +28,20 @@ def pytest_generate_tests(metafunc):
         metafunc.parametrize("pyom2_lib", [option_value])
 
 
+@pytest.fixture
+def io_threads():
+    from veros import runtime_settings
+
+    def set_io_threads(val, queue_size=8):
+        object.__setattr__(runtime_settings, "use_io_threads", val)
+        object.__setattr__(runtime_settings, "io_queue_size", queue_size)
+
+    try:
+        yield set_io_threads
+    finally:
+        set_io_threads(False)
+
+
 @pytest.fixture(autouse=True)
 def set_random_seed():
     import numpy as np
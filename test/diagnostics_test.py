@@ -0,0 +1,544 @@
+import os
+
+import pytest
+import numpy as np
+
+from veros import runtime_settings, veros_routine
+from veros.variables import get_fill_value
+from veros.setups.acc import ACCSetup
+
+
+class OutputSetup(ACCSetup):
+    output_format = "netcdf"
+
+    @veros_routine
+    def set_diagnostics(self, state):
+        settings = state.settings
+        diagnostics = state.diagnostics
+
+        for diag in diagnostics.values():
+            diag.output_format = self.output_format
+
+        diagnostics["snapshot"].output_frequency = settings.dt_tracer
+        diagnostics["averages"].output_variables = ["temp", "salt", "u", "v", "psi"]
+        diagnostics["averages"].sampling_frequency = settings.dt_tracer
+        diagnostics["averages"].output_frequency = 2 * settings.dt_tracer
+        diagnostics["tracer_monitor"].output_frequency = settings.dt_tracer
+
+
+def _run_setup(identifier, output_format="netcdf"):
+    sim = OutputSetup(override=dict(identifier=identifier, restart_output_filename=None))
+    sim.output_format = output_format
+    sim.setup()
+
+    with sim.state.settings.unlock():
+        sim.state.settings.runlen = sim.state.settings.dt_tracer * 5
+
+    sim.run()
+    return sim
+
+
+def _read_output(filename):
+    import h5netcdf
+
+    with h5netcdf.File(filename, "r") as f:
+        return {key: np.array(var) for key, var in f.variables.items()}
+
+
+def test_async_output(tmpdir, io_threads):
+    os.chdir(tmpdir)
+
+    _run_setup("sync")
+
+    io_threads(True, queue_size=1)
+    _run_setup("async")
+
+    for diag in ("snapshot", "averages"):
+        sync_output = _read_output(f"sync.{diag}.nc")
+        async_output = _read_output(f"async.{diag}.nc")
+
+        assert sync_output.keys() == async_output.keys()
+        assert len(sync_output["Time"]) > 1
+
+        for key in sync_output:
+            np.testing.assert_array_equal(async_output[key], sync_output[key], err_msg=key)
+
+
+@pytest.mark.parametrize("use_io_threads", [False, True])
+def test_keep_files_open(tmpdir, io_threads, use_io_threads):
+    os.chdir(tmpdir)
+
+    _run_setup("reopen")
+
+    def set_setting(name, val):
+        object.__setattr__(runtime_settings, name, val)
+
+    io_threads(use_io_threads)
+    set_setting("io_keep_files_open", True)
+    set_setting("io_time_chunk_size", 4)
+    set_setting("io_flush_interval", 2)
+
+    try:
+        _run_setup("cached")
+    finally:
+        set_setting("io_keep_files_open", False)
+
+    for diag in ("snapshot", "averages"):
+        expected_output = _read_output(f"reopen.{diag}.nc")
+        cached_output = _read_output(f"cached.{diag}.nc")
+
+        # records that were allocated in advance are removed on close
+        assert len(cached_output["Time"]) == len(expected_output["Time"])
+
+        for key in expected_output:
+            np.testing.assert_array_equal(cached_output[key], expected_output[key], err_msg=key)
+
+
+@pytest.mark.parametrize("keep_files_open", [False, True])
+def test_zarr_output(tmpdir, keep_files_open):
+    zarr = pytest.importorskip("zarr")
+    os.chdir(tmpdir)
+
+    _run_setup("netcdf")
+
+    object.__setattr__(runtime_settings, "io_keep_files_open", keep_files_open)
+    try:
+        _run_setup("zarr", output_format="zarr")
+    finally:
+        object.__setattr__(runtime_settings, "io_keep_files_open", False)
+
+    for diag in ("snapshot", "averages"):
+        nc_output = _read_output(f"netcdf.{diag}.nc")
+        zarr_output = zarr.open_group(f"zarr.{diag}.zarr", mode="r")
+
+        assert set(nc_output.keys()) == set(zarr_output.array_keys())
+
+        for key, nc_var in nc_output.items():
+            zarr_var = zarr_output[key]
+            np.testing.assert_array_equal(zarr_var[...], nc_var, err_msg=key)
+            assert zarr_var.attrs["_ARRAY_DIMENSIONS"], key
+
+
+@pytest.mark.parametrize("output_format", ["netcdf", "zarr"])
+def test_output_specs(tmpdir, output_format):
+    from veros.diagnostics import OutputSpec
+
+    if output_format == "zarr":
+        zarr = pytest.importorskip("zarr")
+
+    os.chdir(tmpdir)
+
+    coarse = OutputSpec("coarse", coarsen=(2, 3), region=(4, 20, 6, 36), levels=[0, -1])
+    surface = OutputSpec("surface", levels=[-1])
+
+    class ReducedOutputSetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+            state.diagnostics["snapshot"].output_specs = {"temp": coarse, "u": coarse, "ht": coarse}
+            state.diagnostics["averages"].output_specs = {"temp": coarse, "salt": surface}
+
+    _run_setup("full")
+
+    sim = ReducedOutputSetup(override=dict(identifier="reduced", restart_output_filename=None))
+    sim.output_format = output_format
+    sim.setup()
+
+    with sim.state.settings.unlock():
+        sim.state.settings.runlen = sim.state.settings.dt_tracer * 5
+
+    sim.run()
+
+    def block_mean(arr, fill_value):
+        # arr has shape (..., y, x)
+        arr = arr[..., 6:36, 4:20]
+        blocks = arr.reshape(*arr.shape[:-2], 10, 3, 8, 2)
+        valid = blocks != fill_value
+        count = valid.sum(axis=(-1, -3))
+        mean = np.where(valid, blocks, 0).sum(axis=(-1, -3)) / np.maximum(count, 1)
+        return np.where(count > 0, mean, fill_value)
+
+    for diag in ("snapshot", "averages"):
+        full = _read_output(f"full.{diag}.nc")
+
+        if output_format == "zarr":
+            store = zarr.open_group(f"reduced.{diag}.zarr", mode="r")
+            reduced = {key: store[key][...] for key in store.array_keys()}
+            reduced_dims = {key: tuple(store[key].attrs["_ARRAY_DIMENSIONS"]) for key in store.array_keys()}
+        else:
+            import h5netcdf
+
+            reduced = _read_output(f"reduced.{diag}.nc")
+            with h5netcdf.File(f"reduced.{diag}.nc", "r") as f:
+                reduced_dims = {key: var.dimensions for key, var in f.variables.items()}
+
+        assert reduced_dims["temp"] == ("Time", "zt_coarse", "yt_coarse", "xt_coarse")
+        np.testing.assert_allclose(reduced["xt_coarse"], full["xt"][4:20].reshape(8, 2).mean(axis=1))
+        np.testing.assert_allclose(reduced["yu_coarse"], full["yu"][6:36].reshape(10, 3).mean(axis=1))
+        np.testing.assert_array_equal(reduced["zw_coarse"], full["zw"][[0, -1]])
+
+        fill_value = get_fill_value(full["temp"].dtype)
+        np.testing.assert_allclose(reduced["temp"], block_mean(full["temp"][:, [0, -1]], fill_value))
+
+        if diag == "snapshot":
+            assert reduced_dims["ht"] == ("yt_coarse", "xt_coarse")
+            np.testing.assert_allclose(reduced["ht"], block_mean(full["ht"], fill_value))
+            # unaffected variables are written in full
+            np.testing.assert_array_equal(reduced["salt"], full["salt"])
+        else:
+            assert reduced_dims["salt"] == ("Time", "zt_surface", "yt", "xt")
+            np.testing.assert_array_equal(reduced["salt"], full["salt"][:, [-1]])
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd", "lz4"])
+def test_output_precision(tmpdir, compression):
+    import h5netcdf
+
+    if compression != "gzip":
+        pytest.importorskip("hdf5plugin")
+
+    os.chdir(tmpdir)
+
+    keepbits, tolerance = 8, 1e-3
+
+    class LossyOutputSetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+            state.diagnostics["snapshot"].output_keepbits = {"temp": keepbits}
+            state.diagnostics["snapshot"].output_tolerance = {"u": tolerance, "ht": tolerance}
+
+    _run_setup("exact")
+
+    object.__setattr__(runtime_settings, "output_compression", compression)
+    try:
+        sim = LossyOutputSetup(override=dict(identifier="lossy", restart_output_filename=None))
+        sim.setup()
+
+        with sim.state.settings.unlock():
+            sim.state.settings.runlen = sim.state.settings.dt_tracer * 5
+
+        sim.run()
+    finally:
+        object.__setattr__(runtime_settings, "output_compression", "gzip")
+
+    exact = _read_output("exact.snapshot.nc")
+    lossy = _read_output("lossy.snapshot.nc")
+
+    # fill values are preserved
+    fill_value = get_fill_value(exact["temp"].dtype)
+    np.testing.assert_array_equal(lossy["temp"] == fill_value, exact["temp"] == fill_value)
+
+    ocean = exact["temp"] != fill_value
+    np.testing.assert_array_less(
+        np.abs(lossy["temp"] - exact["temp"])[ocean], np.abs(exact["temp"][ocean]) * 2.0 ** -(keepbits + 1) + 1e-300
+    )
+
+    for key in ("u", "ht"):
+        ocean = exact[key] != fill_value
+        np.testing.assert_array_less(np.abs(lossy[key] - exact[key])[ocean], tolerance + 1e-12)
+
+    assert not np.array_equal(lossy["u"], exact["u"])
+
+    # other variables are unaffected
+    np.testing.assert_array_equal(lossy["salt"], exact["salt"])
+
+    with h5netcdf.File("lossy.snapshot.nc", "r") as f:
+        assert f.variables["temp"].attrs["bitround_keepbits"] == keepbits
+        assert f.variables["u"].attrs["quantization_tolerance"] == tolerance
+
+
+@pytest.mark.parametrize(
+    "keepbits, tolerance",
+    [({"temp": -1}, None), ({"temp": 53}, None), (None, {"u": 0}), (None, {"u": -1e-3}), ({"not_a_var": 8}, None)],
+)
+def test_output_precision_invalid(tmpdir, keepbits, tolerance):
+    os.chdir(tmpdir)
+
+    class InvalidOutputSetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+            state.diagnostics["snapshot"].output_keepbits = keepbits
+            state.diagnostics["snapshot"].output_tolerance = tolerance
+
+    sim = InvalidOutputSetup(override=dict(identifier="invalid", restart_output_filename=None))
+
+    with pytest.raises(ValueError) as excinfo:
+        sim.setup()
+
+    assert "snapshot" in str(excinfo.value)
+    assert list((keepbits or tolerance).keys())[0] in str(excinfo.value)
+
+
+def test_async_writer_error(io_threads):
+    from veros.io_tools import writer
+
+    io_threads(True)
+
+    def failing_job():
+        raise ValueError("oops")
+
+    writer.submit(failing_job)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        writer.wait()
+
+    assert isinstance(excinfo.value.__cause__, ValueError)
+
+    # writer keeps working after error has been raised
+    result = []
+    writer.submit(lambda: result.append(1))
+    writer.wait()
+    assert result == [1]
+
+
+@pytest.mark.parametrize("use_io_threads", [False, True])
+def test_averages_statistics(tmpdir, io_threads, use_io_threads):
+    from veros.io_tools.netcdf import prepare_variable_data
+
+    os.chdir(tmpdir)
+    io_threads(use_io_threads)
+
+    bin_edges = [0, 5, 10, 15, 20, 30]
+
+    class StatisticsSetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+
+            averages = state.diagnostics["averages"]
+            averages.output_variables = ["temp", "u"]
+            averages.output_statistics = {"temp": ["variance", "min", "max"]}
+            averages.covariance_variables = [("temp", "u")]
+            averages.histogram_bins = {"temp": bin_edges}
+
+    sim = StatisticsSetup(override=dict(identifier="stats", restart_output_filename=None))
+    sim.setup()
+
+    with sim.state.settings.unlock():
+        sim.state.settings.runlen = sim.state.settings.dt_tracer * 5
+
+    averages = sim.state.diagnostics["averages"]
+    samples, windows = [], []
+    diagnose, write_output = averages.diagnose, averages.write_output
+
+    def record_samples(state):
+        vs = state.variables
+        samples.append({var: np.array(getattr(vs, var)[..., vs.tau]) for var in ("temp", "u")})
+        diagnose(state)
+
+    def record_output(state):
+        windows.append(samples[:])
+        samples.clear()
+        write_output(state)
+
+    averages.diagnose = record_samples
+    averages.write_output = record_output
+
+    sim.run()
+
+    # statistics must be reset after every output
+    assert len(windows) >= 2
+
+    data = _read_output("stats.averages.nc")
+
+    def assert_written(key, expected, record, **kwargs):
+        expected = prepare_variable_data(sim.state, averages.var_meta[key], expected)
+        np.testing.assert_allclose(data[key][record], expected, err_msg=key, **kwargs)
+
+    for record, window in enumerate(windows):
+        temp = np.stack([sample["temp"] for sample in window])
+        u = np.stack([sample["u"] for sample in window])
+
+        assert_written("temp", temp.mean(axis=0), record)
+        assert_written("u", u.mean(axis=0), record)
+        assert_written("temp_variance", temp.var(axis=0), record, atol=1e-12)
+        assert_written("temp_min", temp.min(axis=0), record, rtol=0)
+        assert_written("temp_max", temp.max(axis=0), record, rtol=0)
+
+        covariance = ((temp - temp.mean(axis=0)) * (u - u.mean(axis=0))).mean(axis=0)
+        assert_written("temp_u_covariance", covariance, record, atol=1e-12)
+
+        bin_idx = np.digitize(temp, bin_edges) - 1
+        histogram = np.stack([(bin_idx == i).sum(axis=0) for i in range(len(bin_edges) - 1)], axis=-1)
+        histogram = histogram.astype(data["temp_histogram"].dtype)
+        assert_written("temp_histogram", histogram, record, rtol=0)
+
+    for key in ("temp_variance", "temp_min", "temp_max", "temp_u_covariance", "temp_histogram"):
+        assert data[key].shape[0] == len(windows)
+
+    assert data["temp_histogram"].shape[1] == len(bin_edges) - 1
+
+
+def _overturning_reference(state, ovt_vs, p_ref):
+    # transports below isopycnals as one masked sum per isopycnal
+    from veros.core import density
+    from veros.diagnostics.overturning import _interpolate_depth_coords
+
+    vs = state.variables
+    nlevel = state.settings.nz * 4
+
+    sig_loc = np.zeros(vs.salt.shape[:3])
+    sig_loc[2:-2, 2:-1, :] = density.get_rho(
+        state, vs.salt[2:-2, 2:-1, :, vs.tau], vs.temp[2:-2, 2:-1, :, vs.tau], p_ref
+    )
+    sig_loc_face = 0.5 * (sig_loc[2:-2, 2:-2, :] + sig_loc[2:-2, 3:-1, :])
+
+    dxt, cosu, dzt, maskV = vs.dxt[2:-2], vs.cosu[2:-2], vs.dzt, vs.maskV[2:-2, 2:-2, :]
+    fac = dxt[:, np.newaxis, np.newaxis] * cosu[np.newaxis, :, np.newaxis] * dzt[np.newaxis, np.newaxis, :] * maskV
+    bolus_fac = dxt[:, np.newaxis, np.newaxis] * cosu[np.newaxis, :, np.newaxis] * maskV
+    B1_gm = vs.B1_gm[2:-2, 2:-2, :]
+
+    trans, z_sig, bolus_trans = (np.zeros((vs.v.shape[1], nlevel)) for _ in range(3))
+
+    for m in range(nlevel):
+        mask = sig_loc_face > ovt_vs.sigma[m]
+        trans[2:-2, m] = np.sum(vs.v[2:-2, 2:-2, :, vs.tau] * fac * mask, axis=(0, 2))
+        z_sig[2:-2, m] = np.sum(fac * mask, axis=(0, 2))
+        bolus_trans[2:-2, m] = np.sum(
+            np.sum((B1_gm[..., 1:] - B1_gm[..., :-1]) * bolus_fac[..., 1:] * mask[..., 1:], axis=2)
+            + B1_gm[..., 0] * bolus_fac[..., 0] * mask[..., 0],
+            axis=0,
+        )
+
+    vsf_iso = np.zeros_like(trans[:, : state.settings.nz])
+    bolus_iso = np.zeros_like(vsf_iso)
+    vsf_iso[2:-2] = _interpolate_depth_coords(z_sig[2:-2], trans[2:-2], ovt_vs.zarea[2:-2])
+    bolus_iso[2:-2] = _interpolate_depth_coords(z_sig[2:-2], bolus_trans[2:-2], ovt_vs.zarea[2:-2])
+    return dict(trans=trans, vsf_iso=vsf_iso, bolus_iso=bolus_iso)
+
+
+def test_overturning_binning():
+    from veros.state import VerosState
+    from veros.variables import VARIABLES, DIM_TO_SHAPE_VAR
+    from veros.settings import SETTINGS
+    from veros.diagnostics.overturning import Overturning, diagnose_kernel
+
+    state = VerosState(VARIABLES, SETTINGS, DIM_TO_SHAPE_VAR)
+
+    with state.settings.unlock():
+        state.settings.update(nx=8, ny=10, nz=6, enable_neutral_diffusion=True, enable_skew_diffusion=True)
+
+    state.initialize_variables()
+
+    rng = np.random.default_rng(17)
+    vs = state.variables
+
+    with vs.unlock():
+        vs.salt = rng.uniform(33, 37, size=vs.salt.shape)
+        vs.temp = rng.uniform(-2, 30, size=vs.temp.shape)
+        vs.v = rng.normal(size=vs.v.shape)
+        vs.B1_gm = rng.normal(size=vs.B1_gm.shape)
+        vs.dxt = rng.uniform(0.5, 1.5, size=vs.dxt.shape)
+        vs.cosu = rng.uniform(0.5, 1, size=vs.cosu.shape)
+        vs.dzt = rng.uniform(0.5, 1.5, size=vs.dzt.shape)
+        vs.maskV = rng.random(vs.maskV.shape) > 0.2
+
+    ovt = Overturning(state)
+    ovt.initialize(state)
+
+    expected = _overturning_reference(state, ovt.variables, ovt.p_ref)
+    out = diagnose_kernel(state, ovt.variables, ovt.p_ref)
+
+    for key, val in expected.items():
+        np.testing.assert_allclose(
+            np.asarray(getattr(out, key)), val, rtol=1e-10, atol=1e-10 * np.abs(val).max(), err_msg=key
+        )
+
+
+@pytest.mark.parametrize("accumulate_locally", [False, True])
+def test_energy_accumulation(tmpdir, accumulate_locally):
+    os.chdir(tmpdir)
+
+    class EnergySetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+
+            energy = state.diagnostics["energy"]
+            energy.sampling_frequency = state.settings.dt_tracer
+            energy.output_frequency = 2 * state.settings.dt_tracer
+            energy.accumulate_locally = accumulate_locally
+
+    sim = EnergySetup(override=dict(identifier="energy", restart_output_filename=None))
+    sim.setup()
+
+    with sim.state.settings.unlock():
+        sim.state.settings.runlen = sim.state.settings.dt_tracer * 5
+
+    # reference values of all energy terms for every sample, reduced right away
+    from veros.diagnostics.energy import ENERGY_TERMS, diagnose_kernel
+
+    energy = sim.state.diagnostics["energy"]
+    samples = []
+    diagnose = energy.diagnose
+
+    def record_samples(state):
+        samples.append(np.array(diagnose_kernel(state)))
+        diagnose(state)
+
+        if accumulate_locally:
+            # energies are only added to diagnostic variables upon output
+            assert energy._local_sums is not None
+
+    energy.diagnose = record_samples
+    sim.run()
+
+    data = _read_output("energy.energy.nc")
+    rho_0 = sim.state.settings.rho_0
+
+    num_records = data["Time"].shape[0]
+    assert num_records == len(samples) // 2
+
+    for i, term in enumerate(ENERGY_TERMS):
+        expected = [rho_0 * np.mean([s[i] for s in samples[2 * n : 2 * n + 2]]) for n in range(num_records)]
+        np.testing.assert_allclose(data[term], expected, rtol=1e-12)
+
+
+def test_diagnostics_schedule(tmpdir, io_threads, monkeypatch):
+    from veros.core import isoneutral
+    from veros.io_tools import writer
+
+    os.chdir(tmpdir)
+    io_threads(True)
+
+    class ScheduleSetup(OutputSetup):
+        @veros_routine
+        def set_diagnostics(self, state):
+            super().set_diagnostics(state)
+
+            # only consumer of the GM streamfunction, every other step
+            state.diagnostics["overturning"].sampling_frequency = 2 * state.settings.dt_tracer
+            state.diagnostics["overturning"].output_frequency = float("inf")
+
+    sim = ScheduleSetup(override=dict(identifier="schedule", restart_output_filename=None))
+    sim.setup()
+
+    with sim.state.settings.unlock():
+        sim.state.settings.runlen = sim.state.settings.dt_tracer * 6
+
+    producer_calls = []
+    diag_streamfunction = isoneutral.isoneutral_diag_streamfunction
+
+    def count_producer_calls(state):
+        producer_calls.append(int(state.variables.itt))
+        diag_streamfunction(state)
+
+    monkeypatch.setattr(isoneutral, "isoneutral_diag_streamfunction", count_producer_calls)
+
+    submitted_jobs = []
+    submit = writer.AsyncWriter.submit
+
+    def count_jobs(self, job):
+        submitted_jobs.append(job)
+        return submit(self, job)
+
+    monkeypatch.setattr(writer.AsyncWriter, "submit", count_jobs)
+
+    sim.run()
+
+    assert producer_calls == [2, 4, 6]
+
+    # output of several diagnostics per step is submitted as a single job
+    assert len(submitted_jobs) == 6
@@ -41,3 +41,29 @@ def test_linear_solver(solver, streamfunction):
         run_dist_kernel(kernel)
     finally:
         os.environ["VEROS_LINEAR_SOLVER"] = orig_solver
+
+
+def test_shared_memory():
+    run_dist_kernel("shared_memory_kernel.py")
+
+
+def test_reductions():
+    run_dist_kernel("reduction_kernel.py")
+
+
+def test_io_aggregation():
+    run_dist_kernel("io_aggregation_kernel.py")
+
+
+def test_zarr_output():
+    pytest.importorskip("zarr")
+    run_dist_kernel("zarr_output_kernel.py")
+
+
+def test_restart():
+    h5py = pytest.importorskip("h5py")
+
+    if not h5py.get_config().mpi:
+        pytest.skip("requires h5py with MPI support")
+
+    run_dist_kernel("restart_kernel.py")
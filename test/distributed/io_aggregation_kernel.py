@@ -0,0 +1,51 @@
+import sys
+
+import numpy as np
+from mpi4py import MPI
+
+from veros import runtime_settings as rs, runtime_state as rst
+
+if rst.proc_num == 1:
+    comm = MPI.COMM_SELF.Spawn(sys.executable, args=["-m", "mpi4py", sys.argv[-1]], maxprocs=4)
+
+    res = np.empty(1, dtype="int")
+    comm.Recv(res, 0)
+    assert res[0] == 1
+
+else:
+    rs.num_proc = (2, 2)
+    assert rst.proc_num == 4
+
+    from veros import distributed
+
+    nx, ny, nz = 8, 6, 3
+    dimsizes = dict(xt=nx, yt=ny, zt=nz, Time=1)
+
+    for num_aggregators in (1, 2, 8):
+        object.__setattr__(rs, "io_aggregators", num_aggregators)
+        assert distributed.use_io_aggregation()
+
+        # netCDF dimensions are transposed
+        for grid in (("Time", "zt", "yt", "xt"), ("yt", "xt"), ("xt",), ("yt",), ("zt",), ()):
+            global_arr = np.arange(np.prod([dimsizes[d] for d in grid]), dtype="float").reshape(
+                [dimsizes[d] for d in grid]
+            )
+
+            global_slice, _ = distributed.get_chunk_slices(nx, ny, grid)
+            block_slice, block = distributed.aggregate_tiles(nx, ny, global_arr[global_slice], grid)
+
+            blocks = rs.mpi_comm.allgather((block_slice, block))
+            blocks = [b for b in blocks if b[0] is not None]
+
+            # every value is written exactly once
+            assert sum(b[1].size for b in blocks) == global_arr.size, (num_aggregators, grid)
+            assert len(blocks) <= distributed.get_num_io_aggregators()
+
+            for block_slice, block in blocks:
+                np.testing.assert_array_equal(global_arr[block_slice], block)
+
+        # aggregated blocks fit into a single chunk
+        assert distributed.get_io_chunk_size(nx, ny) == (nx, ny // distributed.get_num_io_aggregators())
+
+    if rst.proc_rank == 0:
+        MPI.Comm.Get_parent().Send(np.array([1]), 0)
@@ -0,0 +1,70 @@
+import sys
+
+import numpy as np
+from mpi4py import MPI
+
+from veros import runtime_settings as rs, runtime_state as rst
+
+if rst.proc_num == 1:
+    comm = MPI.COMM_SELF.Spawn(sys.executable, args=["-m", "mpi4py", sys.argv[-1]], maxprocs=4)
+
+    res = np.empty(1, dtype="int")
+    comm.Recv(res, 0)
+    assert res[0] == 1
+
+else:
+    rs.num_proc = (2, 2)
+    assert rst.proc_num == 4
+
+    from veros import distributed
+    from veros.core.operators import numpy as npx
+
+    rank = rst.proc_rank
+
+    def check_reductions():
+        a = npx.arange(6).reshape(2, 3) * (rank + 1)
+        b = float(rank)
+
+        a_sum, b_sum = distributed.global_reduce((a, b), op="sum")
+        np.testing.assert_array_equal(a_sum, npx.arange(6).reshape(2, 3) * 10)
+        assert b_sum == 6
+
+        a_max, b_max = distributed.global_reduce((a, b), op="max")
+        np.testing.assert_array_equal(a_max, npx.arange(6).reshape(2, 3) * 4)
+        assert b_max == 3
+
+        (any_odd,) = distributed.global_reduce((rank % 2 == 1,), op="or")
+        (all_odd,) = distributed.global_reduce((rank % 2 == 1,), op="and")
+        assert any_odd and not all_odd
+
+        # reduction along axis
+        (row_sum,) = distributed.global_reduce((rank,), op="sum", axis=0)
+        assert row_sum == {0: 1, 1: 1, 2: 5, 3: 5}[rank]
+
+        pending = distributed.global_reduce((a, b), op="min", blocking=False)
+        a_min, b_min = pending.wait()
+        assert pending.done()
+        np.testing.assert_array_equal(a_min, npx.arange(6).reshape(2, 3))
+        assert b_min == 0
+
+        assert distributed.global_sum(b) == 6
+        assert distributed.global_max(b) == 3
+
+    check_reductions()
+
+    object.__setattr__(rs, "hierarchical_reductions", True)
+    check_reductions()
+
+    # pretend that processes are spread over 2 nodes
+    object.__setattr__(rs, "mpi_comm", MPI.COMM_WORLD.Dup())
+    distributed._mpi_comm_node = distributed._memoize(lambda comm: comm.Split(comm.Get_rank() // 2, comm.Get_rank()))
+    leader_comm = distributed._mpi_comm_node_leaders(rs.mpi_comm)
+    if rst.proc_rank % 2 == 0:
+        assert leader_comm.Get_size() == 2
+    else:
+        assert leader_comm == MPI.COMM_NULL
+
+    check_reductions()
+
+    if rst.proc_rank == 0:
+        MPI.Comm.Get_parent().Send(np.array([1]), 0)
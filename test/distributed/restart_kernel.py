@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+from mpi4py import MPI
+
+from veros import runtime_settings as rs, runtime_state as rst
+
+rs.linear_solver = "scipy"
+
+if rst.proc_num > 1:
+    rs.num_proc = (2, 2)
+    assert rst.proc_num == 4
+
+
+from veros.setups.acc import ACCSetup  # noqa: E402
+from veros.distributed import get_halo_slices  # noqa: E402
+
+CHECK_VARS = ("temp", "u", "v", "psi", "tke", "time", "tau")
+
+if rst.proc_num == 1:
+    outdir = tempfile.mkdtemp()
+    restart_file = os.path.join(outdir, "acc.restart.h5")
+
+    # written on a single process ...
+    sim = ACCSetup(
+        override=dict(identifier=os.path.join(outdir, "serial"), runlen=86400 * 2, restart_output_filename=restart_file)
+    )
+
+    comm = MPI.COMM_SELF.Spawn(sys.executable, args=["-m", "mpi4py", sys.argv[-1]], maxprocs=4)
+
+    try:
+        sim.setup()
+        sim.run()
+    except Exception as exc:
+        print(str(exc))
+        comm.Abort(1)
+        raise
+
+    expected = {var: np.asarray(sim.state.variables.get(var)) for var in CHECK_VARS}
+    comm.bcast((restart_file, expected), root=MPI.ROOT)
+
+    res = np.empty(1, dtype="int")
+    comm.Recv(res, 0)
+    assert res[0] == 1
+
+    shutil.rmtree(outdir)
+else:
+    parent = rs.mpi_comm.Get_parent()
+    restart_file, expected = parent.bcast(None, root=0)
+
+    # ... and read on 4 processes
+    sim = ACCSetup(
+        override=dict(
+            identifier=os.path.join(os.path.dirname(restart_file), "parallel"),
+            restart_input_filename=restart_file,
+            restart_output_filename=None,
+        )
+    )
+    sim.setup()
+
+    nx, ny = sim.state.dimensions["xt"], sim.state.dimensions["yt"]
+
+    for var in CHECK_VARS:
+        local_data = sim.state.variables.get(var)
+        gidx = get_halo_slices(nx, ny, sim.state.var_meta[var].dims)
+        np.testing.assert_array_equal(local_data, expected[var][gidx], err_msg=var)
+
+    if rst.proc_rank == 0:
+        parent.Send(np.array([1]), 0)
@@ -0,0 +1,64 @@
+import sys
+
+import numpy as np
+from mpi4py import MPI
+
+from veros import runtime_settings as rs, runtime_state as rst
+
+if rst.proc_num == 1:
+    comm = MPI.COMM_SELF.Spawn(sys.executable, args=["-m", "mpi4py", sys.argv[-1]], maxprocs=4)
+
+    res = np.empty(1, dtype="int")
+    comm.Recv(res, 0)
+    assert res[0] == 1
+
+else:
+    rs.num_proc = (2, 2)
+    assert rst.proc_num == 4
+
+    from veros import distributed
+    from veros.core.operators import numpy as npx
+
+    dimensions = dict(xt=8, yt=6)
+
+    def set_runtime_setting(name, val):
+        object.__setattr__(rs, name, val)
+
+    def communicate():
+        rng = np.random.default_rng(rst.proc_rank)
+        results = []
+
+        for grid, shape in ((("xt", "yt", None), (8, 7, 3)), (("xt",), (8,)), (("yt", None), (7, 2))):
+            for cyclic in (True, False):
+                arr = npx.asarray(rng.random(shape))
+                results.append(distributed.exchange_overlap(arr, grid, cyclic=cyclic))
+
+        arr = npx.asarray(rng.random((8, 7, 3)))
+        global_arr = distributed.gather(arr, dimensions, ("xt", "yt", None))
+        results.append(global_arr)
+
+        if rst.proc_rank != 0:
+            global_arr = npx.empty((8, 7, 3))
+
+        results.append(distributed.scatter(global_arr, dimensions, ("xt", "yt", None)))
+        return results
+
+    expected = communicate()
+
+    set_runtime_setting("mpi_shared_memory", True)
+    assert distributed.use_shared_memory()
+    assert len(distributed.get_node_ranks(rs.mpi_comm)) == 4
+
+    for res, exp in zip(communicate(), expected):
+        np.testing.assert_array_equal(res, exp)
+
+    # pretend that processes are spread over 2 nodes to mix shared memory and messages
+    set_runtime_setting("mpi_comm", MPI.COMM_WORLD.Dup())
+    distributed._mpi_comm_node = distributed._memoize(lambda comm: comm.Split(comm.Get_rank() // 2, comm.Get_rank()))
+    assert len(distributed.get_node_ranks(rs.mpi_comm)) == 2
+
+    for res, exp in zip(communicate(), expected):
+        np.testing.assert_array_equal(res, exp)
+
+    if rst.proc_rank == 0:
+        MPI.Comm.Get_parent().Send(np.array([1]), 0)
@@ -0,0 +1,83 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+from mpi4py import MPI
+
+from veros import runtime_settings as rs, runtime_state as rst, veros_routine
+
+rs.linear_solver = "scipy"
+
+if rst.proc_num > 1:
+    rs.num_proc = (2, 2)
+    assert rst.proc_num == 4
+
+
+from veros.setups.acc import ACCSetup  # noqa: E402
+from veros.diagnostics import OutputSpec  # noqa: E402
+
+
+class ZarrOutputSetup(ACCSetup):
+    @veros_routine
+    def set_diagnostics(self, state):
+        for diag in state.diagnostics.values():
+            diag.output_format = "zarr"
+
+        state.diagnostics["snapshot"].output_frequency = state.settings.dt_tracer
+        state.diagnostics["averages"].output_variables = ["temp", "u", "psi"]
+        state.diagnostics["averages"].sampling_frequency = state.settings.dt_tracer
+        state.diagnostics["averages"].output_frequency = 2 * state.settings.dt_tracer
+
+        # regions that are only partially covered by some processes
+        coarse = OutputSpec("coarse", coarsen=(3, 3), region=(3, 27, 6, 36), levels=[0, -1])
+        state.diagnostics["snapshot"].output_specs = {"u": coarse, "ht": coarse}
+        state.diagnostics["averages"].output_specs = {"temp": coarse}
+
+
+def run(outdir, identifier):
+    sim = ZarrOutputSetup(
+        override=dict(
+            identifier=os.path.join(outdir, identifier),
+            restart_output_filename=None,
+            runlen=86400 * 3,
+        )
+    )
+    sim.setup()
+    sim.run()
+
+
+if rst.proc_num == 1:
+    import zarr
+
+    outdir = tempfile.mkdtemp()
+    comm = MPI.COMM_SELF.Spawn(sys.executable, args=["-m", "mpi4py", sys.argv[-1], outdir], maxprocs=4)
+
+    try:
+        run(outdir, "serial")
+    except Exception as exc:
+        print(str(exc))
+        comm.Abort(1)
+        raise
+
+    res = np.empty(1, dtype="int")
+    comm.Recv(res, 0)
+    assert res[0] == 1
+
+    for diag in ("snapshot", "averages"):
+        serial = zarr.open_group(os.path.join(outdir, f"serial.{diag}.zarr"), mode="r")
+        parallel = zarr.open_group(os.path.join(outdir, f"parallel.{diag}.zarr"), mode="r")
+
+        assert set(serial.array_keys()) == set(parallel.array_keys())
+        assert serial["Time"].shape[0] > 1
+
+        for key in serial.array_keys():
+            np.testing.assert_allclose(parallel[key][...], serial[key][...], atol=1e-12, err_msg=key)
+
+    shutil.rmtree(outdir)
+else:
+    run(sys.argv[-1], "parallel")
+
+    if rst.proc_rank == 0:
+        rs.mpi_comm.Get_parent().Send(np.array([1]), 0)
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def test_batch_interp():
+    from veros.core.operators import batch_interp
+
+    rng = np.random.default_rng(42)
+
+    nrows, n, m = 20, 30, 12
+
+    xp = np.sort(rng.normal(size=(nrows, m)), axis=1)
+    # repeated data points (like empty density classes)
+    xp[:, 4:7] = xp[:, 4:5]
+    fp = rng.normal(size=(nrows, m))
+
+    x = rng.normal(scale=2, size=(nrows, n))
+    # hit data points and edges exactly
+    x[:, :m] = xp
+
+    out = np.asarray(batch_interp(x, xp, fp))
+    expected = np.stack([np.interp(x[i], xp[i], fp[i]) for i in range(nrows)])
+    np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-12)
+
+    # arbitrary leading dimensions
+    out = np.asarray(batch_interp(x.reshape(4, 5, n), xp.reshape(4, 5, m), fp.reshape(4, 5, m)))
+    np.testing.assert_allclose(out.reshape(nrows, n), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_bincount():
+    from veros.core.operators import bincount
+
+    rng = np.random.default_rng(42)
+
+    length = 10
+    x = rng.integers(-3, length + 3, size=200)
+    weights = rng.normal(size=200)
+
+    in_range = (x >= 0) & (x < length)
+    expected_counts = np.array([np.sum(x == i) for i in range(length)])
+    expected_sums = np.array([np.sum(weights[x == i]) for i in range(length)])
+    assert np.any(~in_range)
+
+    # out-of-range values are ignored
+    np.testing.assert_array_equal(np.asarray(bincount(x, length=length)), expected_counts)
+    np.testing.assert_allclose(np.asarray(bincount(x, weights=weights, length=length)), expected_sums, rtol=1e-12)
+
+    # empty bins at the end are kept
+    np.testing.assert_array_equal(
+        np.asarray(bincount(x[in_range] // 2, length=length)), np.bincount(x[in_range] // 2, minlength=length)
+    )
+
+
+def test_device_get():
+    from veros.core.operators import numpy as npx, device_get, prefetch_to_host
+
+    rng = np.random.default_rng(42)
+    temp, mask = rng.normal(size=(8, 6, 4)), rng.random((8, 6, 4)) > 0.5
+
+    # same structure as the output data of diagnostics
+    tree = ({"temp": (npx.asarray(temp), npx.asarray(mask)), "psi": (npx.asarray(temp[..., 0]), None)}, 1)
+
+    assert prefetch_to_host(tree) is None
+    out = device_get(tree)
+
+    assert out[1] == 1
+    assert out[0]["psi"][1] is None
+
+    for arr, expected in ((out[0]["temp"][0], temp), (out[0]["temp"][1], mask), (out[0]["psi"][0], temp[..., 0])):
+        assert isinstance(arr, np.ndarray)
+        np.testing.assert_array_equal(arr, expected)
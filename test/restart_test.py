@@ -1,7 +1,9 @@
 import os
+
+import pytest
 import numpy as np
 
-from veros import veros_routine
+from veros import runtime_settings, veros_routine
 from veros.setups.acc import ACCSetup
 
 
@@ -23,37 +25,96 @@ class RestartSetup(ACCSetup):
             diag.sampling_frequency = state.settings.dt_tracer
             diag.output_frequency = float("inf")
 
+        # streaming statistics must survive restarts, too
+        averages = state.diagnostics["averages"]
+        averages.output_variables = ["temp", "u", "psi"]
+        averages.output_statistics = {"temp": ["variance", "min", "max"]}
+        averages.covariance_variables = [("temp", "u")]
+        averages.histogram_bins = {"temp": [0, 5, 10, 20, 30]}
+
+
+@pytest.fixture
+def restart_compression():
+    def set_restart_compression(val):
+        object.__setattr__(runtime_settings, "restart_compression", val)
 
-def test_restart(tmpdir):
+    try:
+        yield set_restart_compression
+    finally:
+        set_restart_compression("gzip")
+
+
+@pytest.mark.parametrize(
+    "compression, static_restart, use_io_threads",
+    [("gzip", False, False), ("gzip", False, True), ("zstd", True, False)],
+)
+def test_restart(tmpdir, restart_compression, io_threads, compression, static_restart, use_io_threads):
     os.chdir(tmpdir)
 
+    if compression == "zstd":
+        pytest.importorskip("hdf5plugin")
+
+    restart_compression(compression)
+    io_threads(use_io_threads)
+
     timesteps_1 = 5
     timesteps_2 = 5
 
     dt_tracer = 86_400 / 2
     restart_file = "restart.h5"
+    static_restart_file = "restart.static.h5" if static_restart else None
 
     acc_no_restart = RestartSetup(
         override=dict(
             identifier="ACC_no_restart",
             restart_input_filename=None,
             restart_output_filename=restart_file,
+            restart_static_filename=static_restart_file,
+            restart_frequency=2 * dt_tracer,
             dt_tracer=dt_tracer,
             runlen=timesteps_1 * dt_tracer,
         )
     )
+
+    if static_restart:
+        # not time dependent, so it goes to the static restart file
+        acc_no_restart.state.var_meta["kbot"].write_to_restart = True
+
     acc_no_restart.setup()
     acc_no_restart.run()
 
+    # final restart is complete when run returns
+    assert os.path.isfile(restart_file)
+    assert not os.path.exists(f"{restart_file}.tmp")
+
+    if static_restart:
+        import h5py
+
+        with h5py.File(restart_file, "r") as f:
+            assert "kbot" not in f["core"]
+            assert "temp" in f["core"]
+            assert f.attrs["static_restart_file"] == static_restart_file
+
+        with h5py.File(static_restart_file, "r") as f:
+            assert list(f["core"].keys()) == ["kbot"]
+
+        # static data is only written once per run
+        assert acc_no_restart.state.static_restart_files == {static_restart_file}
+
     acc_restart = RestartSetup(
         override=dict(
             identifier="ACC_restart",
             restart_input_filename=restart_file,
             restart_output_filename=None,
+            restart_frequency=2 * dt_tracer,
             dt_tracer=dt_tracer,
             runlen=timesteps_2 * dt_tracer,
         )
     )
+
+    if static_restart:
+        acc_restart.state.var_meta["kbot"].write_to_restart = True
+
     acc_restart.setup()
     acc_restart.run()
 
@@ -65,7 +126,13 @@ def test_restart(tmpdir):
     state_1, state_2 = acc_restart.state, acc_no_restart.state
 
     for setting in state_1.settings.fields():
-        if setting in ("identifier", "restart_input_filename", "restart_output_filename", "runlen"):
+        if setting in (
+            "identifier",
+            "restart_input_filename",
+            "restart_output_filename",
+            "restart_static_filename",
+            "runlen",
+        ):
             continue
 
         s1 = state_1.settings.get(setting)
@@ -101,3 +168,85 @@ def test_restart(tmpdir):
                 continue
 
             check_diag_var(diag, var)
+
+
+@pytest.mark.parametrize("use_io_threads", [False, True])
+def test_checkpoint(tmpdir, io_threads, use_io_threads):
+    os.chdir(tmpdir)
+    io_threads(use_io_threads)
+
+    dt_tracer = 86_400 / 2
+
+    acc_checkpoint = RestartSetup(
+        override=dict(
+            identifier="ACC_checkpoint",
+            restart_input_filename=None,
+            restart_output_filename="restart_{itt:0>4d}.h5",
+            restart_frequency=2 * dt_tracer,
+            checkpoint_filename="checkpoint.h5",
+            checkpoint_frequency=dt_tracer,
+            dt_tracer=dt_tracer,
+            runlen=5 * dt_tracer,
+        )
+    )
+    acc_checkpoint.setup()
+    acc_checkpoint.run()
+
+    assert os.path.isfile("checkpoint.h5")
+    assert not os.path.exists("checkpoint.h5.tmp")
+
+    states = []
+
+    def restart_from(restart_file, checkpoint_file):
+        setup = RestartSetup(
+            override=dict(
+                identifier=f"ACC_restart_{len(states)}",
+                restart_input_filename=restart_file,
+                restart_output_filename=None,
+                checkpoint_filename=checkpoint_file,
+                dt_tracer=dt_tracer,
+            )
+        )
+        setup.setup()
+        states.append(setup.state)
+        return setup.state
+
+    # checkpoint is newer than restart file
+    state_1 = restart_from("restart_0002.h5", "checkpoint.h5")
+    assert state_1.variables.time == 4 * dt_tracer
+
+    # restart file is as recent as the checkpoint, so it takes precedence
+    state_2 = restart_from("restart_0004.h5", None)
+    assert state_2.variables.time == 4 * dt_tracer
+
+    # falls back to restart file if the checkpoint is missing
+    state_3 = restart_from("restart_0002.h5", "missing_checkpoint.h5")
+    assert state_3.variables.time == 2 * dt_tracer
+
+    for var in state_1.variables.fields():
+        if var in ("itt",) or "salt" in var:
+            continue
+
+        v1 = state_1.variables.get(var)
+        v2 = state_2.variables.get(var)
+        np.testing.assert_allclose(*_normalize(v1, v2), atol=1e-10, rtol=0)
+
+
+@pytest.mark.parametrize("setting", ["restart_input_filename", "restart_output_filename", "restart_static_filename"])
+def test_zarr_restart(tmpdir, setting):
+    os.chdir(tmpdir)
+
+    setup = RestartSetup(override={"restart_input_filename": None, setting: "restart.zarr"})
+
+    with pytest.raises(RuntimeError, match=setting):
+        setup.setup()
+
+
+def test_restart_from_directory(tmpdir):
+    os.chdir(tmpdir)
+    os.mkdir("restart_store")
+
+    setup = RestartSetup(override=dict(restart_input_filename="restart_store"))
+
+    with pytest.raises(RuntimeError, match="directory"):
+        setup.setup()
@@ -0,0 +1,62 @@
+import pytest
+
+from veros import veros_routine, runtime_settings
+from veros.setups.acc import ACCSetup
+
+
+class DivergingSetup(ACCSetup):
+    diverge_at = 3
+
+    @veros_routine
+    def after_timestep(self, state):
+        super().after_timestep(state)
+
+        vs = state.variables
+        if vs.itt == self.diverge_at:
+            vs.u = vs.u * float("nan")
+
+
+@pytest.fixture(autouse=True)
+def diskless_mode():
+    object.__setattr__(runtime_settings, "diskless_mode", True)
+    try:
+        yield
+    finally:
+        object.__setattr__(runtime_settings, "diskless_mode", False)
+
+
+def _run(**settings):
+    sim = DivergingSetup(override=dict(runlen=86_400 * 10, **settings))
+    sim.setup()
+
+    with pytest.raises(RuntimeError) as excinfo:
+        sim.run()
+
+    return sim, excinfo.value
+
+
+def test_sanity_check():
+    sim, exc = _run()
+    assert "iteration 3" in str(exc)
+    assert sim.state.variables.itt == 3
+
+
+def test_deferred_sanity_check():
+    sim, exc = _run(enable_deferred_sanity_check=True)
+    # divergence is reported for the iteration it occurred, but detected one iteration later
+    assert "iteration 3" in str(exc)
+    assert sim.state.variables.itt == 4
+
+
+def test_sanity_check_frequency():
+    sim, exc = _run(sanity_check_frequency=4)
+    assert "iteration 4" in str(exc)
+    assert sim.state.variables.itt == 4
+
+
+def test_deferred_sanity_check_end_of_run():
+    sim = DivergingSetup(override=dict(runlen=86_400 * 10, enable_deferred_sanity_check=True))
+    sim.diverge_at = None
+    sim.setup()
+    sim.run()
+    assert sim._pending_sanity_check is None
@@ -112,6 +112,18 @@ def test_set_dimension(dummy_state):
     assert dummy_state._dimensions["xt"] == "nx"
 
 
+def test_dimension_cache(dummy_state):
+    dimensions = dummy_state.dimensions
+    assert dummy_state.dimensions is dimensions
+
+    # modifying settings invalidates the cache
+    with dummy_state.settings.unlock():
+        dummy_state.settings.nx = 12
+
+    assert dummy_state.dimensions is not dimensions
+    assert dummy_state.dimensions["xt"] == 12
+
+
 def test_resize_dimension(dummy_state):
     from veros.state import resize_dimension
 
@@ -128,6 +140,47 @@ def test_resize_dimension(dummy_state):
     assert dummy_state.dimensions["xt"] == 100
     assert dummy_state.variables.dxt.shape == (104,)
 
+    # expected shapes are updated, too
+    with dummy_state.variables.unlock():
+        dummy_state.variables.dxt = dummy_state.variables.dxt * 2
+
+        with pytest.raises(ValueError):
+            dummy_state.variables.dxt = dummy_state.variables.dxt[:14]
+
+
+def test_variable_assignment(dummy_variables):
+    import numpy as np
+
+    from veros import runtime_settings
+
+    with pytest.raises(RuntimeError):
+        dummy_variables.dxt = dummy_variables.dxt
+
+    with dummy_variables.unlock():
+        # values are converted to expected dtype
+        dummy_variables.tau = 1.0
+        assert dummy_variables.tau.dtype == np.int32
+
+        with pytest.raises(ValueError):
+            dummy_variables.dxt = np.zeros(3)
+
+        with pytest.raises(AttributeError):
+            dummy_variables.foobar = 0
+
+        try:
+            object.__setattr__(runtime_settings, "validate_assignments", False)
+
+            # arrays are stored as they are in trusted mode
+            wrong_shape = np.zeros(3)
+            dummy_variables.dxt = wrong_shape
+            assert dummy_variables.dxt is wrong_shape
+
+            # scalars are still converted
+            dummy_variables.tau = 0
+            assert dummy_variables.tau.dtype == np.int32
+        finally:
+            object.__setattr__(runtime_settings, "validate_assignments", True)
+
 
 def test_timers(dummy_state):
     from veros.timer import Timer
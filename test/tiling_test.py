@@ -0,0 +1,176 @@
+import pytest
+import numpy as np
+
+from veros import runtime_settings
+
+
+@pytest.fixture
+def tile_shape():
+    def set_tile_shape(val):
+        object.__setattr__(runtime_settings, "tile_shape", val)
+
+    try:
+        yield set_tile_shape
+    finally:
+        set_tile_shape(None)
+
+
+@pytest.fixture
+def tile_threads():
+    def set_tile_threads(val):
+        object.__setattr__(runtime_settings, "tile_threads", val)
+
+    try:
+        yield set_tile_threads
+    finally:
+        set_tile_threads(1)
+
+
+def test_tile_slices_partition():
+    from veros.tiling import get_tile_slices
+
+    nx, ny = 13, 10
+    coverage = np.zeros((nx + 4, ny + 4), dtype="int")
+
+    tiles = get_tile_slices(nx, ny, (4, 3), halo=3)
+    assert len(tiles) == 4 * 4
+
+    for tile_idx, owned_global, owned_local in tiles:
+        coverage[owned_global] += 1
+
+        # owned region is at the same location within the tile
+        for tile_slice, global_slice, local_slice in zip(tile_idx, owned_global, owned_local):
+            assert tile_slice.start + local_slice.start == global_slice.start
+            assert tile_slice.start + local_slice.stop == global_slice.stop
+
+    np.testing.assert_array_equal(coverage, 1)
+
+
+def test_tile_slices_match_process_domains():
+    from veros import distributed
+    from veros.tiling import get_tile_slices
+
+    nx, ny = 12, 9
+    num_proc = (3, 3)
+
+    orig_num_proc = runtime_settings.num_proc
+    object.__setattr__(runtime_settings, "num_proc", num_proc)
+    try:
+        nxl, nyl = distributed.get_chunk_size(nx, ny)
+        tiles = get_tile_slices(nx, ny, (nxl, nyl))
+
+        # tiles are ordered like process ranks
+        for rank, (_, owned_global, _) in enumerate(tiles):
+            proc_idx = distributed.proc_rank_to_index(rank)
+            chunk, _ = distributed.get_chunk_slices(nx, ny, ("xt", "yt"), proc_idx=proc_idx, include_overlap=True)
+            assert owned_global == chunk
+    finally:
+        object.__setattr__(runtime_settings, "num_proc", orig_num_proc)
+
+
+def test_tile_slices_cyclic():
+    from veros.tiling import get_tile_slices
+
+    tiles = get_tile_slices(13, 10, (4, 3), enable_cyclic_x=True)
+    assert len(tiles) == 4
+    assert all(tile_idx[0] == slice(0, 17) for tile_idx, _, _ in tiles)
+
+
+@pytest.mark.parametrize("num_threads", [1, 4])
+@pytest.mark.parametrize("enable_cyclic_x", [True, False])
+def test_tiled_kernels(tile_shape, tile_threads, enable_cyclic_x, num_threads):
+    from veros import tiling
+    from veros.setups.acc import ACCSetup
+
+    if runtime_settings.backend != "numpy":
+        pytest.skip("tiling is only supported on NumPy backend")
+
+    sim = ACCSetup(
+        override=dict(
+            enable_cyclic_x=enable_cyclic_x,
+            enable_noslip_lateral=True,
+            A_hbi=1e11,
+            K_hbi=1e11,
+            K_h=100.0,
+            runlen=86400,
+        )
+    )
+    object.__setattr__(runtime_settings, "diskless_mode", True)
+    try:
+        sim.setup()
+        sim.run()
+    finally:
+        object.__setattr__(runtime_settings, "diskless_mode", False)
+
+    from veros.core import friction, diffusion
+
+    state = sim.state
+    vs = state.variables
+    orig_vars = dict(vs.items())
+
+    def reset_variables():
+        with vs.unlock():
+            vs.update(orig_vars)
+
+    kernels = (
+        friction.harmonic_friction,
+        friction.biharmonic_friction,
+        diffusion.tempsalt_diffusion,
+        diffusion.tempsalt_biharmonic,
+    )
+
+    for kernel in kernels:
+        reset_variables()
+        expected = kernel(state)
+
+        reset_variables()
+        tile_shape((7, 5))
+        tile_threads(num_threads)
+        assert tiling.use_tiling(state)
+        try:
+            tiled = kernel(state)
+        finally:
+            tile_shape(None)
+            tile_threads(1)
+
+        for field in expected._fields:
+            np.testing.assert_array_equal(getattr(tiled, field), getattr(expected, field), err_msg=field)
+
+
+def test_single_tile(tile_shape):
+    from veros import tiling
+    from veros.setups.acc import ACCSetup
+    from veros.core import diffusion
+
+    if runtime_settings.backend != "numpy":
+        pytest.skip("tiling is only supported on NumPy backend")
+
+    sim = ACCSetup(override=dict(K_h=100.0))
+    object.__setattr__(runtime_settings, "diskless_mode", True)
+    try:
+        sim.setup()
+    finally:
+        object.__setattr__(runtime_settings, "diskless_mode", False)
+
+    state = sim.state
+    nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+    expected = diffusion.tempsalt_diffusion(state)
+
+    # tile covers the whole domain, so the kernel is called directly
+    tile_shape((nx, ny + 1))
+    assert tiling.use_tiling(state)
+    try:
+        tiled = diffusion.tempsalt_diffusion(state)
+    finally:
+        tile_shape(None)
+
+    for field in expected._fields:
+        np.testing.assert_array_equal(getattr(tiled, field), getattr(expected, field), err_msg=field)
+
+
+def test_default_tile_shape():
+    from veros.tiling import get_default_tile_shape, get_tile_slices
+
+    tile_shape = get_default_tile_shape(13, 10, 4)
+    assert tile_shape == (0, 3)
+    assert len(get_tile_slices(13, 10, tile_shape)) == 4
@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+
+
+def _reference_masks(kbot, nz):
+    # masks as combinations of full 3D T masks
+    maskT = (kbot[..., np.newaxis] > 0) & (np.arange(nz) >= kbot[..., np.newaxis] - 1)
+
+    maskU = maskT.copy()
+    maskU[:-1] = maskT[:-1] & maskT[1:]
+
+    maskV = maskT.copy()
+    maskV[:, :-1] = maskT[:, :-1] & maskT[:, 1:]
+
+    maskZ = maskT.copy()
+    maskZ[:-1, :-1] = maskT[:-1, :-1] & maskT[:-1, 1:] & maskT[1:, :-1]
+
+    maskW = maskT.copy()
+    maskW[..., :-1] = maskT[..., :-1] & maskT[..., 1:]
+
+    return dict(maskT=maskT, maskU=maskU, maskV=maskV, maskW=maskW, maskZ=maskZ)
+
+
+def _enforce_cyclic(arr):
+    arr = arr.copy()
+    arr[-2:] = arr[2:4]
+    arr[:2] = arr[-4:-2]
+    return arr
+
+
+@pytest.mark.parametrize("enable_cyclic_x", [False, True])
+def test_calc_topo_masks(enable_cyclic_x):
+    from veros.state import VerosState
+    from veros.variables import VARIABLES, DIM_TO_SHAPE_VAR
+    from veros.settings import SETTINGS
+    from veros.core.numerics import calc_topo_kernel
+
+    state = VerosState(VARIABLES, SETTINGS, DIM_TO_SHAPE_VAR)
+
+    with state.settings.unlock():
+        state.settings.update(nx=12, ny=10, nz=7, enable_cyclic_x=enable_cyclic_x)
+
+    state.initialize_variables()
+
+    rng = np.random.default_rng(17)
+    kbot = rng.integers(0, state.settings.nz + 1, size=state.variables.kbot.shape)
+
+    with state.variables.unlock():
+        state.variables.kbot = kbot
+        state.variables.dzt = np.ones(state.settings.nz)
+
+    out = calc_topo_kernel(state)
+
+    # calc_topo_kernel closes the domain before computing masks
+    kbot = np.asarray(out.kbot)
+    expected = _reference_masks(kbot, state.settings.nz)
+
+    if enable_cyclic_x:
+        expected = {key: _enforce_cyclic(mask) for key, mask in expected.items()}
+
+    for key, mask in expected.items():
+        np.testing.assert_array_equal(np.asarray(getattr(out, key)), mask, err_msg=key)
+
+
+def test_pack_mask():
+    from veros.core.utilities import pack_mask, unpack_mask, apply_mask
+
+    rng = np.random.default_rng(17)
+    nz = 13
+    mask = rng.random((6, 5, nz)) > 0.5
+
+    packed = pack_mask(mask)
+    assert packed.dtype == np.uint8
+    assert packed.shape == (6, 5, 2)
+    np.testing.assert_array_equal(unpack_mask(packed, nz), mask)
+
+    arr = rng.normal(size=(6, 5, nz, 3))
+    np.testing.assert_array_equal(apply_mask(arr, mask), arr * mask[..., np.newaxis])
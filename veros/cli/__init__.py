@@ -13,9 +13,17 @@ if not have_click:
 del click
 del have_click
 
-from veros.cli import veros, veros_run, veros_copy_setup, veros_create_mask, veros_resubmit  # noqa: E402
+from veros.cli import (  # noqa: E402
+    veros,
+    veros_run,
+    veros_copy_setup,
+    veros_create_mask,
+    veros_resubmit,
+    veros_repartition_restart,
+)
 
 veros.cli.add_command(veros_run.cli, "run")
 veros.cli.add_command(veros_copy_setup.cli, "copy-setup")
 veros.cli.add_command(veros_create_mask.cli, "create-mask")
 veros.cli.add_command(veros_resubmit.cli, "resubmit")
+veros.cli.add_command(veros_repartition_restart.cli, "repartition-restart")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import functools
+
+import click
+
+
+def get_chunks(shape, dims, num_proc):
+    """Chunk shape matching the local arrays of a target decomposition"""
+    from veros.distributed import SCATTERED_DIMENSIONS
+    from veros.variables import GHOST_DIMENSIONS
+
+    chunks = []
+
+    for dimsize, dim in zip(shape, dims):
+        if dim in GHOST_DIMENSIONS:
+            dimsize -= 4
+
+        for nproc, scattered_dims in zip(num_proc, SCATTERED_DIMENSIONS):
+            if dim in scattered_dims:
+                if dimsize % nproc:
+                    raise ValueError(f"Dimension {dim} of size {dimsize} cannot be split into {nproc} chunks")
+
+                dimsize //= nproc
+
+        chunks.append(max(dimsize, 1))
+
+    return tuple(chunks)
+
+
+def _get_dims(name, groupname, dset):
+    from veros.variables import VARIABLES
+
+    if "dims" in dset.attrs:
+        return tuple(dset.attrs["dims"])
+
+    # files written by older versions of Veros do not store dimension names
+    if groupname == "core" and name in VARIABLES and VARIABLES[name].dims is not None:
+        return VARIABLES[name].dims
+
+    return None
+
+
+def repartition_restart(infile, outfile, num_proc):
+    """Re-chunks a restart file to match the decomposition of a run on a different number of processes"""
+    import h5py
+
+    from veros.io_tools.hdf5 import register_filters
+
+    register_filters()
+
+    with h5py.File(infile, "r") as src, h5py.File(outfile, "w") as dest:
+        dest.attrs.update(src.attrs)
+
+        for groupname, src_group in src.items():
+            dest_group = dest.create_group(groupname)
+            dest_group.attrs.update(src_group.attrs)
+
+            for name, src_dset in src_group.items():
+                dims = _get_dims(name, groupname, src_dset)
+
+                if src_dset.chunks is None or dims is None:
+                    src_group.copy(src_dset, dest_group, name=name)
+                    continue
+
+                # re-use all dataset properties (like compression filters), except for chunk shape
+                dcpl = src_dset.id.get_create_plist()
+                dcpl.set_chunk(get_chunks(src_dset.shape, dims, num_proc))
+
+                dest_id = h5py.h5d.create(
+                    dest_group.id, name.encode(), src_dset.id.get_type(), src_dset.id.get_space(), dcpl=dcpl
+                )
+                dest_dset = h5py.Dataset(dest_id)
+                dest_dset[...] = src_dset[...]
+                dest_dset.attrs.update(src_dset.attrs)
+
+
+@click.command("veros-repartition-restart")
+@click.argument("infile", type=click.Path(exists=True, dir_okay=False))
+@click.argument("outfile", type=click.Path(dir_okay=False))
+@click.option(
+    "-n",
+    "--num-proc",
+    nargs=2,
+    type=click.INT,
+    required=True,
+    help="Number of processes in x and y dimension of the target decomposition",
+)
+@functools.wraps(repartition_restart)
+def cli(*args, **kwargs):
+    repartition_restart(**kwargs)
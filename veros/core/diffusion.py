@@ -62,7 +62,7 @@ def dissipation_on_wgrid(state, diss, ks):
     return diss_w
 
 
-@veros_kernel
+@veros_kernel(tile_halo=2)
 def tempsalt_biharmonic(state):
     """
     biharmonic mixing of temp and salinity,
@@ -96,7 +96,7 @@ def tempsalt_biharmonic(state):
     )
 
 
-@veros_kernel
+@veros_kernel(tile_halo=2)
 def tempsalt_diffusion(state):
     """
     Diffusion of temp and salinity,
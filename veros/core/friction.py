@@ -371,7 +371,7 @@ def quadratic_bottom_friction(state):
     return KernelOutput(du_mix=vs.du_mix, dv_mix=vs.dv_mix, K_diss_bot=vs.K_diss_bot)
 
 
-@veros_kernel
+@veros_kernel(tile_halo=2)
 def harmonic_friction(state):
     """
     horizontal harmonic friction
@@ -641,7 +641,7 @@ def harmonic_friction(state):
     return KernelOutput(du_mix=vs.du_mix, dv_mix=vs.dv_mix, K_diss_h=vs.K_diss_h)
 
 
-@veros_kernel
+@veros_kernel(tile_halo=3)
 def biharmonic_friction(state):
     """
     horizontal biharmonic friction
@@ -1,6 +1,6 @@
 from veros import veros_kernel, veros_routine, KernelOutput
 from veros.variables import allocate
-from veros.distributed import global_and
+from veros.distributed import global_and, global_reduce
 from veros.core import density, diffusion, utilities
 from veros.core.operators import update, at, numpy as npx
 
@@ -196,29 +196,29 @@ def calc_topo_kernel(state):
 
     """
     Land masks
+
+    All masks follow from the deepest wet cell in each column, so they are derived from
+    2D index arrays instead of combining full 3D masks.
     """
-    land_mask = vs.kbot > 0
-    ks = npx.arange(vs.maskT.shape[2])[npx.newaxis, npx.newaxis, :]
+    nz = settings.nz
+    kbot = vs.kbot
 
-    vs.maskT = update(vs.maskT, at[...], land_mask[..., npx.newaxis] & (vs.kbot[..., npx.newaxis] - 1 <= ks))
-    vs.maskT = utilities.enforce_boundaries(vs.maskT, settings.enable_cyclic_x)
+    vs.maskT = utilities.create_mask(kbot, nz)
 
-    vs.maskU = update(vs.maskU, at[...], vs.maskT)
-    vs.maskU = update(vs.maskU, at[:-1, :, :], npx.minimum(vs.maskT[:-1, :, :], vs.maskT[1:, :, :]))
-    vs.maskU = utilities.enforce_boundaries(vs.maskU, settings.enable_cyclic_x)
+    kbot_u = update(kbot, at[:-1, :], utilities.combine_columns(kbot[:-1, :], kbot[1:, :]))
+    kbot_u = utilities.enforce_boundaries(kbot_u, settings.enable_cyclic_x)
+    vs.maskU = utilities.create_mask(kbot_u, nz)
 
-    vs.maskV = update(vs.maskV, at[...], vs.maskT)
-    vs.maskV = update(vs.maskV, at[:, :-1], npx.minimum(vs.maskT[:, :-1], vs.maskT[:, 1:]))
-    vs.maskV = utilities.enforce_boundaries(vs.maskV, settings.enable_cyclic_x)
+    kbot_v = update(kbot, at[:, :-1], utilities.combine_columns(kbot[:, :-1], kbot[:, 1:]))
+    kbot_v = utilities.enforce_boundaries(kbot_v, settings.enable_cyclic_x)
+    vs.maskV = utilities.create_mask(kbot_v, nz)
 
-    vs.maskZ = update(vs.maskZ, at[...], vs.maskT)
-    vs.maskZ = update(
-        vs.maskZ, at[:-1, :-1], npx.minimum(npx.minimum(vs.maskT[:-1, :-1], vs.maskT[:-1, 1:]), vs.maskT[1:, :-1])
-    )
-    vs.maskZ = utilities.enforce_boundaries(vs.maskZ, settings.enable_cyclic_x)
+    kbot_z = update(kbot, at[:-1, :-1], utilities.combine_columns(kbot[:-1, :-1], kbot[:-1, 1:], kbot[1:, :-1]))
+    kbot_z = utilities.enforce_boundaries(kbot_z, settings.enable_cyclic_x)
+    vs.maskZ = utilities.create_mask(kbot_z, nz)
 
-    vs.maskW = update(vs.maskW, at[...], vs.maskT)
-    vs.maskW = update(vs.maskW, at[:, :, :-1], npx.minimum(vs.maskT[:, :, :-1], vs.maskT[:, :, 1:]))
+    # W cells are wet if both adjacent T cells are, which is always the case for wet T cells
+    vs.maskW = vs.maskT
 
     """
     total depth
@@ -357,3 +357,17 @@ def calc_diss_v(state, diss):
 @veros_kernel
 def sanity_check(state):
     return global_and(npx.all(npx.isfinite(state.variables.u)))
+
+
+@veros_kernel
+def local_sanity_check(state):
+    return npx.all(npx.isfinite(state.variables.u))
+
+
+def start_sanity_check(state):
+    """Start a sanity check without waiting for the result.
+
+    Returns a :class:`veros.distributed.PendingReduction`; ``wait()`` returns a 1-tuple
+    containing the result of the check.
+    """
+    return global_reduce((local_sanity_check(state),), op="and", blocking=False)
@@ -57,6 +57,46 @@ def update_multiply_numpy(arr, at, to):
     return warr
 
 
+def bincount_numpy(x, weights=None, length=0):
+    """Like np.bincount, but always returns ``length`` bins (values outside [0, length) are ignored)."""
+    import numpy as np
+
+    in_range = (x >= 0) & (x < length)
+    if weights is not None:
+        weights = weights[in_range]
+
+    return np.bincount(x[in_range], weights=weights, minlength=length)
+
+
+def batch_interp_numpy(x, xp, fp):
+    """Like np.interp, but for many rows at once (along the last axis, xp must be increasing)."""
+    import numpy as np
+
+    batch_shape = x.shape[:-1]
+    n, m = x.shape[-1], xp.shape[-1]
+    x, xp, fp = (arr.reshape(-1, arr.shape[-1]) for arr in (x, xp, fp))
+
+    # index of last data point <= x, found by sorting x into xp (row by row)
+    # stable sort ensures that data points are sorted before identical values in x
+    order = np.argsort(np.concatenate((xp, x), axis=1), axis=1, kind="stable")
+    num_points_below = np.empty(order.shape, dtype=order.dtype)
+    np.put_along_axis(num_points_below, order, np.cumsum(order < m, axis=1), axis=1)
+    num_points_below = num_points_below[:, m:]
+
+    idx = np.clip(num_points_below - 1, 0, m - 2)
+    x_lower, x_upper = np.take_along_axis(xp, idx, axis=1), np.take_along_axis(xp, idx + 1, axis=1)
+    f_lower, f_upper = np.take_along_axis(fp, idx, axis=1), np.take_along_axis(fp, idx + 1, axis=1)
+
+    # x_upper > x_lower for all points that are not clipped
+    dx = np.where(x_upper > x_lower, x_upper - x_lower, 1)
+    out = (f_upper - f_lower) / dx * (x - x_lower) + f_lower
+
+    # constant extrapolation (like np.interp)
+    out = np.where(num_points_below == 0, fp[:, :1], out)
+    out = np.where(x >= xp[:, -1:], fp[:, -1:], out)
+    return out.reshape(*batch_shape, n)
+
+
 def solve_tridiagonal_numpy(a, b, c, d, water_mask, edge_mask):
     import numpy as np
     from scipy.linalg import lapack
@@ -156,6 +196,31 @@ def solve_tridiagonal_jax(a, b, c, d, water_mask, edge_mask):
     return jnp.moveaxis(sol, 0, 2)
 
 
+def bincount_jax(x, weights=None, length=0):
+    import jax.numpy as jnp
+
+    # length has to be static for jitted functions
+    # jnp.bincount would count negative values into the first bin
+    in_range = (x >= 0) & (x < length)
+    if weights is None:
+        weights = in_range.astype(jnp.int32)
+    else:
+        weights = jnp.where(in_range, weights, 0)
+
+    return jnp.bincount(jnp.where(in_range, x, 0), weights=weights, length=length)
+
+
+def batch_interp_jax(x, xp, fp):
+    import jax
+    import jax.numpy as jnp
+
+    interp = jnp.interp
+    for _ in range(x.ndim - 1):
+        interp = jax.vmap(interp)
+
+    return interp(x, xp, fp)
+
+
 def update_jax(arr, at, to):
     return arr.at[at].set(to)
 
@@ -168,6 +233,19 @@ def update_multiply_jax(arr, at, to):
     return arr.at[at].multiply(to)
 
 
+def device_get_numpy(tree):
+    return tree
+
+
+def prefetch_to_host_jax(tree):
+    import jax
+
+    # start transfers of all arrays without waiting for them
+    for leaf in jax.tree_util.tree_leaves(tree):
+        if hasattr(leaf, "copy_to_host_async"):
+            leaf.copy_to_host_async()
+
+
 def flush_jax():
     import jax
 
@@ -189,9 +267,14 @@ if runtime_settings.backend == "numpy":
     solve_tridiagonal = solve_tridiagonal_numpy
     for_loop = fori_numpy
     scan = scan_numpy
+    bincount = bincount_numpy
+    batch_interp = batch_interp_numpy
+    device_get = device_get_numpy
+    prefetch_to_host = noop
     flush = noop
 
 elif runtime_settings.backend == "jax":
+    import jax
     import jax.lax
 
     update = update_jax
@@ -201,6 +284,10 @@ elif runtime_settings.backend == "jax":
     solve_tridiagonal = solve_tridiagonal_jax
     for_loop = jax.lax.fori_loop
     scan = jax.lax.scan
+    bincount = bincount_jax
+    batch_interp = batch_interp_jax
+    device_get = jax.device_get
+    prefetch_to_host = prefetch_to_host_jax
     flush = flush_jax
 
 else:
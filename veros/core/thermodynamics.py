@@ -1,7 +1,7 @@
 from veros.core.operators import numpy as npx
 
 from veros import veros_routine, veros_kernel, KernelOutput
-from veros.distributed import global_sum
+from veros.distributed import global_reduce
 from veros.variables import allocate
 from veros.core import advection, diffusion, isoneutral, density, utilities
 from veros.core.operators import update, update_add, at
@@ -214,8 +214,7 @@ def advect_temp_salt_enthalpy(state):
             * tke_mask
         ) + npx.sum(0.5 * vs.area_t[2:-2, 2:-2] * vs.dzw[-1] * vs.maskW[2:-2, 2:-2, -1])
 
-        fxa = global_sum(fxa)
-        fxb = global_sum(fxb)
+        fxa, fxb = global_reduce((fxa, fxb), op="sum")
 
         vs.P_diss_adv = update(vs.P_diss_adv, at[2:-2, 2:-2, :-1], fxa / fxb * tke_mask)
         vs.P_diss_adv = update(vs.P_diss_adv, at[2:-2, 2:-2, -1], fxa / fxb)
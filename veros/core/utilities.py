@@ -35,13 +35,58 @@ def pad_z_edges(array):
     return newarray
 
 
+@veros_kernel(static_args=("nz"))
+def create_mask(ks, nz):
+    """
+    Derives the 3D mask of a grid from the (1-based) index of the deepest wet cell in each
+    column (0 on land). Inside jitted kernels, this is fused into the consumer, so no
+    full-size mask array has to be read from memory.
+    """
+    ks = ks[..., npx.newaxis]
+    return (ks > 0) & (npx.arange(nz) >= ks - 1)
+
+
+def combine_columns(*ks):
+    """
+    Index of the deepest wet cell of a column that is only wet where all given columns are wet
+    (like U, V, or zeta points between T columns).
+    """
+    all_wet = ks[0] > 0
+    deepest = ks[0]
+    for k in ks[1:]:
+        all_wet = all_wet & (k > 0)
+        deepest = npx.maximum(deepest, k)
+
+    return npx.where(all_wet, deepest, 0)
+
+
+@veros_kernel
+def apply_mask(arr, mask):
+    """
+    Sets masked values to 0. Unlike multiplying by the mask, this does not require converting
+    the mask to floating point.
+    """
+    if mask.ndim < arr.ndim:
+        mask = mask.reshape(mask.shape + (1,) * (arr.ndim - mask.ndim))
+
+    return npx.where(mask, arr, 0)
+
+
+def pack_mask(mask):
+    """Compact storage of 3D masks, with 8 vertical levels per byte."""
+    return npx.packbits(mask, axis=-1)
+
+
+def unpack_mask(packed, nz):
+    """Inverse of :func:`pack_mask`."""
+    return npx.unpackbits(packed, axis=-1, count=nz).astype("bool")
+
+
 @veros_kernel(static_args=("nz"))
 def create_water_masks(ks, nz):
+    water_mask = create_mask(ks, nz)
     ks = ks - 1
     land_mask = ks >= 0
-    water_mask = npx.logical_and(
-        land_mask[:, :, npx.newaxis], npx.arange(nz)[npx.newaxis, npx.newaxis, :] >= ks[:, :, npx.newaxis]
-    )
     edge_mask = npx.logical_and(
         land_mask[:, :, npx.newaxis], npx.arange(nz)[npx.newaxis, npx.newaxis, :] == ks[:, :, npx.newaxis]
     )
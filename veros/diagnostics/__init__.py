@@ -1 +1,2 @@
-from veros.diagnostics.api import create_default_diagnostics, initialize, diagnose, output  # noqa: F401
+from veros.diagnostics.api import create_default_diagnostics, initialize, diagnose, output, step, flush  # noqa: F401
+from veros.diagnostics.output_spec import OutputSpec  # noqa: F401
@@ -26,19 +26,72 @@ def initialize(state):
             logger.info(f' Writing output for diagnostic "{name}" every {t:.1f} {unit}')
 
 
-def diagnose(state):
-    vs = state.variables
-    settings = state.settings
+def _get_producers():
+    """Routines computing variables that are only used by diagnostics, and the variables they compute"""
+    from veros.core import isoneutral
 
-    for diagnostic in state.diagnostics.values():
-        if diagnostic.sampling_frequency and vs.time % diagnostic.sampling_frequency < settings.dt_tracer:
-            diagnostic.diagnose(state)
+    return ((isoneutral.isoneutral_diag_streamfunction, ("B1_gm", "B2_gm")),)
 
 
-def output(state):
+def _is_due(state, frequency):
     vs = state.variables
-    settings = state.settings
+    return bool(frequency) and vs.time % frequency < state.settings.dt_tracer
+
+
+def get_schedule(state):
+    """Return diagnostics that are sampled and written in the current time step."""
+    to_diagnose = [diag for diag in state.diagnostics.values() if _is_due(state, diag.sampling_frequency)]
+    to_output = [diag for diag in state.diagnostics.values() if _is_due(state, diag.output_frequency)]
+    return to_diagnose, to_output
+
+
+def step(state):
+    """Run all diagnostics that are due in the current time step.
+
+    Diagnostic variables (like the GM streamfunction) are only computed if a diagnostic that is
+    due needs them, and output of all diagnostics is handed to the I/O writer as a single job.
+    """
+    from veros.io_tools import writer
+
+    to_diagnose, to_output = get_schedule(state)
+
+    if not to_diagnose and not to_output:
+        return
+
+    required_variables = set()
+    for diagnostic in (*to_diagnose, *to_output):
+        required_variables |= set(diagnostic.get_required_variables(state))
+
+    for producer, produced_variables in _get_producers():
+        if required_variables.intersection(produced_variables):
+            producer(state)
 
-    for diagnostic in state.diagnostics.values():
-        if diagnostic.output_frequency and vs.time % diagnostic.output_frequency < settings.dt_tracer:
+    for diagnostic in to_diagnose:
+        diagnostic.diagnose(state)
+
+    with writer.batch():
+        for diagnostic in to_output:
             diagnostic.output(state)
+
+
+def diagnose(state):
+    to_diagnose, _ = get_schedule(state)
+
+    for diagnostic in to_diagnose:
+        diagnostic.diagnose(state)
+
+
+def output(state):
+    _, to_output = get_schedule(state)
+
+    for diagnostic in to_output:
+        diagnostic.output(state)
+
+
+def flush(state):
+    """Block until all pending diagnostic output has been written to disk, and close output files."""
+    from veros.io_tools import writer, netcdf, zarr
+
+    writer.wait()
+    netcdf.close_output_files()
+    zarr.close_output_files()
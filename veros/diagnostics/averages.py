@@ -1,8 +1,12 @@
 import os
 import copy
 
+from veros import veros_kernel
+from veros.core.operators import numpy as npx
 from veros.diagnostics.base import VerosDiagnostic
-from veros.variables import TIMESTEPS, Variable
+from veros.variables import TIMESTEPS, Variable, get_shape
+
+STATISTICS = ("variance", "min", "max")
 
 
 class Averages(VerosDiagnostic):
@@ -10,11 +14,28 @@ class Averages(VerosDiagnostic):
 
     All registered variables are summed up when :meth:`diagnose` is called,
     and averaged and output upon calling :meth:`output`.
+
+    Additionally, streaming statistics over each output interval can be requested for
+    any averaged variable (see :attr:`output_statistics`, :attr:`covariance_variables`,
+    and :attr:`histogram_bins`). They are accumulated in place (variances and covariances
+    via Welford's algorithm) and written to restart files, so no snapshot output is needed
+    to compute them. Output variables are called ``<var>_variance``, ``<var>_min``,
+    ``<var>_max``, ``<var1>_<var2>_covariance``, and ``<var>_histogram``.
+
+    Example:
+        >>> averages = state.diagnostics["averages"]
+        >>> averages.output_variables = ["temp", "u"]
+        >>> averages.output_statistics = {"temp": ["variance", "max"]}
+        >>> averages.covariance_variables = [("temp", "u")]
+        >>> averages.histogram_bins = {"temp": [-2, 0, 5, 10, 20, 30]}
     """
 
     name = "averages"  #:
     output_path = "{identifier}.averages.nc"  #: File to write to. May contain format strings that are replaced with Veros attributes.
     output_variables = None  #: Iterable containing all variables to be averaged. Changes have no effect after ``initialize`` has been called.
+    output_statistics = None  #: Dict mapping averaged variables to an iterable of additional statistics (any of "variance", "min", "max").
+    covariance_variables = None  #: Iterable of pairs of averaged variables to compute the covariance of.
+    histogram_bins = None  #: Dict mapping averaged variables to bin edges. Values are counted in each grid cell, values outside of all bins are ignored.
     output_frequency = None  #: Frequency (in seconds) in which output is written.
     sampling_frequency = None  #: Frequency (in seconds) in which variables are accumulated.
 
@@ -23,11 +44,15 @@ class Averages(VerosDiagnostic):
             "average_nitts": Variable("average_nitts", None, write_to_restart=True),
         }
         self.output_variables = []
+        self.output_statistics = {}
+        self.covariance_variables = []
+        self.histogram_bins = {}
 
     def initialize(self, state):
         """Register all variables to be averaged"""
+        self._averaged_variables = list(self.output_variables)
 
-        for var in self.output_variables:
+        for var in self._averaged_variables:
             var_meta = copy.copy(state.var_meta[var])
             var_meta.time_dependent = True
             var_meta.write_to_restart = True
@@ -37,9 +62,102 @@ class Averages(VerosDiagnostic):
 
             self.var_meta[var] = var_meta
 
+        self._initialize_statistics(state)
+        self.output_variables = self._averaged_variables + self._statistics_variables
+
+        # static arguments of accumulate_kernel
+        self._kernel_config = (
+            tuple(self._averaged_variables),
+            tuple(var for var in self._averaged_variables if self._has_timestep_dim(state, var)),
+            tuple((var, tuple(stats)) for var, stats in self.output_statistics.items()),
+            tuple(tuple(pair) for pair in self.covariance_variables),
+            tuple((var, tuple(float(edge) for edge in edges)) for var, edges in self.histogram_bins.items()),
+        )
+
         self.initialize_variables(state)
         self.initialize_output(state)
 
+    def _initialize_statistics(self, state):
+        self._statistics_variables = []
+
+        def add_variable(key, var, name, long_description, **kwargs):
+            var_meta = copy.copy(self.var_meta[var])
+            var_meta.name = name
+            var_meta.long_description = long_description
+
+            for attr, val in kwargs.items():
+                setattr(var_meta, attr, val)
+
+            self.var_meta[key] = var_meta
+            self._statistics_variables.append(key)
+
+        def check_averaged(var):
+            if var not in self._averaged_variables:
+                raise ValueError(f"Statistics can only be computed for averaged variables (got {var})")
+
+        for var, stats in self.output_statistics.items():
+            check_averaged(var)
+
+            for stat in stats:
+                if stat not in STATISTICS:
+                    raise ValueError(f'Unknown statistic "{stat}" for variable {var} (must be one of {STATISTICS})')
+
+                var_meta = self.var_meta[var]
+                units = var_meta.units
+
+                if stat == "variance":
+                    units = f"({units})^2" if units else ""
+
+                add_variable(
+                    f"{var}_{stat}", var, f"{var_meta.name} ({stat})", f"{stat.capitalize()} of {var}", units=units
+                )
+
+        for var1, var2 in self.covariance_variables:
+            check_averaged(var1)
+            check_averaged(var2)
+
+            meta1, meta2 = self.var_meta[var1], self.var_meta[var2]
+
+            # variables on different grids (like temp and u) are not interpolated
+            if get_shape(state.dimensions, meta1.dims) != get_shape(state.dimensions, meta2.dims):
+                raise ValueError(f"Cannot compute covariance of {var1} and {var2} with different shapes")
+
+            units = " ".join(u for u in (meta1.units, meta2.units) if u)
+            add_variable(
+                f"{var1}_{var2}_covariance",
+                var1,
+                f"Covariance of {meta1.name} and {meta2.name}",
+                f"Covariance of {var1} and {var2}",
+                units=units,
+            )
+
+        for var, bin_edges in self.histogram_bins.items():
+            check_averaged(var)
+
+            bin_edges = [float(edge) for edge in bin_edges]
+            if len(bin_edges) < 2 or any(b1 >= b2 for b1, b2 in zip(bin_edges[:-1], bin_edges[1:])):
+                raise ValueError(f"Histogram bin edges for {var} must be increasing and contain at least 2 values")
+
+            bin_dim = f"{var}_bins"
+
+            if self.extra_dimensions is None:
+                self.extra_dimensions = {}
+
+            self.extra_dimensions[bin_dim] = len(bin_edges) - 1
+
+            var_meta = self.var_meta[var]
+            add_variable(
+                f"{var}_histogram",
+                var,
+                f"Histogram of {var_meta.name}",
+                f"Number of samples of {var} per bin",
+                dims=(*(var_meta.dims or ()), bin_dim),
+                units="",
+                dtype="int32",
+                scale=1,
+                extra_attributes=dict(bin_edges=bin_edges),
+            )
+
     @staticmethod
     def _has_timestep_dim(state, var):
         if state.var_meta[var].dims is None:
@@ -51,31 +169,116 @@ class Averages(VerosDiagnostic):
         vs = state.variables
         avg_vs = self.variables
 
-        avg_vs.average_nitts = avg_vs.average_nitts + 1
+        accumulators = {key: getattr(avg_vs, key) for key in ("average_nitts", *self.output_variables)}
+        sources = {key: getattr(vs, key) for key in self._averaged_variables}
 
-        for key in self.output_variables:
-            var_data = getattr(avg_vs, key)
-            if self._has_timestep_dim(state, key):
-                setattr(avg_vs, key, var_data + getattr(vs, key)[..., vs.tau])
-            else:
-                setattr(avg_vs, key, var_data + getattr(vs, key))
+        # all variables are updated by a single kernel, so accumulators stay on the device
+        accumulators = accumulate_kernel(accumulators, sources, vs.tau, *self._kernel_config)
+
+        for key, val in accumulators.items():
+            setattr(avg_vs, key, val)
 
     def output(self, state):
         """Write averages to netcdf file and zero array"""
         avg_vs = self.variables
 
-        if not os.path.isfile(self.get_output_file_name(state)):
+        if not os.path.exists(self.get_output_file_name(state)):
             self.initialize_output(state)
 
-        if avg_vs.average_nitts > 0:
-            for key in self.output_variables:
-                val = getattr(avg_vs, key)
-                setattr(avg_vs, key, val / avg_vs.average_nitts)
+        averaged_variables, _, statistics, covariances, _ = self._kernel_config
+
+        moments = tuple(f"{var}_variance" for var, stats in statistics if "variance" in stats)
+        moments += tuple(f"{var1}_{var2}_covariance" for var1, var2 in covariances)
+
+        accumulators = {key: getattr(avg_vs, key) for key in ("average_nitts", *self.output_variables)}
+        averages, accumulators = average_kernel(accumulators, averaged_variables + moments)
+
+        for key, val in averages.items():
+            setattr(avg_vs, key, val)
 
         self.write_output(state)
 
-        for key in self.output_variables:
-            val = getattr(avg_vs, key)
-            setattr(avg_vs, key, 0 * val)
+        for key, val in accumulators.items():
+            setattr(avg_vs, key, val)
+
+
+@veros_kernel(static_args=("averaged_variables", "timestep_variables", "statistics", "covariances", "histogram_bins"))
+def accumulate_kernel(
+    accumulators, sources, tau, averaged_variables, timestep_variables, statistics, covariances, histogram_bins
+):
+    """Add current values of all averaged variables to the accumulated sums and statistics"""
+    accumulators = dict(accumulators)
+
+    nitts = accumulators["average_nitts"] + 1
+    first_sample = nitts == 1
+    accumulators["average_nitts"] = nitts
+
+    samples = {}
+    for key in averaged_variables:
+        samples[key] = sources[key][..., tau] if key in timestep_variables else sources[key]
+
+    # Welford's algorithm, with means derived from the running sums
+    needs_deltas = {var for var, stats in statistics if "variance" in stats}
+    needs_deltas.update(var for pair in covariances for var in pair)
+
+    mean_deltas = {}
+    for key in averaged_variables:
+        var_sum = accumulators[key]
+        sample = samples[key]
+
+        if key in needs_deltas:
+            old_mean = var_sum / npx.maximum(nitts - 1, 1)
+            new_mean = (var_sum + sample) / nitts
+            mean_deltas[key] = (sample - old_mean, sample - new_mean)
+
+        accumulators[key] = var_sum + sample
+
+    for var, stats in statistics:
+        sample = samples[var]
+
+        for stat in stats:
+            key = f"{var}_{stat}"
+            acc = accumulators[key]
+
+            if stat == "variance":
+                old_delta, new_delta = mean_deltas[var]
+                # first sample contributes 0 since new_delta vanishes
+                acc = acc + old_delta * new_delta
+            elif stat == "min":
+                acc = npx.where(first_sample, sample, npx.minimum(acc, sample))
+            elif stat == "max":
+                acc = npx.where(first_sample, sample, npx.maximum(acc, sample))
+
+            accumulators[key] = acc
+
+    for var1, var2 in covariances:
+        key = f"{var1}_{var2}_covariance"
+        accumulators[key] = accumulators[key] + mean_deltas[var1][0] * mean_deltas[var2][1]
+
+    for var, bin_edges in histogram_bins:
+        key = f"{var}_histogram"
+        bin_edges = npx.asarray(bin_edges, dtype=samples[var].dtype)
+        nbins = bin_edges.shape[0] - 1
+
+        # values outside of all bins get index -1 or nbins and are not counted
+        bin_idx = npx.searchsorted(bin_edges, samples[var], side="right") - 1
+        bin_idx = npx.where(samples[var] == bin_edges[-1], nbins - 1, bin_idx)
+        counts = bin_idx[..., npx.newaxis] == npx.arange(nbins)
+
+        acc = accumulators[key]
+        accumulators[key] = acc + counts.astype(acc.dtype)
+
+    return accumulators
+
+
+@veros_kernel(static_args=("averaged_keys",))
+def average_kernel(accumulators, averaged_keys):
+    """Divide accumulated sums by number of samples, and return averages and reset accumulators"""
+    nitts = accumulators["average_nitts"]
+
+    averages = dict(accumulators)
+    for key in averaged_keys:
+        averages[key] = accumulators[key] / npx.maximum(nitts, 1)
 
-        avg_vs.average_nitts = 0
+    zeros = {key: npx.zeros_like(val) for key, val in accumulators.items()}
+    return averages, zeros
@@ -1,11 +1,13 @@
 import abc
 
 import os
+import copy
 
-from veros.io_tools import netcdf as nctools
+from veros.io_tools import netcdf as nctools, zarr as zarrtools, precision, writer
 from veros.signals import do_not_disturb
 from veros.state import VerosVariables
 from veros import distributed, runtime_settings, time
+from veros.core.operators import device_get, prefetch_to_host
 
 
 class VerosDiagnostic(metaclass=abc.ABCMeta):
@@ -20,10 +22,16 @@ class VerosDiagnostic(metaclass=abc.ABCMeta):
 
     output_path = None
     output_variables = None
+    output_format = "netcdf"  #: Either "netcdf" or "zarr" (directory store, requires zarr)
+    output_specs = None  #: Dict mapping output variables to :class:`~veros.diagnostics.OutputSpec` (reduced output)
+    output_keepbits = None  #: Dict mapping output variables to number of mantissa bits to keep (lossy bit-rounding)
+    output_tolerance = None  #: Dict mapping output variables to absolute error tolerance (lossy quantization)
 
     var_meta = None  #: Metadata of internal variables
     extra_dimensions = None  #: Dict of extra dimensions used in var_meta
 
+    _output_buffers = None
+
     def __init__(self, state):
         pass
 
@@ -42,6 +50,17 @@ class VerosDiagnostic(metaclass=abc.ABCMeta):
         """Called with frequency ``output_frequency``."""
         pass
 
+    def get_required_variables(self, state):
+        """Names of model variables read by :meth:`diagnose` or :meth:`output`.
+
+        Used to decide whether variables that are only computed for diagnostics are needed.
+        """
+        return self.output_variables or ()
+
+    def prepare_restart(self, state):
+        """Called before variables are written to restart files or checkpoints."""
+        pass
+
     def initialize_variables(self, state):
         if self.var_meta is None:
             self.variables = None
@@ -60,37 +79,175 @@ class VerosDiagnostic(metaclass=abc.ABCMeta):
     def get_output_file_name(self, state):
         statedict = dict(state.variables.items())
         statedict.update(state.settings.items())
-        return self.output_path.format(**statedict)
+        output_path = self.output_path.format(**statedict)
+
+        if self.output_format == "zarr" and output_path.endswith(".nc"):
+            output_path = output_path[: -len(".nc")] + ".zarr"
+
+        return output_path
+
+    def _get_io_module(self):
+        io_modules = {"netcdf": nctools, "zarr": zarrtools}
+
+        if self.output_format not in io_modules:
+            raise ValueError(
+                f'unknown output format "{self.output_format}" for diagnostic "{self.name}" '
+                f"(must be one of {tuple(io_modules.keys())})"
+            )
+
+        return io_modules[self.output_format]
+
+    def _get_output_meta(self):
+        """Metadata of output variables, with dimensions renamed according to output specs"""
+        output_specs = self.output_specs or {}
+        output_keepbits = self.output_keepbits or {}
+        output_tolerance = self.output_tolerance or {}
+        output_meta = {}
+
+        for key in self.output_variables:
+            var = copy.copy(self.var_meta[key])
+
+            if key in output_specs:
+                var.dims = output_specs[key].get_output_dims(var.dims)
+
+            # document precision of lossy output
+            var.extra_attributes = dict(var.extra_attributes)
+            if key in output_keepbits:
+                var.extra_attributes.update(bitround_keepbits=output_keepbits[key])
+
+            if key in output_tolerance:
+                var.extra_attributes.update(quantization_tolerance=output_tolerance[key])
+
+            output_meta[key] = var
+
+        return output_meta
+
+    def _get_reduced_dimensions(self, state):
+        """Sizes, chunk sizes, and coordinates of all dimensions introduced by output specs"""
+        output_specs = self.output_specs or {}
+        nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+
+        specs_by_name = {}
+        sizes, chunks, coordinates = {}, {}, {}
+
+        for key in self.output_variables:
+            spec = output_specs.get(key)
+            if spec is None:
+                continue
+
+            if specs_by_name.setdefault(spec.name, spec) != spec:
+                raise ValueError(f'Found different output specs with name "{spec.name}" in diagnostic "{self.name}"')
+
+            spec.validate(state)
+
+            for dim, (reduced_dim, size, chunk_size) in spec.get_dimensions(state).items():
+                if reduced_dim in sizes or not state.var_meta[dim].active:
+                    continue
+
+                var = copy.copy(state.var_meta[dim])
+                var.dims = (reduced_dim,)
+                var_data = nctools.prepare_variable_data(state, state.var_meta[dim], state.variables.get(dim))
+
+                sizes[reduced_dim] = size
+                chunks[reduced_dim] = chunk_size
+                coordinates[reduced_dim] = (var, *spec.reduce(nx, ny, (dim,), var_data))
+
+        return sizes, chunks, coordinates
+
+    def _has_output_spec(self, key):
+        return bool(self.output_specs) and key in self.output_specs
+
+    def _reduce_precision(self, key, var_data):
+        if var_data is None:
+            return None
+
+        keepbits = (self.output_keepbits or {}).get(key)
+        tolerance = (self.output_tolerance or {}).get(key)
+        return precision.reduce_precision(var_data, keepbits=keepbits, tolerance=tolerance)
+
+    def _validate_precision(self):
+        output_keepbits = self.output_keepbits or {}
+        output_tolerance = self.output_tolerance or {}
+
+        for key in set(output_keepbits) | set(output_tolerance):
+            if key not in self.output_variables:
+                raise ValueError(
+                    f'Precision given for {key}, which is not an output variable of diagnostic "{self.name}"'
+                )
+
+            dtype = self.var_meta[key].dtype or runtime_settings.float_type
+
+            try:
+                precision.validate_precision(dtype, output_keepbits.get(key), output_tolerance.get(key))
+            except ValueError as exc:
+                raise ValueError(
+                    f'Invalid output precision for variable {key} of diagnostic "{self.name}": {exc}'
+                ) from None
 
     @do_not_disturb
     def initialize_output(self, state):
+        if self.output_variables:
+            self._validate_precision()
+
         inactive = not self.output_frequency and not self.sampling_frequency
         no_output = not self.output_path or not self.output_variables
 
         if runtime_settings.diskless_mode or inactive or no_output:
             return
 
+        io_module = self._get_io_module()
         output_path = self.get_output_file_name(state)
-        if os.path.isfile(output_path) and not runtime_settings.force_overwrite:
+        if os.path.exists(output_path) and not runtime_settings.force_overwrite:
             raise IOError(
                 f'output file {output_path} for diagnostic "{self.name}" exists '
                 "(change output path or enable force_overwrite runtime setting)"
             )
 
+        # make sure no pending output job is accessing the file
+        writer.wait()
+        io_module.close_output_file(output_path)
+
         # possible race condition ahead!
         distributed.barrier()
 
+        output_meta = self._get_output_meta()
+        reduced_sizes, reduced_chunks, reduced_coordinates = self._get_reduced_dimensions(state)
+
+        extra_dimensions = dict(self.extra_dimensions or {})
+        extra_dimensions.update(reduced_sizes)
+
+        file_kwargs = dict(extra_dimensions=extra_dimensions, coordinates=reduced_coordinates, chunks=reduced_chunks)
+        nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+
+        def write_static_variables(outfile):
+            for key, var in output_meta.items():
+                if var.time_dependent:
+                    continue
+
+                var_data = nctools.prepare_variable_data(state, self.var_meta[key], self.variables.get(key))
+
+                if self._has_output_spec(key):
+                    selection, var_data = self.output_specs[key].reduce(nx, ny, self.var_meta[key].dims, var_data)
+                    io_module.store_selection(key, self._reduce_precision(key, var_data), outfile, selection)
+                else:
+                    io_module.store_variable(key, self._reduce_precision(key, var_data), outfile, nx, ny)
+
+        if io_module is zarrtools:
+            zarrtools.initialize_file(state, output_path, output_meta, **file_kwargs)
+
+            with zarrtools.output_file(output_path) as store:
+                write_static_variables(store)
+
+            return
+
         with nctools.threaded_io(output_path, "w") as outfile:
-            nctools.initialize_file(state, outfile, extra_dimensions=self.extra_dimensions)
+            nctools.initialize_file(state, outfile, **file_kwargs)
 
-            for key in self.output_variables:
-                var = self.var_meta[key]
+            for key, var in output_meta.items():
                 if key not in outfile.variables:
-                    nctools.initialize_variable(state, key, var, outfile)
+                    nctools.initialize_variable(state, key, var, outfile, chunks=reduced_chunks)
 
-                if not var.time_dependent:
-                    var_data = self.variables.get(key)
-                    nctools.write_variable(state, key, var, var_data, outfile)
+            write_static_variables(outfile)
 
     @do_not_disturb
     def write_output(self, state):
@@ -99,11 +256,65 @@ class VerosDiagnostic(metaclass=abc.ABCMeta):
         if runtime_settings.diskless_mode:
             return
 
-        with nctools.threaded_io(self.get_output_file_name(state), "r+") as outfile:
-            current_days = time.convert_time(vs.time, "seconds", "days")
-            nctools.advance_time(current_days, outfile)
+        io_module = self._get_io_module()
+        output_path = self.get_output_file_name(state)
+        current_days = time.convert_time(vs.time, "seconds", "days")
+        nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+
+        # masks are fetched now, since the state keeps changing while the job is pending
+        device_data = {
+            key: (self.variables.get(key), self.var_meta[key].get_mask(state.settings, vs))
+            for key in self.output_variables
+        }
+        device_data = (device_data, vs.tau)
+
+        # device arrays are immutable, so they can be transferred to the host in the background
+        # (NumPy arrays have to be copied right away, and buffers can only be re-used if the
+        # data is written right away)
+        transfer_in_background = writer.use_async_writer() and runtime_settings.backend == "jax"
+        reuse_buffers = not writer.use_async_writer()
+
+        if self._output_buffers is None:
+            self._output_buffers = {}
+
+        if transfer_in_background:
+            # start all transfers without waiting for them
+            prefetch_to_host(device_data)
+            prepared_output = None
+        else:
+            buffers = self._output_buffers if reuse_buffers else None
+            prepared_output = self._prepare_output(device_get(device_data), nx, ny, buffers)
+
+        def write_job():
+            if prepared_output is None:
+                output_data, selections = self._prepare_output(device_get(device_data), nx, ny)
+            else:
+                output_data, selections = prepared_output
+
+            with io_module.output_file(output_path) as outfile:
+                outfile.write_record(current_days, output_data, nx, ny, selections=selections)
+
+        writer.submit(write_job)
+
+    def _prepare_output(self, host_data, nx, ny, buffers=None):
+        """Convert host data to output layout and apply output specs and precision.
+
+        Does not require access to the Veros state.
+        """
+        host_data, tau = host_data
+        output_data, selections = {}, {}
+
+        for key, (var_data, gridmask) in host_data.items():
+            out = buffers.get(key) if buffers is not None else None
+            var_data = nctools.convert_variable_data(self.var_meta[key], var_data, gridmask, tau, out=out)
+
+            if buffers is not None:
+                buffers[key] = var_data
+
+            if self._has_output_spec(key):
+                # only reduced data leaves this process
+                selections[key], var_data = self.output_specs[key].reduce(nx, ny, self.var_meta[key].dims, var_data)
+
+            output_data[key] = self._reduce_precision(key, var_data)
 
-            for key in self.output_variables:
-                var = self.var_meta[key]
-                var_data = self.variables.get(key)
-                nctools.write_variable(state, key, var, var_data, outfile)
+        return output_data, selections
@@ -1,7 +1,7 @@
 from veros import logger
 from veros.core.operators import numpy as npx
 from veros.diagnostics.base import VerosDiagnostic
-from veros.distributed import global_max
+from veros.distributed import global_reduce
 
 
 class CFLMonitor(VerosDiagnostic):
@@ -27,29 +27,30 @@ class CFLMonitor(VerosDiagnostic):
         vs = state.variables
         settings = state.settings
 
-        cfl = global_max(
-            max(
-                npx.max(
-                    npx.abs(vs.u[2:-2, 2:-2, :, vs.tau])
-                    * vs.maskU[2:-2, 2:-2, :]
-                    / (vs.cost[npx.newaxis, 2:-2, npx.newaxis] * vs.dxt[2:-2, npx.newaxis, npx.newaxis])
-                    * settings.dt_tracer
+        cfl, wcfl = global_reduce(
+            (
+                max(
+                    npx.max(
+                        npx.abs(vs.u[2:-2, 2:-2, :, vs.tau])
+                        * vs.maskU[2:-2, 2:-2, :]
+                        / (vs.cost[npx.newaxis, 2:-2, npx.newaxis] * vs.dxt[2:-2, npx.newaxis, npx.newaxis])
+                        * settings.dt_tracer
+                    ),
+                    npx.max(
+                        npx.abs(vs.v[2:-2, 2:-2, :, vs.tau])
+                        * vs.maskV[2:-2, 2:-2, :]
+                        / vs.dyt[npx.newaxis, 2:-2, npx.newaxis]
+                        * settings.dt_tracer
+                    ),
                 ),
                 npx.max(
-                    npx.abs(vs.v[2:-2, 2:-2, :, vs.tau])
-                    * vs.maskV[2:-2, 2:-2, :]
-                    / vs.dyt[npx.newaxis, 2:-2, npx.newaxis]
+                    npx.abs(vs.w[2:-2, 2:-2, :, vs.tau])
+                    * vs.maskW[2:-2, 2:-2, :]
+                    / vs.dzt[npx.newaxis, npx.newaxis, :]
                     * settings.dt_tracer
                 ),
-            )
-        )
-        wcfl = global_max(
-            npx.max(
-                npx.abs(vs.w[2:-2, 2:-2, :, vs.tau])
-                * vs.maskW[2:-2, 2:-2, :]
-                / vs.dzt[npx.newaxis, npx.newaxis, :]
-                * settings.dt_tracer
-            )
+            ),
+            op="max",
         )
 
         if npx.isnan(cfl) or npx.isnan(wcfl):
@@ -59,29 +60,30 @@ class CFLMonitor(VerosDiagnostic):
         logger.diagnostic(f" Maximal ver. CFL number = {wcfl}")
 
         if settings.enable_eke or settings.enable_tke or settings.enable_idemix:
-            cfl = global_max(
-                max(
-                    npx.max(
-                        npx.abs(vs.u_wgrid[2:-2, 2:-2, :])
-                        * vs.maskU[2:-2, 2:-2, :]
-                        / (vs.cost[npx.newaxis, 2:-2, npx.newaxis] * vs.dxt[2:-2, npx.newaxis, npx.newaxis])
-                        * settings.dt_tracer
+            cfl, wcfl = global_reduce(
+                (
+                    max(
+                        npx.max(
+                            npx.abs(vs.u_wgrid[2:-2, 2:-2, :])
+                            * vs.maskU[2:-2, 2:-2, :]
+                            / (vs.cost[npx.newaxis, 2:-2, npx.newaxis] * vs.dxt[2:-2, npx.newaxis, npx.newaxis])
+                            * settings.dt_tracer
+                        ),
+                        npx.max(
+                            npx.abs(vs.v_wgrid[2:-2, 2:-2, :])
+                            * vs.maskV[2:-2, 2:-2, :]
+                            / vs.dyt[npx.newaxis, 2:-2, npx.newaxis]
+                            * settings.dt_tracer
+                        ),
                     ),
                     npx.max(
-                        npx.abs(vs.v_wgrid[2:-2, 2:-2, :])
-                        * vs.maskV[2:-2, 2:-2, :]
-                        / vs.dyt[npx.newaxis, 2:-2, npx.newaxis]
+                        npx.abs(vs.w_wgrid[2:-2, 2:-2, :])
+                        * vs.maskW[2:-2, 2:-2, :]
+                        / vs.dzt[npx.newaxis, npx.newaxis, :]
                         * settings.dt_tracer
                     ),
-                )
-            )
-            wcfl = global_max(
-                npx.max(
-                    npx.abs(vs.w_wgrid[2:-2, 2:-2, :])
-                    * vs.maskW[2:-2, 2:-2, :]
-                    / vs.dzt[npx.newaxis, npx.newaxis, :]
-                    * settings.dt_tracer
-                )
+                ),
+                op="max",
             )
             logger.diagnostic(f" Maximal hor. CFL number on w grid = {cfl}")
             logger.diagnostic(f" Maximal ver. CFL number on w grid = {wcfl}")
@@ -1,11 +1,10 @@
 import os
 
-from veros import veros_kernel, KernelOutput, runtime_settings
+from veros import veros_kernel, runtime_settings
 from veros.core.operators import numpy as npx, update_multiply, at
 from veros.diagnostics.base import VerosDiagnostic
 from veros.variables import Variable
-from veros.distributed import global_sum
-
+from veros.distributed import global_reduce
 
 ENERGY_VARIABLES = dict(
     nitts=Variable("nitts", None, write_to_restart=True),
@@ -108,18 +107,28 @@ ENERGY_VARIABLES = dict(
 DEFAULT_OUTPUT_VARS = [var for var in ENERGY_VARIABLES.keys() if var not in ("nitts",)]
 
 
+#: Energy terms in the order returned by :func:`diagnose_kernel`
+ENERGY_TERMS = tuple(DEFAULT_OUTPUT_VARS)
+
+
 class Energy(VerosDiagnostic):
-    """Diagnose globally averaged energy cycle. Also averages energy in time."""
+    """Diagnose globally averaged energy cycle. Also averages energy in time.
+
+    All energy terms are computed in a single kernel and reduced across processes
+    in a single operation.
+    """
 
     name = "energy"  #:
     output_path = "{identifier}.energy.nc"  #: File to write to. May contain format strings that are replaced with Veros attributes.
     output_frequency = None  #: Frequency (in seconds) in which output is written.
     sampling_frequency = None  #: Frequency (in seconds) in which variables are accumulated.
+    accumulate_locally = False  #: Accumulate energies on each process (and device) and only reduce them upon output (or when writing restarts). Makes sampling every time step cheap.
 
     var_meta = ENERGY_VARIABLES
 
     def __init__(self, state):
         self.output_variables = DEFAULT_OUTPUT_VARS.copy()
+        self._local_sums = None
 
     def initialize(self, state):
         self.initialize_variables(state)
@@ -128,17 +137,36 @@ class Energy(VerosDiagnostic):
     def diagnose(self, state):
         energies = diagnose_kernel(state)
 
-        # store results
-        for energy, val in energies._asdict().items():
+        if self._local_sums is None:
+            self._local_sums = energies
+        else:
+            self._local_sums = self._local_sums + energies
+
+        self.variables.nitts = self.variables.nitts + 1
+
+        if not self.accumulate_locally:
+            self._reduce_local_sums()
+
+    def _reduce_local_sums(self):
+        if self._local_sums is None:
+            return
+
+        (energies,) = global_reduce((self._local_sums,), op="sum")
+        self._local_sums = None
+
+        for energy, val in zip(ENERGY_TERMS, energies):
             total_val = self.variables.get(energy)
             setattr(self.variables, energy, total_val + val)
 
-        self.variables.nitts = self.variables.nitts + 1
+    def prepare_restart(self, state):
+        self._reduce_local_sums()
 
     def output(self, state):
-        if not os.path.isfile(self.get_output_file_name(state)):
+        if not os.path.exists(self.get_output_file_name(state)):
             self.initialize_output(state)
 
+        self._reduce_local_sums()
+
         energy_vs = self.variables
         nitts = float(energy_vs.nitts or 1)
 
@@ -156,57 +184,53 @@ class Energy(VerosDiagnostic):
 
 @veros_kernel
 def diagnose_kernel(state):
+    """Compute all energy terms on the local domain (without reducing across processes).
+
+    Returns a single array containing all terms in the order given by ``ENERGY_TERMS``.
+    """
     vs = state.variables
     settings = state.settings
 
     # changes of dynamic enthalpy
     vol_t = vs.area_t[2:-2, 2:-2, npx.newaxis] * vs.dzt[npx.newaxis, npx.newaxis, :] * vs.maskT[2:-2, 2:-2, :]
 
-    dP_iso = global_sum(
-        npx.sum(
-            vol_t
-            * settings.grav
-            / settings.rho_0
-            * (
-                -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_iso[2:-2, 2:-2, :]
-                - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_iso[2:-2, 2:-2, :]
-            )
+    dP_iso = npx.sum(
+        vol_t
+        * settings.grav
+        / settings.rho_0
+        * (
+            -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_iso[2:-2, 2:-2, :]
+            - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_iso[2:-2, 2:-2, :]
         )
     )
 
-    dP_hmix = global_sum(
-        npx.sum(
-            vol_t
-            * settings.grav
-            / settings.rho_0
-            * (
-                -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_hmix[2:-2, 2:-2, :]
-                - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_hmix[2:-2, 2:-2, :]
-            )
+    dP_hmix = npx.sum(
+        vol_t
+        * settings.grav
+        / settings.rho_0
+        * (
+            -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_hmix[2:-2, 2:-2, :]
+            - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_hmix[2:-2, 2:-2, :]
         )
     )
 
-    dP_vmix = global_sum(
-        npx.sum(
-            vol_t
-            * settings.grav
-            / settings.rho_0
-            * (
-                -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_vmix[2:-2, 2:-2, :]
-                - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_vmix[2:-2, 2:-2, :]
-            )
+    dP_vmix = npx.sum(
+        vol_t
+        * settings.grav
+        / settings.rho_0
+        * (
+            -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp_vmix[2:-2, 2:-2, :]
+            - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt_vmix[2:-2, 2:-2, :]
         )
     )
 
-    dP_m = global_sum(
-        npx.sum(
-            vol_t
-            * settings.grav
-            / settings.rho_0
-            * (
-                -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp[2:-2, 2:-2, :, vs.tau]
-                - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt[2:-2, 2:-2, :, vs.tau]
-            )
+    dP_m = npx.sum(
+        vol_t
+        * settings.grav
+        / settings.rho_0
+        * (
+            -vs.int_drhodT[2:-2, 2:-2, :, vs.tau] * vs.dtemp[2:-2, 2:-2, :, vs.tau]
+            - vs.int_drhodS[2:-2, 2:-2, :, vs.tau] * vs.dsalt[2:-2, 2:-2, :, vs.tau]
         )
     )
 
@@ -215,25 +239,21 @@ def diagnose_kernel(state):
     # changes of kinetic energy
     vol_u = vs.area_u[2:-2, 2:-2, npx.newaxis] * vs.dzt[npx.newaxis, npx.newaxis, :]
     vol_v = vs.area_v[2:-2, 2:-2, npx.newaxis] * vs.dzt[npx.newaxis, npx.newaxis, :]
-    k_m = global_sum(
-        npx.sum(
-            vol_t
-            * 0.5
-            * (
-                0.5 * (vs.u[2:-2, 2:-2, :, vs.tau] ** 2 + vs.u[1:-3, 2:-2, :, vs.tau] ** 2)
-                + 0.5 * (vs.v[2:-2, 2:-2, :, vs.tau] ** 2)
-                + vs.v[2:-2, 1:-3, :, vs.tau] ** 2
-            )
+    k_m = npx.sum(
+        vol_t
+        * 0.5
+        * (
+            0.5 * (vs.u[2:-2, 2:-2, :, vs.tau] ** 2 + vs.u[1:-3, 2:-2, :, vs.tau] ** 2)
+            + 0.5 * (vs.v[2:-2, 2:-2, :, vs.tau] ** 2)
+            + vs.v[2:-2, 1:-3, :, vs.tau] ** 2
         )
     )
-    p_m = global_sum(npx.sum(vol_t * vs.Hd[2:-2, 2:-2, :, vs.tau]))
-    dk_m = global_sum(
-        npx.sum(
-            vs.u[2:-2, 2:-2, :, vs.tau] * vs.du[2:-2, 2:-2, :, vs.tau] * vol_u
-            + vs.v[2:-2, 2:-2, :, vs.tau] * vs.dv[2:-2, 2:-2, :, vs.tau] * vol_v
-            + vs.u[2:-2, 2:-2, :, vs.tau] * vs.du_mix[2:-2, 2:-2, :] * vol_u
-            + vs.v[2:-2, 2:-2, :, vs.tau] * vs.dv_mix[2:-2, 2:-2, :] * vol_v
-        )
+    p_m = npx.sum(vol_t * vs.Hd[2:-2, 2:-2, :, vs.tau])
+    dk_m = npx.sum(
+        vs.u[2:-2, 2:-2, :, vs.tau] * vs.du[2:-2, 2:-2, :, vs.tau] * vol_u
+        + vs.v[2:-2, 2:-2, :, vs.tau] * vs.dv[2:-2, 2:-2, :, vs.tau] * vol_v
+        + vs.u[2:-2, 2:-2, :, vs.tau] * vs.du_mix[2:-2, 2:-2, :] * vol_u
+        + vs.v[2:-2, 2:-2, :, vs.tau] * vs.dv_mix[2:-2, 2:-2, :] * vol_v
     )
 
     # K*Nsqr and KE and dyn. enthalpy dissipation
@@ -241,7 +261,7 @@ def diagnose_kernel(state):
     vol_w = update_multiply(vol_w, at[:, :, -1], 0.5)
 
     def mean_w(var):
-        return global_sum(npx.sum(var[2:-2, 2:-2, :] * vol_w))
+        return npx.sum(var[2:-2, 2:-2, :] * vol_w)
 
     mdiss_vmix = mean_w(vs.P_diss_v)
     mdiss_nonlin = mean_w(vs.P_diss_nonlin)
@@ -256,52 +276,44 @@ def diagnose_kernel(state):
     mdiss_gm = mean_w(vs.K_diss_gm)
     mdiss_bot = mean_w(vs.K_diss_bot)
 
-    wrhom = global_sum(
-        npx.sum(
-            -vs.area_t[2:-2, 2:-2, npx.newaxis]
-            * vs.maskW[2:-2, 2:-2, :-1]
-            * (vs.p_hydro[2:-2, 2:-2, 1:] - vs.p_hydro[2:-2, 2:-2, :-1])
-            * vs.w[2:-2, 2:-2, :-1, vs.tau]
-        )
+    wrhom = npx.sum(
+        -vs.area_t[2:-2, 2:-2, npx.newaxis]
+        * vs.maskW[2:-2, 2:-2, :-1]
+        * (vs.p_hydro[2:-2, 2:-2, 1:] - vs.p_hydro[2:-2, 2:-2, :-1])
+        * vs.w[2:-2, 2:-2, :-1, vs.tau]
     )
 
     # wind work
     if runtime_settings.pyom_compatibility_mode:
         # surface_tau* has different units in PyOM
-        wind = global_sum(
-            npx.sum(
-                vs.u[2:-2, 2:-2, -1, vs.tau]
-                * vs.surface_taux[2:-2, 2:-2]
-                * vs.maskU[2:-2, 2:-2, -1]
-                * vs.area_u[2:-2, 2:-2]
-                + vs.v[2:-2, 2:-2, -1, vs.tau]
-                * vs.surface_tauy[2:-2, 2:-2]
-                * vs.maskV[2:-2, 2:-2, -1]
-                * vs.area_v[2:-2, 2:-2]
-            )
+        wind = npx.sum(
+            vs.u[2:-2, 2:-2, -1, vs.tau]
+            * vs.surface_taux[2:-2, 2:-2]
+            * vs.maskU[2:-2, 2:-2, -1]
+            * vs.area_u[2:-2, 2:-2]
+            + vs.v[2:-2, 2:-2, -1, vs.tau]
+            * vs.surface_tauy[2:-2, 2:-2]
+            * vs.maskV[2:-2, 2:-2, -1]
+            * vs.area_v[2:-2, 2:-2]
         )
     else:
-        wind = global_sum(
-            npx.sum(
-                vs.u[2:-2, 2:-2, -1, vs.tau]
-                * vs.surface_taux[2:-2, 2:-2]
-                / settings.rho_0
-                * vs.maskU[2:-2, 2:-2, -1]
-                * vs.area_u[2:-2, 2:-2]
-                + vs.v[2:-2, 2:-2, -1, vs.tau]
-                * vs.surface_tauy[2:-2, 2:-2]
-                / settings.rho_0
-                * vs.maskV[2:-2, 2:-2, -1]
-                * vs.area_v[2:-2, 2:-2]
-            )
+        wind = npx.sum(
+            vs.u[2:-2, 2:-2, -1, vs.tau]
+            * vs.surface_taux[2:-2, 2:-2]
+            / settings.rho_0
+            * vs.maskU[2:-2, 2:-2, -1]
+            * vs.area_u[2:-2, 2:-2]
+            + vs.v[2:-2, 2:-2, -1, vs.tau]
+            * vs.surface_tauy[2:-2, 2:-2]
+            / settings.rho_0
+            * vs.maskV[2:-2, 2:-2, -1]
+            * vs.area_v[2:-2, 2:-2]
         )
 
     # meso-scale energy
     if settings.enable_eke:
         eke_m = mean_w(vs.eke[..., vs.tau])
-        deke_m = global_sum(
-            npx.sum(vol_w * (vs.eke[2:-2, 2:-2, :, vs.taup1] - vs.eke[2:-2, 2:-2, :, vs.tau]) / settings.dt_tracer)
-        )
+        deke_m = npx.sum(vol_w * (vs.eke[2:-2, 2:-2, :, vs.taup1] - vs.eke[2:-2, 2:-2, :, vs.tau]) / settings.dt_tracer)
         eke_diss = mean_w(vs.eke_diss_iw)
         eke_diss_tke = mean_w(vs.eke_diss_tke)
     else:
@@ -316,12 +328,10 @@ def diagnose_kernel(state):
         tke_m = mean_w(vs.tke[..., vs.tau])
         dtke_m = mean_w((vs.tke[..., vs.taup1] - vs.tke[..., vs.tau]) / dt_tke)
         tke_diss = mean_w(vs.tke_diss)
-        tke_forc = global_sum(
-            npx.sum(
-                vs.area_t[2:-2, 2:-2]
-                * vs.maskW[2:-2, 2:-2, -1]
-                * (vs.forc_tke_surface[2:-2, 2:-2] + vs.tke_surf_corr[2:-2, 2:-2])
-            )
+        tke_forc = npx.sum(
+            vs.area_t[2:-2, 2:-2]
+            * vs.maskW[2:-2, 2:-2, -1]
+            * (vs.forc_tke_surface[2:-2, 2:-2] + vs.tke_surf_corr[2:-2, 2:-2])
         )
     else:
         tke_m = dtke_m = tke_diss = tke_forc = 0.0
@@ -329,20 +339,16 @@ def diagnose_kernel(state):
     # internal wave energy
     if settings.enable_idemix:
         iw_m = mean_w(vs.E_iw[..., vs.tau])
-        diw_m = global_sum(
-            npx.sum(vol_w * (vs.E_iw[2:-2, 2:-2, :, vs.taup1] - vs.E_iw[2:-2, 2:-2, :, vs.tau]) / vs.dt_tracer)
-        )
+        diw_m = npx.sum(vol_w * (vs.E_iw[2:-2, 2:-2, :, vs.taup1] - vs.E_iw[2:-2, 2:-2, :, vs.tau]) / vs.dt_tracer)
         iw_diss = mean_w(vs.iw_diss)
 
         k = npx.maximum(1, vs.kbot[2:-2, 2:-2]) - 1
         mask = k[:, :, npx.newaxis] == npx.arange(settings.nz)[npx.newaxis, npx.newaxis, :]
-        iwforc = global_sum(
-            npx.sum(
-                vs.area_t[2:-2, 2:-2]
-                * (
-                    vs.forc_iw_surface[2:-2, 2:-2] * vs.maskW[2:-2, 2:-2, -1]
-                    + npx.sum(mask * vs.forc_iw_bottom[2:-2, 2:-2, npx.newaxis] * vs.maskW[2:-2, 2:-2, :], axis=2)
-                )
+        iwforc = npx.sum(
+            vs.area_t[2:-2, 2:-2]
+            * (
+                vs.forc_iw_surface[2:-2, 2:-2] * vs.maskW[2:-2, 2:-2, -1]
+                + npx.sum(mask * vs.forc_iw_bottom[2:-2, 2:-2, npx.newaxis] * vs.maskW[2:-2, 2:-2, :], axis=2)
             )
         )
     else:
@@ -363,7 +369,7 @@ def diagnose_kernel(state):
         hd_eke_m = hd_eke_m - mdiss_hmix - mdiss_iso
         tke_hd_m = tke_hd_m - mdiss_nonlin
 
-    return KernelOutput(
+    energies = dict(
         k_m=k_m,
         Hd_m=p_m,
         eke_m=eke_m,
@@ -396,3 +402,5 @@ def diagnose_kernel(state):
         cabb_m=mdiss_nonlin,
         cabb_iso_m=mdiss_hmix + mdiss_iso,
     )
+
+    return npx.stack([npx.asarray(energies[term], dtype=vol_t.dtype) for term in ENERGY_TERMS])
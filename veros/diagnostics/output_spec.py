@@ -0,0 +1,204 @@
+"""
+Reduced output of diagnostic variables (coarsening, regional subsets, level selection).
+
+Reductions are applied by every process to its local data, before the data is handed
+to the I/O layer, so only the reduced data is written.
+"""
+
+import math
+
+import numpy as np
+
+from veros import distributed, variables as var_mod
+
+X_DIMS, Y_DIMS = distributed.SCATTERED_DIMENSIONS
+Z_DIMS = ("zt", "zw")
+
+
+def _block_mean(data, factors, fill_value):
+    """Mean over blocks of the given size along each axis, ignoring cells containing the fill value"""
+    block_shape = []
+    for size, factor in zip(data.shape, factors):
+        block_shape.extend((size // factor, factor))
+
+    block_axes = tuple(range(1, 2 * data.ndim, 2))
+
+    valid = data != fill_value
+    total = np.where(valid, data, 0).reshape(block_shape).sum(axis=block_axes, dtype="float64")
+    count = valid.reshape(block_shape).sum(axis=block_axes)
+
+    out = np.full(total.shape, fill_value, dtype=data.dtype)
+    np.copyto(out, total / np.maximum(count, 1), where=count > 0, casting="unsafe")
+    return out
+
+
+class OutputSpec:
+    """Specifies how a variable is reduced before it is written to an output file.
+
+    Arguments:
+        name (str): Identifies this spec in output files. Reduced dimensions are called
+            ``<dim>_<name>`` (e.g. ``xt_coarse``), with matching coordinate variables.
+        coarsen (tuple): Number of grid cells in x and y direction that are averaged into one
+            output cell (masked cells are ignored). Local domain size on every process must be
+            divisible by these.
+        region (tuple): Global index range ``(x_start, x_stop, y_start, y_stop)`` of grid cells
+            (without ghost cells) to write, or None for the whole domain. Bounds must be
+            divisible by the coarsening factors.
+        levels (iterable): Indices of vertical levels to write, or None for all levels.
+
+    Example:
+        >>> from veros.diagnostics import OutputSpec
+        >>> surface = OutputSpec("surface_coarse", coarsen=(4, 4), levels=[-1])
+        >>> state.diagnostics["snapshot"].output_specs = {"temp": surface, "u": surface}
+
+    """
+
+    def __init__(self, name, coarsen=(1, 1), region=None, levels=None):
+        self.name = name
+        self.coarsen = tuple(int(c) for c in coarsen)
+        self.region = None if region is None else tuple(int(r) for r in region)
+        self.levels = None if levels is None else tuple(int(k) for k in levels)
+
+    def __eq__(self, other):
+        if not isinstance(other, OutputSpec):
+            return NotImplemented
+
+        return (self.name, self.coarsen, self.region, self.levels) == (
+            other.name,
+            other.coarsen,
+            other.region,
+            other.levels,
+        )
+
+    def __hash__(self):
+        return hash((self.name, self.coarsen, self.region, self.levels))
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__qualname__}(name={self.name!r}, coarsen={self.coarsen}, "
+            f"region={self.region}, levels={self.levels})"
+        )
+
+    def _get_reduced_dims(self):
+        reduced_dims = ()
+
+        if self.coarsen != (1, 1) or self.region is not None:
+            reduced_dims += X_DIMS + Y_DIMS
+
+        if self.levels is not None:
+            reduced_dims += Z_DIMS
+
+        return reduced_dims
+
+    def _get_range(self, axis, size):
+        if self.region is None:
+            return 0, size
+
+        return self.region[2 * axis : 2 * axis + 2]
+
+    def validate(self, state):
+        nx, ny, nz = state.dimensions["xt"], state.dimensions["yt"], state.dimensions["zt"]
+        local_size = distributed.get_chunk_size(nx, ny)
+
+        if len(self.coarsen) != 2:
+            raise ValueError(f'Output spec "{self.name}": coarsen must contain 2 values')
+
+        if self.region is not None and len(self.region) != 4:
+            raise ValueError(f'Output spec "{self.name}": region must contain 4 values')
+
+        for axis, (size, nl, factor) in enumerate(zip((nx, ny), local_size, self.coarsen)):
+            if factor < 1 or nl % factor:
+                raise ValueError(
+                    f'Output spec "{self.name}": local domain size {nl} is not divisible by coarsening factor {factor}'
+                )
+
+            start, stop = self._get_range(axis, size)
+            if not 0 <= start < stop <= size or start % factor or stop % factor:
+                raise ValueError(
+                    f'Output spec "{self.name}": invalid region bounds ({start}, {stop}) '
+                    f"(must be within (0, {size}) and divisible by coarsening factor {factor})"
+                )
+
+        if self.levels is not None and not all(-nz <= k < nz for k in self.levels):
+            raise ValueError(f'Output spec "{self.name}": vertical levels must be between {-nz} and {nz - 1}')
+
+    def get_dimensions(self, state):
+        """Return dict ``{dimension: (reduced dimension, size, chunk size)}`` of all affected dimensions"""
+        nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+        local_size = distributed.get_chunk_size(nx, ny)
+
+        dimensions = {}
+
+        for dim in self._get_reduced_dims():
+            if dim in Z_DIMS:
+                dimensions[dim] = (f"{dim}_{self.name}", len(self.levels), len(self.levels))
+                continue
+
+            axis = 0 if dim in X_DIMS else 1
+            start, stop = self._get_range(axis, (nx, ny)[axis])
+            factor = self.coarsen[axis]
+            # chunks must not be shared between processes
+            chunk_size = math.gcd(local_size[axis] // factor, start // factor)
+            dimensions[dim] = (f"{dim}_{self.name}", (stop - start) // factor, chunk_size)
+
+        return dimensions
+
+    def get_output_dims(self, dims):
+        """Rename dimensions of a variable to the reduced dimensions"""
+        if dims is None:
+            return None
+
+        reduced_dims = self._get_reduced_dims()
+        return tuple(f"{dim}_{self.name}" if dim in reduced_dims else dim for dim in dims)
+
+    def reduce(self, nx, ny, dims, var_data):
+        """Reduce local data returned by :func:`veros.io_tools.netcdf.prepare_variable_data`.
+
+        Returns the selection of the reduced data in the output variable (without Time axis)
+        and the reduced data, or ``(None, None)`` if this process does not write any data.
+        """
+        if dims is None:
+            return (), var_data
+
+        dims = tuple(dim for dim in dims if dim not in var_mod.TIMESTEPS)
+
+        if not distributed.owns_tile(dims):
+            return None, None
+
+        global_slices, _ = distributed.get_chunk_slices(nx, ny, dims)
+
+        # undo transpose of output data
+        var_data = var_data.T
+
+        index, selection, factors = [], [], []
+
+        for dim, global_slice in zip(dims, global_slices):
+            if dim in X_DIMS or dim in Y_DIMS:
+                axis = 0 if dim in X_DIMS else 1
+                start, stop = self._get_range(axis, (nx, ny)[axis])
+                factor = self.coarsen[axis]
+
+                lower, upper = max(start, global_slice.start), min(stop, global_slice.stop)
+                if lower >= upper:
+                    return None, None
+
+                index.append(slice(lower - global_slice.start, upper - global_slice.start))
+                selection.append(slice((lower - start) // factor, (upper - start) // factor))
+                factors.append(factor)
+
+            elif dim in Z_DIMS and self.levels is not None:
+                index.append(list(self.levels))
+                selection.append(slice(None))
+                factors.append(1)
+
+            else:
+                index.append(slice(None))
+                selection.append(slice(None))
+                factors.append(1)
+
+        var_data = var_data[tuple(index)]
+
+        if any(factor > 1 for factor in factors):
+            var_data = _block_mean(var_data, factors, var_mod.get_fill_value(var_data.dtype))
+
+        return tuple(selection[::-1]), np.ascontiguousarray(var_data.T)
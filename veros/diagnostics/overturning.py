@@ -6,7 +6,7 @@ from veros.diagnostics.base import VerosDiagnostic
 from veros.core import density
 from veros.variables import Variable, allocate
 from veros.distributed import global_sum
-from veros.core.operators import numpy as npx, update, update_add, at, for_loop
+from veros.core.operators import numpy as npx, update, update_add, at, bincount, batch_interp
 
 
 VARIABLES = {
@@ -110,13 +110,19 @@ class Overturning(VerosDiagnostic):
 
         self.initialize_output(state)
 
+    def get_required_variables(self, state):
+        if state.settings.enable_neutral_diffusion and state.settings.enable_skew_diffusion:
+            return ("B1_gm",)
+
+        return ()
+
     def diagnose(self, state):
         ovt_vs = self.variables
         ovt_vs.update(diagnose_kernel(state, ovt_vs, self.p_ref))
         ovt_vs.nitts = ovt_vs.nitts + 1
 
     def output(self, state):
-        if not os.path.isfile(self.get_output_file_name(state)):
+        if not os.path.exists(self.get_output_file_name(state)):
             self.initialize_output(state)
 
         ovt_vs = self.variables
@@ -149,8 +155,7 @@ def _interpolate_depth_coords(coords, arr, interp_coords):
     coords = -coords
     interp_coords = -interp_coords
 
-    interp_vectorized = npx.vectorize(npx.interp, signature="(n),(m),(m)->(n)")
-    return interp_vectorized(interp_coords, coords, arr)
+    return batch_interp(interp_coords, coords, arr)
 
 
 @veros_kernel
@@ -171,6 +176,17 @@ def diagnose_kernel(state, ovt_vs, p_ref):
     # transports below isopycnals and area below isopycnals
     sig_loc_face = 0.5 * (sig_loc[2:-2, 2:-2, :] + sig_loc[2:-2, 3:-1, :])
 
+    # every cell contributes to all isopycnals with sigma < sig_loc_face, so we sum up
+    # all cells falling into the same sigma bin and accumulate from the densest bin
+    ny = sig_loc_face.shape[1]
+    sigma_bin = npx.searchsorted(ovt_vs.sigma, sig_loc_face, side="left")
+    bin_keys = (npx.arange(ny)[npx.newaxis, :, npx.newaxis] * (nlevel + 1) + sigma_bin).reshape(-1)
+
+    def sum_below_isopycnals(values):
+        binned = bincount(bin_keys, weights=values.reshape(-1), length=ny * (nlevel + 1))
+        binned = binned.reshape(ny, nlevel + 1)
+        return npx.cumsum(binned[:, ::-1], axis=1)[:, ::-1][:, 1:]
+
     trans = allocate(state.dimensions, ("yu", nlevel))
     z_sig = allocate(state.dimensions, ("yu", nlevel))
 
@@ -181,14 +197,8 @@ def diagnose_kernel(state, ovt_vs, p_ref):
         * vs.maskV[2:-2, 2:-2, :]
     )
 
-    def loop_body(m, values):
-        trans, z_sig = values
-        mask = sig_loc_face > ovt_vs.sigma[m]
-        trans = update(trans, at[2:-2, m], npx.sum(vs.v[2:-2, 2:-2, :, vs.tau] * fac * mask, axis=(0, 2)))
-        z_sig = update(z_sig, at[2:-2, m], npx.sum(fac * mask, axis=(0, 2)))
-        return (trans, z_sig)
-
-    trans, z_sig = for_loop(0, nlevel, loop_body, init_val=(trans, z_sig))
+    trans = update(trans, at[2:-2, :], sum_below_isopycnals(vs.v[2:-2, 2:-2, :, vs.tau] * fac))
+    z_sig = update(z_sig, at[2:-2, :], sum_below_isopycnals(fac))
     trans = zonal_sum(trans)
     z_sig = zonal_sum(z_sig)
 
@@ -198,31 +208,14 @@ def diagnose_kernel(state, ovt_vs, p_ref):
         # eddy-driven transports below isopycnals
         bolus_trans = allocate(state.dimensions, ("yu", nlevel))
 
-        def loop_body(m, bolus_trans):
-            mask = sig_loc_face > ovt_vs.sigma[m]
-            bolus_trans = update(
-                bolus_trans,
-                at[2:-2, m],
-                npx.sum(
-                    npx.sum(
-                        (vs.B1_gm[2:-2, 2:-2, 1:] - vs.B1_gm[2:-2, 2:-2, :-1])
-                        * vs.dxt[2:-2, npx.newaxis, npx.newaxis]
-                        * vs.cosu[npx.newaxis, 2:-2, npx.newaxis]
-                        * vs.maskV[2:-2, 2:-2, 1:]
-                        * mask[:, :, 1:],
-                        axis=2,
-                    )
-                    + vs.B1_gm[2:-2, 2:-2, 0]
-                    * vs.dxt[2:-2, npx.newaxis]
-                    * vs.cosu[npx.newaxis, 2:-2]
-                    * vs.maskV[2:-2, 2:-2, 0]
-                    * mask[:, :, 0],
-                    axis=0,
-                ),
-            )
-            return bolus_trans
+        B1_gm_diff = npx.concatenate(
+            (vs.B1_gm[2:-2, 2:-2, :1], vs.B1_gm[2:-2, 2:-2, 1:] - vs.B1_gm[2:-2, 2:-2, :-1]), axis=2
+        )
+        bolus_fac = (
+            vs.dxt[2:-2, npx.newaxis, npx.newaxis] * vs.cosu[npx.newaxis, 2:-2, npx.newaxis] * vs.maskV[2:-2, 2:-2, :]
+        )
 
-        bolus_trans = for_loop(0, nlevel, loop_body, init_val=bolus_trans)
+        bolus_trans = update(bolus_trans, at[2:-2, :], sum_below_isopycnals(B1_gm_diff * bolus_fac))
         bolus_trans = zonal_sum(bolus_trans)
 
     # streamfunction on geopotentials
@@ -1,4 +1,5 @@
 import functools
+import math
 
 from veros import runtime_settings as rs, runtime_state as rst
 from veros.routines import CURRENT_CONTEXT
@@ -150,6 +151,22 @@ def proc_index_to_rank(ix, iy):
     return ix + iy * rs.num_proc[0]
 
 
+def get_chunk_bounds(idx, num_chunks, chunk_size, n, include_overlap=False):
+    """Index range of chunk ``idx`` along an axis of ``n`` cells that is split into chunks of ``chunk_size`` cells.
+
+    Bounds are relative to the start of the chunk (``idx * chunk_size``), the last chunk takes all
+    remaining cells. With ``include_overlap``, bounds refer to arrays with ghost cells, and the ranges
+    of all chunks partition the whole axis (the outermost chunks also contain the outer ghost cells).
+    """
+    is_last = idx == num_chunks - 1
+    upper = n - idx * chunk_size if is_last else chunk_size
+
+    if not include_overlap:
+        return 0, upper
+
+    return (0 if idx == 0 else 2), (upper + 4 if is_last else upper + 2)
+
+
 def get_chunk_slices(nx, ny, dim_grid, proc_idx=None, include_overlap=False):
     if not dim_grid:
         return Ellipsis, Ellipsis
@@ -160,15 +177,8 @@ def get_chunk_slices(nx, ny, dim_grid, proc_idx=None, include_overlap=False):
     px, py = proc_idx
     nxl, nyl = get_chunk_size(nx, ny)
 
-    if include_overlap:
-        sxl = 0 if px == 0 else 2
-        sxu = nxl + 4 if (px + 1) == rs.num_proc[0] else nxl + 2
-        syl = 0 if py == 0 else 2
-        syu = nyl + 4 if (py + 1) == rs.num_proc[1] else nyl + 2
-    else:
-        sxl = syl = 0
-        sxu = nxl
-        syu = nyl
+    sxl, sxu = get_chunk_bounds(px, rs.num_proc[0], nxl, nx, include_overlap=include_overlap)
+    syl, syu = get_chunk_bounds(py, rs.num_proc[1], nyl, ny, include_overlap=include_overlap)
 
     global_slice, local_slice = [], []
 
@@ -186,6 +196,34 @@ def get_chunk_slices(nx, ny, dim_grid, proc_idx=None, include_overlap=False):
     return tuple(global_slice), tuple(local_slice)
 
 
+def get_halo_slices(nx, ny, dim_grid, proc_idx=None):
+    """Global slices of the local part of an array with ghost cells, including all overlap cells.
+
+    Reading these slices from a global array yields a fully populated local array
+    (no overlap exchange needed).
+    """
+    if not dim_grid:
+        return Ellipsis
+
+    if proc_idx is None:
+        proc_idx = proc_rank_to_index(rst.proc_rank)
+
+    px, py = proc_idx
+    nxl, nyl = get_chunk_size(nx, ny)
+
+    global_slice = []
+
+    for dim in dim_grid:
+        if dim in SCATTERED_DIMENSIONS[0]:
+            global_slice.append(slice(px * nxl, (px + 1) * nxl + 4))
+        elif dim in SCATTERED_DIMENSIONS[1]:
+            global_slice.append(slice(py * nyl, (py + 1) * nyl + 4))
+        else:
+            global_slice.append(slice(None))
+
+    return tuple(global_slice)
+
+
 def get_process_neighbors(cyclic=False):
     this_x, this_y = proc_rank_to_index(rst.proc_rank)
 
@@ -311,17 +349,38 @@ def exchange_overlap(arr, var_grid, cyclic):
             north=(slice(-2, None), Ellipsis),
         )
 
+    shm = None
+    if use_shared_memory():
+        node_ranks = get_node_ranks(rs.mpi_comm)
+        shm, shm_layout = _get_overlap_buffer(arr, send_order, overlap_slices_from)
+
     for send_dir, recv_dir in zip(send_order, recv_order):
         send_proc = proc_neighbors[send_dir]
         recv_proc = proc_neighbors[recv_dir]
 
+        recv_idx = overlap_slices_to[recv_dir]
+        send_idx = overlap_slices_from[send_dir]
+
+        if shm is not None:
+            # exchange with processes on the same node through shared memory, one direction
+            # at a time (strips contain ghost cells that were received in previous steps)
+            strip_shape, strip_offset = shm_layout[send_dir]
+
+            if send_proc in node_ranks:
+                shm.local_view(arr.dtype, strip_shape, offset=strip_offset)[...] = arr[send_idx]
+                send_proc = None
+
+            shm.fence()
+
+            if recv_proc in node_ranks:
+                recv_arr = shm.view(node_ranks[recv_proc], arr.dtype, strip_shape, offset=strip_offset)
+                arr = update(arr, at[recv_idx], recv_arr)
+                recv_proc = None
+
         if send_proc is None and recv_proc is None:
             continue
 
-        recv_idx = overlap_slices_to[recv_dir]
         recv_arr = npx.empty_like(arr[recv_idx])
-
-        send_idx = overlap_slices_from[send_dir]
         send_arr = arr[send_idx]
 
         if send_proc is None:
@@ -359,17 +418,166 @@ def _mpi_comm_along_axis(comm, procs, rank):
     return comm.Split(procs, rank)
 
 
+# node-local shared memory
+
+
+def use_shared_memory():
+    """Whether processes on the same node communicate through MPI-3 shared memory windows.
+
+    Only supported on the NumPy backend (JAX communicates through mpi4jax).
+    """
+    return rs.mpi_shared_memory and rs.backend == "numpy"
+
+
+class SharedBuffer:
+    """Shared memory segment of every process in a node-local communicator.
+
+    Each process owns one segment (sizes may differ between processes), but all
+    segments of the node can be accessed directly via :meth:`view`. Access must be
+    synchronized with :meth:`fence`, which is collective over the node communicator.
+    """
+
+    def __init__(self, comm, nbytes):
+        from mpi4py import MPI
+
+        self.comm = comm
+        self.window = MPI.Win.Allocate_shared(nbytes, 1, comm=comm)
+        self._segments = {}
+
+    def view(self, node_rank, dtype, shape, offset=0):
+        import numpy as np
+
+        if node_rank not in self._segments:
+            buf, _ = self.window.Shared_query(node_rank)
+            self._segments[node_rank] = buf
+
+        count = int(np.prod(shape))
+        return np.frombuffer(self._segments[node_rank], dtype=dtype, count=count, offset=offset).reshape(shape)
+
+    def local_view(self, dtype, shape, offset=0):
+        return self.view(self.comm.Get_rank(), dtype, shape, offset=offset)
+
+    def fence(self):
+        self.window.Fence()
+
+
+@_memoize
+def _mpi_comm_node(comm):
+    from mpi4py import MPI
+
+    return comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+
+
+@_memoize
+def get_node_ranks(comm):
+    """Map the ranks (in comm) of all processes on this node to their rank in the node communicator."""
+    node_comm = _mpi_comm_node(comm)
+    global_ranks = node_comm.Get_group().Translate_ranks(list(range(node_comm.Get_size())), comm.Get_group())
+    return {global_rank: node_rank for node_rank, global_rank in enumerate(global_ranks)}
+
+
+_shared_buffers = {}
+
+
+def _get_shared_buffer(key, nbytes):
+    """Get (or collectively allocate) the shared buffer identified by key.
+
+    Must be called by all processes of the node with the same key.
+    """
+    from mpi4py import MPI
+
+    node_comm = _mpi_comm_node(rs.mpi_comm)
+    cache_key = (MPI._handleof(node_comm), key)
+
+    if cache_key not in _shared_buffers:
+        _shared_buffers[cache_key] = SharedBuffer(node_comm, nbytes)
+
+    return _shared_buffers[cache_key]
+
+
+def _get_root_node_buffer(key, nbytes):
+    """Get a shared buffer on the node of the root process.
+
+    Returns ``(None, {})`` if shared memory is disabled or this process is on a different node.
+    """
+    if not use_shared_memory():
+        return None, {}
+
+    node_ranks = get_node_ranks(rs.mpi_comm)
+    if 0 not in node_ranks:
+        return None, {}
+
+    return _get_shared_buffer(key, nbytes), node_ranks
+
+
+def _get_overlap_buffer(arr, send_order, overlap_slices_from):
+    """Get the shared buffer used by exchange_overlap, with one slot per send direction."""
+    import numpy as np
+
+    layout = {}
+    nbytes = 0
+    for direction in send_order:
+        strip_shape = arr[overlap_slices_from[direction]].shape
+        layout[direction] = (strip_shape, nbytes)
+        nbytes += int(np.prod(strip_shape)) * arr.itemsize
+
+    # local arrays have identical shapes on all processes, so the layout is the same everywhere
+    shm = _get_shared_buffer(("overlap", arr.shape, arr.dtype.str, send_order), nbytes)
+    return shm, layout
+
+
+def use_hierarchical_reductions():
+    """Whether global reductions are done node by node (see the ``hierarchical_reductions`` runtime setting)."""
+    return rs.hierarchical_reductions and rs.backend == "numpy"
+
+
+@_memoize
+def _mpi_comm_node_leaders(comm):
+    from mpi4py import MPI
+
+    is_leader = _mpi_comm_node(comm).Get_rank() == 0
+    return comm.Split(0 if is_leader else MPI.UNDEFINED, comm.Get_rank())
+
+
+def _hierarchical_allreduce(buf, op, comm):
+    """Allreduce that only sends one message per node across the network.
+
+    Values are reduced on each node first, then between node leaders, and finally
+    broadcast to all processes on the node.
+    """
+    from mpi4py import MPI
+    from veros.core.operators import numpy as npx
+
+    node_comm = _mpi_comm_node(comm)
+    leader_comm = _mpi_comm_node_leaders(comm)
+
+    buf = ascontiguousarray(buf)
+    recvbuf = npx.empty_like(buf)
+
+    node_comm.Reduce(buf, recvbuf, op=op, root=0)
+
+    if leader_comm != MPI.COMM_NULL:
+        leader_comm.Allreduce(MPI.IN_PLACE, recvbuf, op=op)
+
+    node_comm.Bcast(recvbuf, root=0)
+    return recvbuf
+
+
+def _get_reduction_comm(axis):
+    if axis is None:
+        return rs.mpi_comm
+
+    assert axis in (0, 1)
+    pi = proc_rank_to_index(rst.proc_rank)
+    other_axis = 1 - axis
+    return _mpi_comm_along_axis(rs.mpi_comm, pi[other_axis], rst.proc_rank)
+
+
 @dist_context_only(noop_return_arg=0)
 def _reduce(arr, op, axis=None):
     from veros.core.operators import numpy as npx
 
-    if axis is None:
-        comm = rs.mpi_comm
-    else:
-        assert axis in (0, 1)
-        pi = proc_rank_to_index(rst.proc_rank)
-        other_axis = 1 - axis
-        comm = _mpi_comm_along_axis(rs.mpi_comm, pi[other_axis], rst.proc_rank)
+    comm = _get_reduction_comm(axis)
 
     if npx.isscalar(arr):
         squeeze = True
@@ -377,7 +585,10 @@ def _reduce(arr, op, axis=None):
     else:
         squeeze = False
 
-    res = allreduce(arr, op=op, comm=comm)
+    if axis is None and use_hierarchical_reductions():
+        res = _hierarchical_allreduce(arr, op=op, comm=comm)
+    else:
+        res = allreduce(arr, op=op, comm=comm)
 
     if squeeze:
         res = res[0]
@@ -385,6 +596,117 @@ def _reduce(arr, op, axis=None):
     return res
 
 
+class PendingReduction:
+    """Handle to a non-blocking reduction started by :func:`global_reduce`.
+
+    Call :meth:`wait` to obtain the reduced arrays.
+    """
+
+    def __init__(self, buf, shapes, request=None, sendbuf=None):
+        self._buf = buf
+        self._shapes = shapes
+        self._request = request
+        # keep send buffer alive until the request has completed
+        self._sendbuf = sendbuf
+
+    def done(self):
+        """Check whether the reduction has completed (without blocking)."""
+        if self._request is None:
+            return True
+
+        return self._request.Test()
+
+    def wait(self):
+        """Block until the reduction has completed and return the results."""
+        if self._request is not None:
+            self._request.Wait()
+            self._request = self._sendbuf = None
+
+        return _unpack_reduction_buffer(self._buf, self._shapes)
+
+
+def _pack_reduction_buffer(arrs):
+    from veros.core.operators import numpy as npx
+
+    arrs = [npx.asarray(arr) for arr in arrs]
+    dtype = npx.result_type(*arrs)
+    shapes = tuple(arr.shape for arr in arrs)
+    buf = npx.concatenate([npx.reshape(arr, (-1,)).astype(dtype) for arr in arrs])
+    return buf, shapes
+
+
+def _unpack_reduction_buffer(buf, shapes):
+    from veros.core.operators import numpy as npx
+
+    out = []
+    offset = 0
+    for shape in shapes:
+        size = math.prod(shape)
+
+        if shape:
+            out.append(npx.reshape(buf[offset : offset + size], shape))
+        else:
+            out.append(buf[offset])
+
+        offset += size
+
+    return tuple(out)
+
+
+REDUCTION_OPS = ("sum", "max", "min", "and", "or")
+
+
+def _get_mpi_op(op):
+    from mpi4py import MPI
+
+    return {"sum": MPI.SUM, "max": MPI.MAX, "min": MPI.MIN, "and": MPI.LAND, "or": MPI.LOR}[op]
+
+
+def global_reduce(arrs, op="sum", axis=None, blocking=True):
+    """Reduce several arrays across all processes with a single collective operation.
+
+    All arrays are reduced with the same operation ``op`` (one of ``REDUCTION_OPS``) and
+    cast to a common dtype. This saves one network round trip per array compared to
+    calling e.g. :func:`global_sum` repeatedly.
+
+    If ``blocking`` is False, a :class:`PendingReduction` is returned instead, whose
+    ``wait()`` method returns the results. This allows to overlap the reduction with
+    computation (only supported on the NumPy backend; on JAX, the reduction is
+    executed immediately).
+
+    Example:
+        >>> volm, tempm = global_reduce((npx.sum(vol), npx.sum(vol * temp)), op="sum")
+
+    """
+    if op not in REDUCTION_OPS:
+        raise ValueError(f"op must be one of {REDUCTION_OPS}")
+
+    buf, shapes = _pack_reduction_buffer(arrs)
+
+    if rst.proc_num == 1 or not CURRENT_CONTEXT.is_dist_safe:
+        res = PendingReduction(buf, shapes)
+    else:
+        mpi_op = _get_mpi_op(op)
+        comm = _get_reduction_comm(axis)
+
+        if not blocking and rs.backend == "numpy":
+            from veros.core.operators import numpy as npx
+
+            sendbuf = ascontiguousarray(buf)
+            recvbuf = npx.empty_like(sendbuf)
+            request = comm.Iallreduce(sendbuf, recvbuf, op=mpi_op)
+            res = PendingReduction(recvbuf, shapes, request=request, sendbuf=sendbuf)
+        elif axis is None and use_hierarchical_reductions():
+            res = PendingReduction(_hierarchical_allreduce(buf, op=mpi_op, comm=comm), shapes)
+        else:
+            res = PendingReduction(allreduce(buf, op=mpi_op, comm=comm), shapes)
+
+    if blocking:
+        return res.wait()
+
+    return res
+
+
 @dist_context_only(noop_return_arg=0)
 def global_and(arr, axis=None):
     from mpi4py import MPI
@@ -471,12 +793,23 @@ def _gather_xy(nx, ny, arr):
     gidx, idx = get_chunk_slices(nx, ny, dim_grid, include_overlap=True)
     sendbuf = arr[idx]
 
+    # processes on the same node as root expose their chunk through shared memory
+    shm, node_ranks = _get_root_node_buffer(("gather", nx, ny, arr.shape, arr.dtype.str), sendbuf.nbytes)
+
+    if shm is not None:
+        if rst.proc_rank != 0:
+            shm.local_view(sendbuf.dtype, sendbuf.shape)[...] = sendbuf
+        shm.fence()
+
     if rst.proc_rank == 0:
         buffer_list = []
         for proc in range(1, rst.proc_num):
             idx_g, idx_l = get_chunk_slices(nx, ny, dim_grid, include_overlap=True, proc_idx=proc_rank_to_index(proc))
-            recvbuf = npx.empty_like(arr[idx_l])
-            recvbuf = recv(recvbuf, source=proc, tag=30, comm=rs.mpi_comm)
+            if proc in node_ranks:
+                recvbuf = shm.view(node_ranks[proc], arr.dtype, arr[idx_l].shape)
+            else:
+                recvbuf = npx.empty_like(arr[idx_l])
+                recvbuf = recv(recvbuf, source=proc, tag=30, comm=rs.mpi_comm)
             buffer_list.append((idx_g, recvbuf))
 
         out_shape = (nx + 4, ny + 4) + arr.shape[2:]
@@ -486,9 +819,16 @@ def _gather_xy(nx, ny, arr):
         for idx, val in buffer_list:
             out = update(out, at[idx], val)
 
+        if shm is not None:
+            shm.fence()
+
         return out
 
-    send(sendbuf, dest=0, tag=30, comm=rs.mpi_comm)
+    if shm is not None:
+        shm.fence()
+    else:
+        send(sendbuf, dest=0, tag=30, comm=rs.mpi_comm)
+
     return arr
 
 
@@ -569,10 +909,24 @@ def _scatter_xy(nx, ny, arr):
     dim_grid = ["xt", "yt"] + [None] * (arr.ndim - 2)
     _, local_slice = get_chunk_slices(nx, ny, dim_grid, include_overlap=True)
 
+    # root exposes the global array to processes on the same node through shared memory
+    global_shape = (nx + 4, ny + 4) + arr.shape[2:]
+    shm, node_ranks = _get_root_node_buffer(
+        ("scatter", global_shape, arr.dtype.str), arr.nbytes if rst.proc_rank == 0 else 0
+    )
+
+    if shm is not None:
+        if rst.proc_rank == 0:
+            shm.local_view(arr.dtype, global_shape)[...] = arr
+        shm.fence()
+
     if rst.proc_rank == 0:
         recvbuf = arr[local_slice]
 
         for proc in range(1, rst.proc_num):
+            if proc in node_ranks:
+                continue
+
             global_slice, _ = get_chunk_slices(
                 nx, ny, dim_grid, include_overlap=True, proc_idx=proc_rank_to_index(proc)
             )
@@ -581,11 +935,18 @@ def _scatter_xy(nx, ny, arr):
 
         # arr changes shape in main process
         arr = npx.empty((nxi + 4, nyi + 4) + arr.shape[2:], dtype=arr.dtype)
+    elif shm is not None:
+        global_slice, _ = get_chunk_slices(nx, ny, dim_grid, include_overlap=True)
+        recvbuf = shm.view(node_ranks[0], arr.dtype, global_shape)[global_slice]
     else:
         recvbuf = npx.empty_like(arr[local_slice])
         recvbuf = recv(recvbuf, source=0, tag=50, comm=rs.mpi_comm)
 
     arr = update(arr, at[local_slice], recvbuf)
+
+    if shm is not None:
+        shm.fence()
+
     arr = exchange_overlap(arr, ["xt", "yt"], cyclic=False)
 
     return arr
@@ -627,6 +988,97 @@ def scatter(arr, dimensions, var_grid):
         raise NotImplementedError("unreachable")
 
 
+def use_io_aggregation():
+    """Whether output is written by a subset of processes (see the ``io_aggregators`` runtime setting)."""
+    return rs.io_aggregators > 0 and rst.proc_num > 1
+
+
+def get_num_io_aggregators():
+    # every aggregator handles at least one full row of processes
+    return max(1, min(rs.io_aggregators, rs.num_proc[1]))
+
+
+def get_io_chunk_size(nx, ny):
+    """Size of the largest (x, y) block written by a single I/O aggregator."""
+    _, nyl = get_chunk_size(nx, ny)
+    rows_per_aggregator = -(-rs.num_proc[1] // get_num_io_aggregators())
+    return (nx, nyl * rows_per_aggregator)
+
+
+@_memoize
+def _mpi_comm_io_group(comm, num_groups):
+    _, py = proc_rank_to_index(comm.Get_rank())
+    return comm.Split(py * num_groups // rs.num_proc[1], comm.Get_rank())
+
+
+def owns_tile(dim_grid, proc_idx=None):
+    """Whether this process is the first one holding its tile of a variable with the given dimensions.
+
+    Variables that are not distributed along x or y are held by several processes,
+    but only need to be written once.
+    """
+    if proc_idx is None:
+        proc_idx = proc_rank_to_index(rst.proc_rank)
+
+    px, py = proc_idx
+    has_x = any(dim in SCATTERED_DIMENSIONS[0] for dim in dim_grid)
+    has_y = any(dim in SCATTERED_DIMENSIONS[1] for dim in dim_grid)
+    return (has_x or px == 0) and (has_y or py == 0)
+
+
+def aggregate_tiles(nx, ny, arr, dim_grid):
+    """Gather local output tiles on the I/O aggregator of each group of processes.
+
+    Every group consists of consecutive rows of processes, so the tiles of a group
+    form one contiguous block. Tiles that are present on several processes (e.g. for
+    variables without y dimension) are only contributed by the first of them.
+
+    Returns global slices and data of the aggregated block on aggregators, and
+    ``(None, None)`` on all other processes (or if the group holds no unique data).
+    """
+    import numpy as np
+
+    comm = rs.mpi_comm
+    group_comm = _mpi_comm_io_group(comm, get_num_io_aggregators())
+
+    global_slice, _ = get_chunk_slices(nx, ny, dim_grid)
+    tiles = group_comm.gather((global_slice, arr) if owns_tile(dim_grid) else None, root=0)
+
+    if tiles is None:
+        return None, None
+
+    tiles = [tile for tile in tiles if tile is not None]
+
+    if not tiles:
+        return None, None
+
+    if len(tiles) == 1:
+        return tiles[0]
+
+    block_slice, block_shape = [], []
+    for axis, tile_slice in enumerate(tiles[0][0]):
+        if tile_slice.start is None:
+            block_slice.append(tile_slice)
+            block_shape.append(tiles[0][1].shape[axis])
+            continue
+
+        start = min(tile[0][axis].start for tile in tiles)
+        stop = max(tile[0][axis].stop for tile in tiles)
+        block_slice.append(slice(start, stop))
+        block_shape.append(stop - start)
+
+    block = np.empty(block_shape, dtype=tiles[0][1].dtype)
+
+    for tile_slice, tile_data in tiles:
+        local_slice = tuple(
+            s if s.start is None else slice(s.start - b.start, s.stop - b.start)
+            for s, b in zip(tile_slice, block_slice)
+        )
+        block[local_slice] = tile_data
+
+    return tuple(block_slice), block
+
+
 @dist_context_only
 def barrier():
     rs.mpi_comm.barrier()
@@ -1,62 +1,117 @@
-import threading
 import contextlib
 
-from veros import logger, runtime_settings, runtime_state
+from veros import runtime_settings, runtime_state
 
 
 @contextlib.contextmanager
 def threaded_io(filepath, mode):
     """
-    If using IO threads, start a new thread to write the HDF5 data to disk.
+    Open an HDF5 file for parallel (if necessary) I/O.
     """
     import h5py
 
-    if runtime_settings.use_io_threads:
-        _wait_for_disk(filepath)
-        _io_locks[filepath].clear()
     kwargs = {}
     if runtime_state.proc_num > 1:
         kwargs.update(driver="mpio", comm=runtime_settings.mpi_comm)
+
     h5file = h5py.File(filepath, mode, **kwargs)
+
     try:
         yield h5file
     finally:
-        if runtime_settings.use_io_threads:
-            threading.Thread(target=_write_to_disk, args=(h5file, filepath)).start()
-        else:
-            _write_to_disk(h5file, filepath)
+        h5file.close()
 
 
-_io_locks = {}
+def register_filters():
+    """Make compression filters like zstd available for reading and writing, if installed."""
+    try:
+        import hdf5plugin  # noqa: F401
+    except ImportError:
+        pass
 
 
-def _add_to_locks(file_id):
-    """
-    If there is no lock for file_id, create one
-    """
-    if file_id not in _io_locks:
-        _io_locks[file_id] = threading.Event()
-        _io_locks[file_id].set()
+def get_compression_kwargs(method):
+    """Dataset creation options for the given compression method (one of ``gzip``, ``zstd``, ``lz4``)."""
+    if method == "gzip":
+        return dict(compression="gzip", compression_opts=1)
+
+    try:
+        import hdf5plugin
+    except ImportError:
+        raise RuntimeError(f"{method} compression requires hdf5plugin") from None
 
+    filters = {
+        "zstd": lambda: hdf5plugin.Zstd(clevel=3),
+        "lz4": lambda: hdf5plugin.LZ4(),
+    }
 
-def _wait_for_disk(file_id):
+    if method not in filters:
+        raise ValueError(f"unknown compression method {method}")
+
+    # byte shuffling groups exponent bytes of floats, which makes them much more compressible
+    return dict(shuffle=True, **filters[method]())
+
+
+def read_collective(dataset, selection, out):
     """
-    Wait for the lock of file_id to be released
+    Read a selection of an HDF5 dataset into ``out`` (with collective MPI-IO if running in parallel).
+
+    Must be called by all processes.
     """
-    logger.debug(f"Waiting for lock {file_id} to be released")
-    _add_to_locks(file_id)
-    lock_released = _io_locks[file_id].wait(runtime_settings.io_timeout)
-    if not lock_released:
-        raise RuntimeError("Timeout while waiting for disk IO to finish")
+    if runtime_state.proc_num > 1:
+        with dataset.collective:
+            dataset.read_direct(out, source_sel=selection)
+    else:
+        dataset.read_direct(out, source_sel=selection)
+
+    return out
 
 
-def _write_to_disk(h5file, file_id):
+def _get_hyperslab(selection, shape):
+    start, count = [], []
+
+    for sel, dimsize in zip(selection, shape):
+        if isinstance(sel, slice):
+            lower, upper, _ = sel.indices(dimsize)
+            start.append(lower)
+            count.append(upper - lower)
+        else:
+            start.append(sel)
+            count.append(1)
+
+    return tuple(start), tuple(count)
+
+
+def write_collective(dataset, selection, data):
     """
-    Sync HDF5 data to disk, close file handle, and release lock.
-    May run in a separate thread.
+    Write to an HDF5 dataset with collective MPI-IO (required by parallel HDF5 for compressed datasets).
+
+    Must be called by all processes. Processes without any data to write pass ``data=None``.
     """
-    try:
-        h5file.close()
-    finally:
-        if runtime_settings.use_io_threads and file_id is not None:
-            _io_locks[file_id].set()
+    import h5py
+    import numpy as np
+
+    dxpl = h5py.h5p.create(h5py.h5p.DATASET_XFER)
+    dxpl.set_dxpl_mpio(h5py.h5fd.MPIO_COLLECTIVE)
+
+    file_space = dataset.id.get_space()
+
+    if data is None:
+        file_space.select_none()
+        data = np.zeros(1, dtype=dataset.dtype)
+        mem_space = h5py.h5s.create_simple(data.shape)
+        mem_space.select_none()
+    else:
+        data = np.ascontiguousarray(data, dtype=dataset.dtype)
+
+        if selection is Ellipsis or not dataset.shape:
+            file_space.select_all()
+        else:
+            file_space.select_hyperslab(*_get_hyperslab(selection, dataset.shape))
+
+        if data.ndim:
+            mem_space = h5py.h5s.create_simple(data.shape)
+        else:
+            mem_space = h5py.h5s.create(h5py.h5s.SCALAR)
+
+    dataset.id.write(mem_space, file_space, data, dxpl=dxpl)
@@ -1,6 +1,5 @@
 import json
 import datetime
-import threading
 import contextlib
 
 import numpy as np
@@ -13,6 +12,7 @@ from veros import (
     runtime_settings as rs,
     __version__ as veros_version,
 )
+from veros.io_tools import hdf5
 
 """
 netCDF output is designed to follow the COARDS guidelines from
@@ -28,15 +28,8 @@ def _get_setup_code(pyfile):
         return "UNKNOWN"
 
 
-def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=True):
-    """
-    Define standard grid in netcdf file
-    """
-    import h5netcdf
-
-    if not isinstance(ncfile, h5netcdf.File):
-        raise TypeError("Argument needs to be a netCDF4 Dataset")
-
+def get_global_attributes(state):
+    """Metadata attached to every output file"""
     if rs.setup_file is None:
         setup_file = "UNKNOWN"
         setup_code = "UNKNOWN"
@@ -44,7 +37,7 @@ def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=
         setup_file = rs.setup_file
         setup_code = _get_setup_code(rs.setup_file)
 
-    ncfile.attrs.update(
+    return dict(
         date_created=datetime.datetime.today().isoformat(),
         veros_version=veros_version,
         setup_identifier=state.settings.identifier,
@@ -54,6 +47,22 @@ def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=
         setup_code=setup_code,
     )
 
+
+def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=True, coordinates=None, chunks=None):
+    """
+    Define standard grid in netcdf file
+
+    Coordinates of extra dimensions can be given as ``coordinates``, a dict mapping dimensions
+    to ``(metadata, selection, data)`` of local data (see :func:`store_selection`). ``chunks``
+    maps extra dimensions to their chunk size.
+    """
+    import h5netcdf
+
+    if not isinstance(ncfile, h5netcdf.File):
+        raise TypeError("Argument needs to be a netCDF4 Dataset")
+
+    ncfile.attrs.update(get_global_attributes(state))
+
     dimensions = dict(state.dimensions)
     if extra_dimensions is not None:
         dimensions.update(extra_dimensions)
@@ -63,6 +72,13 @@ def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=
         if dim in variables.TIMESTEPS:
             continue
 
+        if coordinates is not None and dim in coordinates:
+            var, selection, var_data = coordinates[dim]
+            add_dimension(dim, dimensions[dim], ncfile)
+            initialize_variable(state, dim, var, ncfile, chunks=chunks)
+            store_selection(dim, var_data, ncfile, selection)
+            continue
+
         if dim in state.var_meta:
             var = state.var_meta[dim]
 
@@ -78,7 +94,7 @@ def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=
 
         dimsize = variables.get_shape(dimensions, var.dims[::-1], include_ghosts=False, local=False)[0]
         ncfile.dimensions[dim] = dimsize
-        initialize_variable(state, dim, var, ncfile)
+        initialize_variable(state, dim, var, ncfile, chunks=chunks)
         write_variable(state, dim, var, var_data, ncfile)
 
     if create_time_dimension:
@@ -91,7 +107,7 @@ def initialize_file(state, ncfile, extra_dimensions=None, create_time_dimension=
         )
 
 
-def initialize_variable(state, key, var, ncfile):
+def initialize_variable(state, key, var, ncfile, chunks=None):
     if var.dims is None:
         dims = ()
     else:
@@ -105,14 +121,30 @@ def initialize_variable(state, key, var, ncfile):
         return
 
     kwargs = {}
-    if rs.hdf5_gzip_compression and runtime_state.proc_num == 1:
-        kwargs.update(compression="gzip", compression_opts=1)
+    if rs.hdf5_gzip_compression and (runtime_state.proc_num == 1 or distributed.use_io_aggregation()):
+        # compressed datasets can only be written collectively by parallel HDF5
+        kwargs.update(hdf5.get_compression_kwargs(rs.output_compression))
+
+    if chunks is None:
+        chunks = {}
 
     chunksize = [
-        variables.get_shape(state.dimensions, (d,), local=True, include_ghosts=False)[0] if d in state.dimensions else 1
+        (
+            variables.get_shape(state.dimensions, (d,), local=True, include_ghosts=False)[0]
+            if d in state.dimensions
+            else chunks.get(d, 1)
+        )
         for d in dims
     ]
 
+    if distributed.use_io_aggregation():
+        # one chunk per aggregated block
+        io_chunk = distributed.get_io_chunk_size(state.dimensions["xt"], state.dimensions["yt"])
+        for i, d in enumerate(dims):
+            for scattered_dims, chunk_len in zip(distributed.SCATTERED_DIMENSIONS, io_chunk):
+                if d in scattered_dims:
+                    chunksize[i] = min(chunk_len, state.dimensions[d])
+
     dtype = var.dtype
     if dtype is None:
         dtype = rs.float_type
@@ -127,51 +159,117 @@ def initialize_variable(state, key, var, ncfile):
     v.attrs.update(long_name=var.name, units=var.units, **var.extra_attributes)
 
 
-def advance_time(time_value, ncfile):
-    current_time_step = len(ncfile.variables["Time"])
-    ncfile.resize_dimension("Time", current_time_step + 1)
+def advance_time(time_value, ncfile, current_time_step=None, chunk_size=1):
+    """Write a new record to the Time axis and return its index.
+
+    If the Time dimension is full, it is extended by ``chunk_size`` records at once
+    (unused records have to be removed again when closing the file).
+    """
+    if current_time_step is None:
+        current_time_step = len(ncfile.variables["Time"])
+
+    if current_time_step >= len(ncfile.variables["Time"]):
+        ncfile.resize_dimension("Time", current_time_step + max(chunk_size, 1))
+
     ncfile.variables["Time"][current_time_step] = time_value
+    return current_time_step
 
 
 def add_dimension(dim, dim_size, ncfile):
     ncfile.dimensions[dim] = int(dim_size)
 
 
-def write_variable(state, key, var, var_data, ncfile, time_step=-1):
-    var_data = var_data * var.scale
+def prepare_variable_data(state, var, var_data, out=None):
+    """Convert variable data to the layout used in output files (on the host).
 
+    Ghost cells and time steps other than ``tau`` are removed and the result is transposed
+    through views only, so scaling and masking write the output in a single pass. If a
+    matching array is passed as ``out``, it is re-used as output buffer.
+    """
     gridmask = var.get_mask(state.settings, state.variables)
-    if gridmask is not None:
-        newaxes = (slice(None),) * gridmask.ndim + (np.newaxis,) * (var_data.ndim - gridmask.ndim)
-        var_data = np.where(gridmask.astype("bool")[newaxes], var_data, variables.get_fill_value(var_data.dtype))
+    return convert_variable_data(var, var_data, gridmask, state.variables.tau, out=out)
+
+
+def convert_variable_data(var, var_data, gridmask, tau, out=None):
+    """Like :func:`prepare_variable_data`, but does not require access to the Veros state."""
+    var_data = np.asarray(var_data)
 
     if var.dims:
-        tmask = tuple(state.variables.tau if dim in variables.TIMESTEPS else slice(None) for dim in var.dims)
+        tmask = tuple(tau if dim in variables.TIMESTEPS else slice(None) for dim in var.dims)
         var_data = variables.remove_ghosts(var_data, var.dims)[tmask].T
 
+        if gridmask is not None:
+            # masks cover the leading dimensions of the variable, which become trailing after transposing
+            gridmask = np.asarray(variables.remove_ghosts(gridmask, var.dims[: gridmask.ndim])).T
+
+    dtype = np.result_type(var_data, var.scale)
+
+    if out is None or out.shape != var_data.shape or out.dtype != dtype:
+        out = np.empty(var_data.shape, dtype=dtype)
+
+    np.multiply(var_data, var.scale, out=out)
+
+    if gridmask is not None:
+        np.copyto(out, variables.get_fill_value(dtype), where=np.logical_not(gridmask))
+
+    return out
+
+
+def store_variable(key, var_data, ncfile, nx, ny, time_step=-1):
+    """Write data returned by :func:`prepare_variable_data` to the output file.
+
+    Does not require access to the Veros state.
+    """
     var_obj = ncfile.variables[key]
 
-    nx, ny = state.dimensions["xt"], state.dimensions["yt"]
-    chunk, _ = distributed.get_chunk_slices(nx, ny, var_obj.dimensions)
+    if distributed.use_io_aggregation():
+        chunk, var_data = distributed.aggregate_tiles(nx, ny, var_data, var_obj.dimensions)
+    else:
+        chunk, _ = distributed.get_chunk_slices(nx, ny, var_obj.dimensions)
 
-    if "Time" in var_obj.dimensions:
+    if chunk is not None and "Time" in var_obj.dimensions:
         assert var_obj.dimensions[0] == "Time"
+        if time_step < 0:
+            time_step += len(ncfile.variables["Time"])
         chunk = (time_step,) + chunk[1:]
 
-    var_obj[chunk] = var_data
+    if distributed.use_io_aggregation():
+        hdf5.write_collective(var_obj._h5ds, chunk, var_data)
+    else:
+        var_obj[chunk] = var_data
 
 
-@contextlib.contextmanager
-def threaded_io(filepath, mode):
-    """
-    If using IO threads, start a new thread to write the netCDF data to disk.
+def store_selection(key, var_data, ncfile, selection, time_step=-1):
+    """Write local data to the given selection of a variable (excluding the Time axis).
+
+    Used for reduced output (see :class:`veros.diagnostics.output_spec.OutputSpec`).
+    Must be called by all processes; processes without data pass ``var_data=None``.
     """
+    var_obj = ncfile.variables[key]
+
+    if selection is not None and "Time" in var_obj.dimensions:
+        assert var_obj.dimensions[0] == "Time"
+        if time_step < 0:
+            time_step += len(ncfile.variables["Time"])
+        selection = (time_step, *selection)
+
+    if distributed.use_io_aggregation():
+        hdf5.write_collective(var_obj._h5ds, selection, var_data)
+    elif var_data is not None:
+        var_obj[selection] = var_data
+
+
+def write_variable(state, key, var, var_data, ncfile, time_step=-1):
+    var_data = prepare_variable_data(state, var, var_data)
+    nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+    store_variable(key, var_data, ncfile, nx, ny, time_step=time_step)
+
+
+def _open_dataset(filepath, mode):
     import h5py
     import h5netcdf
 
-    if rs.use_io_threads:
-        _wait_for_disk(filepath)
-        _io_locks[filepath].clear()
+    hdf5.register_filters()
 
     kwargs = dict()
 
@@ -181,49 +279,104 @@ def threaded_io(filepath, mode):
     if runtime_state.proc_num > 1:
         kwargs.update(driver="mpio", comm=rs.mpi_comm)
 
-    nc_dataset = h5netcdf.File(filepath, mode, **kwargs)
+    return h5netcdf.File(filepath, mode, **kwargs)
+
+
+@contextlib.contextmanager
+def threaded_io(filepath, mode):
+    """
+    Open a netCDF file for parallel (if necessary) I/O.
+    """
+    nc_dataset = _open_dataset(filepath, mode)
 
     try:
         yield nc_dataset
-
     finally:
-        if rs.use_io_threads:
-            threading.Thread(target=_write_to_disk, args=(nc_dataset, filepath)).start()
+        nc_dataset.close()
+
+
+class OutputFile:
+    """Handle to a netCDF output file that records are appended to."""
+
+    def __init__(self, filepath, time_chunk_size=1):
+        self.filepath = filepath
+        self.ncfile = _open_dataset(filepath, "r+")
+        self.time_chunk_size = time_chunk_size
+        self.writes_since_flush = 0
+
+        if "Time" in self.ncfile.variables:
+            self.num_records = len(self.ncfile.variables["Time"])
         else:
-            _write_to_disk(nc_dataset, filepath)
+            self.num_records = 0
 
+    def advance_time(self, time_value):
+        time_step = advance_time(
+            time_value, self.ncfile, current_time_step=self.num_records, chunk_size=self.time_chunk_size
+        )
+        self.num_records += 1
+        self.writes_since_flush += 1
+        return time_step
 
-_io_locks = {}
+    def write_record(self, time_value, data, nx, ny, selections=None):
+        """Append a record. Variables in ``selections`` are written to the given selection."""
+        time_step = self.advance_time(time_value)
 
+        for key, var_data in data.items():
+            if selections is not None and key in selections:
+                store_selection(key, var_data, self.ncfile, selections[key], time_step=time_step)
+            else:
+                store_variable(key, var_data, self.ncfile, nx, ny, time_step=time_step)
 
-def _add_to_locks(file_id):
-    """
-    If there is no lock for file_id, create one
-    """
-    if file_id not in _io_locks:
-        _io_locks[file_id] = threading.Event()
-        _io_locks[file_id].set()
+    def flush(self):
+        self.ncfile.flush()
+        self.writes_since_flush = 0
 
+    def close(self):
+        # remove records that were allocated in advance but never written
+        if "Time" in self.ncfile.dimensions and len(self.ncfile.variables["Time"]) > self.num_records:
+            self.ncfile.resize_dimension("Time", self.num_records)
 
-def _wait_for_disk(file_id):
-    """
-    Wait for the lock of file_id to be released
-    """
-    logger.debug(f"Waiting for lock {file_id} to be released")
-    _add_to_locks(file_id)
-    lock_released = _io_locks[file_id].wait(rs.io_timeout)
+        self.ncfile.close()
 
-    if not lock_released:
-        raise RuntimeError("Timeout while waiting for disk IO to finish")
 
+_output_files = {}
 
-def _write_to_disk(ncfile, file_id):
-    """
-    Sync netCDF data to disk, close file handle, and release lock.
-    May run in a separate thread.
+
+@contextlib.contextmanager
+def output_file(filepath):
+    """Get an :class:`OutputFile` to append records to.
+
+    If the ``io_keep_files_open`` runtime setting is enabled, the file is kept open across
+    calls (and flushed every ``io_flush_interval`` records), and the Time axis is extended
+    by ``io_time_chunk_size`` records at a time. Otherwise, the file is closed on exit.
     """
-    try:
-        ncfile.close()
-    finally:
-        if rs.use_io_threads and file_id is not None:
-            _io_locks[file_id].set()
+    if not rs.io_keep_files_open:
+        outfile = OutputFile(filepath)
+        try:
+            yield outfile
+        finally:
+            outfile.close()
+
+        return
+
+    outfile = _output_files.get(filepath)
+    if outfile is None:
+        outfile = _output_files[filepath] = OutputFile(filepath, time_chunk_size=rs.io_time_chunk_size)
+
+    yield outfile
+
+    if rs.io_flush_interval > 0 and outfile.writes_since_flush >= rs.io_flush_interval:
+        outfile.flush()
+
+
+def close_output_file(filepath):
+    """Close cached handle to the given file (if any)."""
+    outfile = _output_files.pop(filepath, None)
+    if outfile is not None:
+        outfile.close()
+
+
+def close_output_files():
+    """Close all cached file handles."""
+    for filepath in list(_output_files.keys()):
+        close_output_file(filepath)
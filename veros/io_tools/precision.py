@@ -0,0 +1,103 @@
+"""
+Lossy reduction of floating point precision for output data.
+
+Both methods set trailing mantissa bits to zero, so the data compresses much better
+(especially in combination with byte shuffling). Fill values are preserved.
+"""
+
+import numpy as np
+
+from veros import variables
+
+_UINT_TYPES = {
+    np.dtype("float32"): (np.uint32, 23),
+    np.dtype("float64"): (np.uint64, 52),
+}
+
+
+def get_mantissa_bits(dtype):
+    """Number of explicitly stored mantissa bits of a float type (None for other types)."""
+    dtype = np.dtype(dtype)
+
+    if dtype not in _UINT_TYPES:
+        return None
+
+    return _UINT_TYPES[dtype][1]
+
+
+def validate_precision(dtype, keepbits=None, tolerance=None):
+    """Raise ``ValueError`` if the given precision cannot be applied to data of the given type."""
+    mantissa_bits = get_mantissa_bits(dtype)
+
+    if keepbits is not None:
+        if mantissa_bits is None:
+            raise ValueError(f"bit-rounding requires floating point data (got {np.dtype(dtype)})")
+
+        if not 0 <= keepbits <= mantissa_bits:
+            raise ValueError(f"keepbits must be between 0 and {mantissa_bits} for {np.dtype(dtype)} (got {keepbits})")
+
+    if tolerance is not None:
+        if mantissa_bits is None:
+            raise ValueError(f"quantization requires floating point data (got {np.dtype(dtype)})")
+
+        if not tolerance > 0:
+            raise ValueError(f"tolerance must be positive (got {tolerance})")
+
+
+def round_mantissa(arr, keepbits):
+    """Round floats in-place to ``keepbits`` mantissa bits (round to nearest, ties to even)."""
+    uint_type, mantissa_bits = _UINT_TYPES[arr.dtype]
+
+    if keepbits < 0:
+        # rounding would spill into the exponent
+        raise ValueError(f"keepbits must be non-negative (got {keepbits})")
+
+    dropbits = mantissa_bits - keepbits
+
+    if dropbits <= 0:
+        return arr
+
+    bits = arr.view(uint_type)
+    half = uint_type((1 << (dropbits - 1)) - 1)
+    mask = ~uint_type((1 << dropbits) - 1)
+
+    # add half an ulp (of the rounded number), plus one if the last kept bit is set (ties to even)
+    bits += (bits >> uint_type(dropbits)) & uint_type(1)
+    bits += half
+    bits &= mask
+    return arr
+
+
+def quantize(arr, tolerance):
+    """Round floats in-place to multiples of the largest power of 2 that keeps the error below ``tolerance``."""
+    if not tolerance > 0:
+        raise ValueError(f"tolerance must be positive (got {tolerance})")
+
+    step = 2.0 ** np.floor(np.log2(2 * tolerance))
+    np.divide(arr, step, out=arr)
+    np.rint(arr, out=arr)
+    np.multiply(arr, step, out=arr)
+    return arr
+
+
+def reduce_precision(var_data, keepbits=None, tolerance=None):
+    """Apply :func:`round_mantissa` and / or :func:`quantize` to output data, skipping fill values.
+
+    Operates in-place. Non-float data is returned unchanged.
+    """
+    var_data = np.asarray(var_data)
+
+    if (keepbits is None and tolerance is None) or var_data.dtype not in _UINT_TYPES:
+        return var_data
+
+    fill_value = variables.get_fill_value(var_data.dtype)
+    is_fill = var_data == fill_value
+
+    if tolerance is not None:
+        quantize(var_data, tolerance)
+
+    if keepbits is not None:
+        round_mantissa(var_data, keepbits)
+
+    np.copyto(var_data, fill_value, where=is_fill)
+    return var_data
@@ -0,0 +1,164 @@
+"""
+Background writer service for output files.
+
+Output jobs (callables without arguments) are executed in order by a single persistent thread.
+The main loop only blocks when the job queue is full. Jobs must not access the Veros state,
+since it keeps changing while the job is waiting in the queue - all data has to be copied
+to the host before submitting the job.
+
+This is the only place where I/O threads are started. Despite their name, the ``threaded_io``
+helpers in :mod:`veros.io_tools.hdf5` and :mod:`veros.io_tools.netcdf` only open files.
+"""
+
+import queue
+import atexit
+import threading
+import contextlib
+
+from veros import logger, runtime_settings, runtime_state
+
+
+def _init_thread_context():
+    from veros.routines import CURRENT_CONTEXT, RoutineStack
+
+    # thread-local context is not inherited by the writer thread
+    CURRENT_CONTEXT.is_dist_safe = True
+    CURRENT_CONTEXT.routine_stack = RoutineStack()
+    CURRENT_CONTEXT.mpi4jax_token = None
+    CURRENT_CONTEXT.is_tiled = False
+
+
+class AsyncWriter:
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="veros-io", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        _init_thread_context()
+
+        while True:
+            job = self._queue.get()
+
+            try:
+                if job is None:
+                    return
+
+                # skip remaining jobs after an error, so the error is not buried
+                if self._error is None:
+                    job()
+
+            except Exception as exc:
+                logger.error(f"Error in background I/O thread: {exc!s}")
+                self._error = exc
+
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            exc, self._error = self._error, None
+            raise RuntimeError("Error while writing output in background thread") from exc
+
+    def submit(self, job):
+        self._raise_error()
+
+        if not self._thread.is_alive():
+            raise RuntimeError("Background I/O thread is not running")
+
+        try:
+            self._queue.put(job, timeout=runtime_settings.io_timeout)
+        except queue.Full:
+            raise RuntimeError("Timeout while waiting for disk IO to finish") from None
+
+    def wait(self):
+        """Block until all submitted jobs have been executed."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        self._raise_error()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def use_async_writer(collective=True):
+    """Whether output jobs are executed in the background.
+
+    Collective jobs are only supported on a single process, since parallel HDF5 requires
+    all processes to take part in (collective) file operations from the main thread.
+    Jobs that only access files of the current process can always run in the background.
+    """
+    return runtime_settings.use_io_threads and (runtime_state.proc_num == 1 or not collective)
+
+
+def get_writer():
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = AsyncWriter(maxsize=runtime_settings.io_queue_size)
+            atexit.register(_writer.close)
+
+    return _writer
+
+
+_batch = threading.local()
+
+
+def submit(job, collective=True):
+    """Execute job in the background writer thread if enabled, otherwise immediately.
+
+    Set ``collective=False`` for jobs that do not use MPI (e.g. write process-local files).
+    """
+    if not use_async_writer(collective):
+        job()
+        return
+
+    batched_jobs = getattr(_batch, "jobs", None)
+    if batched_jobs is not None:
+        batched_jobs.append(job)
+        return
+
+    get_writer().submit(job)
+
+
+@contextlib.contextmanager
+def batch():
+    """Collect all jobs submitted within this context and submit them as a single job on exit."""
+    if getattr(_batch, "jobs", None) is not None:
+        # already batching
+        yield
+        return
+
+    _batch.jobs = jobs = []
+
+    try:
+        yield
+    finally:
+        _batch.jobs = None
+
+        if jobs:
+
+            def batch_job():
+                for job in jobs:
+                    job()
+
+            get_writer().submit(batch_job)
+
+
+def wait():
+    """Block until all pending output jobs have been executed."""
+    if _writer is None:
+        return
+
+    _writer.wait()
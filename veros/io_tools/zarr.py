@@ -0,0 +1,296 @@
+"""
+Zarr (directory store) output for diagnostics.
+
+Arrays follow the same conventions as netCDF output (see :mod:`veros.io_tools.netcdf`)
+and carry the ``_ARRAY_DIMENSIONS`` attribute, so stores can be opened directly by xarray.
+
+Chunks are aligned with the domain decomposition (one chunk per process and record),
+so every process writes its own chunk files independently. Only metadata is written by
+the root process when the store is created; when the Time axis grows, every process
+writes identical metadata.
+"""
+
+import contextlib
+
+import numpy as np
+
+from veros import variables, distributed, runtime_state, runtime_settings as rs
+from veros.io_tools import netcdf as nctools
+
+
+def _get_compressor():
+    import numcodecs
+
+    # gzip is only the default for compatibility of netCDF files, all Blosc codecs are readable by zarr
+    cname = "lz4" if rs.output_compression == "lz4" else "zstd"
+    return numcodecs.Blosc(cname=cname, clevel=3, shuffle=numcodecs.Blosc.SHUFFLE)
+
+
+def _get_file_dimensions(state, extra_dimensions=None):
+    dimensions = dict(state.dimensions)
+    if extra_dimensions is not None:
+        dimensions.update(extra_dimensions)
+
+    file_dimensions = {}
+
+    for dim in dimensions:
+        # time steps are peeled off explicitly
+        if dim in variables.TIMESTEPS:
+            continue
+
+        if dim in state.var_meta and not state.var_meta[dim].active:
+            continue
+
+        file_dimensions[dim] = variables.get_shape(dimensions, (dim,), include_ghosts=False, local=False)[0]
+
+    return dimensions, file_dimensions
+
+
+def initialize_variable(state, key, var, group, file_dimensions, chunks=None):
+    if var.dims is None:
+        dims = ()
+    else:
+        dims = tuple(d for d in var.dims if d in file_dimensions)
+
+    if var.time_dependent and "Time" in group:
+        dims += ("Time",)
+
+    if key in group:
+        return
+
+    if chunks is None:
+        chunks = {}
+
+    shape, chunksize = [], []
+    for d in dims:
+        if d == "Time":
+            shape.append(0)
+            chunksize.append(1)
+        elif d in state.dimensions:
+            shape.append(file_dimensions[d])
+            chunksize.append(variables.get_shape(state.dimensions, (d,), local=True, include_ghosts=False)[0])
+        else:
+            shape.append(file_dimensions[d])
+            chunksize.append(chunks.get(d, file_dimensions[d]))
+
+    dtype = var.dtype
+    if dtype is None:
+        dtype = rs.float_type
+    elif dtype == "bool":
+        dtype = "uint8"
+
+    fillvalue = variables.get_fill_value(dtype)
+
+    # transpose all dimensions in output (convention in most ocean models)
+    arr = group.create_dataset(
+        key,
+        shape=tuple(shape[::-1]),
+        chunks=tuple(chunksize[::-1]),
+        dtype=dtype,
+        fill_value=fillvalue,
+        compressor=_get_compressor(),
+    )
+    arr.attrs.update(
+        _ARRAY_DIMENSIONS=list(dims[::-1]),
+        missing_value=fillvalue,
+        long_name=var.name,
+        units=var.units,
+        **var.extra_attributes,
+    )
+
+
+def initialize_file(state, filepath, var_meta, extra_dimensions=None, coordinates=None, chunks=None):
+    """
+    Create a new store with standard grid and the given (empty) variables.
+
+    ``coordinates`` and ``chunks`` are handled as in :func:`veros.io_tools.netcdf.initialize_file`.
+    Must be called by all processes.
+    """
+    import zarr
+
+    close_output_file(filepath)
+
+    if coordinates is None:
+        coordinates = {}
+
+    dimensions, file_dimensions = _get_file_dimensions(state, extra_dimensions)
+
+    def get_dimension_variable(dim):
+        if dim in coordinates:
+            return coordinates[dim][0], None
+
+        if dim in state.var_meta:
+            return state.var_meta[dim], state.variables.get(dim)
+
+        # create dummy variable for dimensions without data
+        return variables.Variable(dim, (dim,), time_dependent=False), np.arange(dimensions[dim])
+
+    if runtime_state.proc_rank == 0:
+        group = zarr.open_group(filepath, mode="w")
+        group.attrs.update(nctools.get_global_attributes(state))
+
+        for dim in file_dimensions:
+            initialize_variable(state, dim, get_dimension_variable(dim)[0], group, file_dimensions, chunks=chunks)
+
+        time_var = group.create_dataset("Time", shape=(0,), chunks=(max(rs.io_time_chunk_size, 1),), dtype=float)
+        time_var.attrs.update(
+            _ARRAY_DIMENSIONS=["Time"],
+            long_name="Time",
+            units="days",
+            time_origin="01-JAN-1900 00:00:00",
+        )
+
+        for key, var in var_meta.items():
+            initialize_variable(state, key, var, group, file_dimensions, chunks=chunks)
+
+    # wait for metadata to be written
+    distributed.barrier()
+
+    with output_file(filepath) as store:
+        for dim in file_dimensions:
+            if dim in coordinates:
+                _, selection, var_data = coordinates[dim]
+                store_selection(dim, var_data, store, selection)
+            else:
+                write_variable(state, dim, *get_dimension_variable(dim), store)
+
+
+def store_variable(key, var_data, store, nx, ny, time_step=None):
+    """Write data returned by :func:`veros.io_tools.netcdf.prepare_variable_data` to the output store.
+
+    Every process only writes its own chunk.
+    """
+    arr, dims = store.get_array(key)
+
+    if not distributed.owns_tile(dims):
+        return
+
+    chunk, _ = distributed.get_chunk_slices(nx, ny, dims)
+
+    if "Time" in dims:
+        assert dims[0] == "Time"
+        chunk = (time_step,) + chunk[1:]
+
+    arr[chunk] = var_data
+
+
+def store_selection(key, var_data, store, selection, time_step=None):
+    """Write local data to the given selection of an array (excluding the Time axis).
+
+    Processes without data pass ``var_data=None``.
+    """
+    if var_data is None:
+        return
+
+    arr, dims = store.get_array(key)
+
+    if "Time" in dims:
+        assert dims[0] == "Time"
+        selection = (time_step, *selection)
+
+    arr[selection] = var_data
+
+
+def write_variable(state, key, var, var_data, store, time_step=None):
+    var_data = nctools.prepare_variable_data(state, var, var_data)
+    nx, ny = state.dimensions["xt"], state.dimensions["yt"]
+    store_variable(key, var_data, store, nx, ny, time_step=time_step)
+
+
+class OutputStore:
+    """Handle to a Zarr output store that records are appended to."""
+
+    def __init__(self, filepath, time_chunk_size=1):
+        import zarr
+
+        self.filepath = filepath
+        self.group = zarr.open_group(filepath, mode="r+")
+        self.time_chunk_size = time_chunk_size
+        self._arrays = {}
+
+        self.num_records = self.get_array("Time")[0].shape[0]
+
+    def get_array(self, key):
+        if key not in self._arrays:
+            arr = self.group[key]
+            self._arrays[key] = (arr, tuple(arr.attrs.get("_ARRAY_DIMENSIONS", ())))
+
+        return self._arrays[key]
+
+    def _resize_time(self, num_records):
+        # all processes do this, which results in identical metadata
+        for key in self.group.array_keys():
+            arr, dims = self.get_array(key)
+            if dims and dims[0] == "Time":
+                arr.resize((num_records, *arr.shape[1:]))
+
+    def advance_time(self, time_value):
+        time_step = self.num_records
+        time_var, _ = self.get_array("Time")
+
+        if time_step >= time_var.shape[0]:
+            self._resize_time(time_step + max(self.time_chunk_size, 1))
+
+        if runtime_state.proc_rank == 0:
+            time_var[time_step] = time_value
+
+        self.num_records += 1
+        return time_step
+
+    def write_record(self, time_value, data, nx, ny, selections=None):
+        """Append a record. Variables in ``selections`` are written to the given selection."""
+        time_step = self.advance_time(time_value)
+
+        for key, var_data in data.items():
+            if selections is not None and key in selections:
+                store_selection(key, var_data, self, selections[key], time_step=time_step)
+            else:
+                store_variable(key, var_data, self, nx, ny, time_step=time_step)
+
+    def close(self):
+        # remove records that were allocated in advance but never written
+        if self.get_array("Time")[0].shape[0] > self.num_records:
+            self._resize_time(self.num_records)
+
+
+_output_stores = {}
+
+
+@contextlib.contextmanager
+def output_file(filepath):
+    """Get an :class:`OutputStore` to append records to.
+
+    If the ``io_keep_files_open`` runtime setting is enabled, the store is kept open until
+    :func:`close_output_file` is called, and the Time axis is extended by ``io_time_chunk_size``
+    records at a time. Otherwise, the store is closed on exit.
+    """
+    if not rs.io_keep_files_open:
+        store = OutputStore(filepath)
+        # all processes must read the number of records before any of them extends the Time axis
+        distributed.barrier()
+
+        try:
+            yield store
+        finally:
+            store.close()
+
+        return
+
+    store = _output_stores.get(filepath)
+    if store is None:
+        store = _output_stores[filepath] = OutputStore(filepath, time_chunk_size=rs.io_time_chunk_size)
+
+    yield store
+
+
+def close_output_file(filepath):
+    """Close cached handle to the given store (if any)."""
+    store = _output_stores.pop(filepath, None)
+    if store is not None:
+        store.close()
+
+
+def close_output_files():
+    """Close all cached store handles."""
+    for filepath in list(_output_stores.keys()):
+        close_output_file(filepath)
@@ -1,14 +1,22 @@
 import os
 
+import numpy as np
+
 from veros import logger, runtime_settings, runtime_state
-from veros.io_tools import hdf5 as h5tools
+from veros.io_tools import hdf5 as h5tools, writer
 from veros.signals import do_not_disturb
-from veros.distributed import get_chunk_slices, exchange_overlap
+from veros.distributed import get_chunk_slices, get_halo_slices, barrier, global_min, global_max
 from veros.variables import get_shape
 
 
-def read_from_h5(dimensions, var_meta, infile, groupname, enable_cyclic_x):
-    from veros.core.operators import numpy as npx, update, at
+def read_from_h5(dimensions, var_meta, infile, groupname):
+    """Read restart data of the local process (including overlap cells) from the given group.
+
+    Since the global grid is stored, the restart does not need to be written with
+    the same processor layout. Halo cells are read from the neighboring domains, and at the
+    domain boundary from the stored global ghost cells, so no boundary exchange is needed.
+    """
+    from veros.core.operators import numpy as npx
 
     variables = {}
 
@@ -17,19 +25,63 @@ def read_from_h5(dimensions, var_meta, infile, groupname, enable_cyclic_x):
             variables[key] = npx.array(var)
             continue
 
+        global_shape = get_shape(dimensions, var_meta[key].dims, local=False, include_ghosts=True)
+        if var.shape != global_shape:
+            raise RuntimeError(
+                f"Restart data for variable {key} has shape {var.shape}, but expected {global_shape} "
+                "(restarts require the same global grid)"
+            )
+
         local_shape = get_shape(dimensions, var_meta[key].dims, local=True, include_ghosts=True)
-        gidx, lidx = get_chunk_slices(dimensions["xt"], dimensions["yt"], var_meta[key].dims, include_overlap=True)
+        gidx = get_halo_slices(dimensions["xt"], dimensions["yt"], var_meta[key].dims)
 
         # pass dtype as str to prevent endianness from leaking into array
-        variables[key] = npx.empty(local_shape, dtype=str(var.dtype))
-        variables[key] = update(variables[key], at[lidx], var[gidx])
-        variables[key] = exchange_overlap(variables[key], var_meta[key].dims, enable_cyclic_x)
+        local_data = np.empty(local_shape, dtype=str(var.dtype))
+        h5tools.read_collective(var, gidx, local_data)
+        variables[key] = npx.asarray(local_data)
 
     attributes = {key: var.item() for key, var in infile[groupname].attrs.items()}
 
     return attributes, variables
 
 
+def _get_compression_kwargs():
+    if not runtime_settings.hdf5_gzip_compression or runtime_state.proc_num > 1:
+        return {}
+
+    return h5tools.get_compression_kwargs(runtime_settings.restart_compression)
+
+
+def _format_filename(state, filename):
+    statedict = dict(state.variables.items())
+    statedict.update(state.settings.items())
+    return filename.format(**statedict)
+
+
+def _get_restart_groups(state):
+    """Yield group name, dimensions, and metadata of restart variables for core and all diagnostics"""
+    restart_vars = {var: meta for var, meta in state.var_meta.items() if meta.write_to_restart and meta.active}
+    yield "core", state.dimensions, restart_vars, state.variables
+
+    for diag_name, diagnostic in state.diagnostics.items():
+        if not diagnostic.var_meta:
+            # nothing to do
+            continue
+
+        dimensions = dict(state.dimensions)
+        if diagnostic.extra_dimensions:
+            dimensions.update(diagnostic.extra_dimensions)
+
+        restart_vars = {var: meta for var, meta in diagnostic.var_meta.items() if meta.write_to_restart and meta.active}
+        yield diag_name, dimensions, restart_vars, diagnostic.variables
+
+
+def _prepare_diagnostics(state):
+    # diagnostics may hold data that is not yet stored in their variables
+    for diagnostic in state.diagnostics.values():
+        diagnostic.prepare_restart(state)
+
+
 def write_to_h5(dimensions, var_meta, var_data, outfile, groupname, attributes=None):
     if attributes is None:
         attributes = {}
@@ -57,12 +109,13 @@ def write_to_h5(dimensions, var_meta, var_data, outfile, groupname, attributes=N
                     chunksize.append(1)
 
             kwargs.update(chunks=tuple(chunksize))
+            kwargs.update(_get_compression_kwargs())
 
-            if runtime_settings.hdf5_gzip_compression and runtime_state.proc_num == 1:
-                kwargs.update(compression="gzip", compression_opts=1)
+        dset = group.require_dataset(key, global_shape, var.dtype, **kwargs)
+        dset[gidx] = var[lidx]
 
-        group.require_dataset(key, global_shape, var.dtype, **kwargs)
-        group[key][gidx] = var[lidx]
+        # allows to re-chunk the file without knowledge of variable metadata
+        dset.attrs["dims"] = list(var_dims)
 
     for key, val in attributes.items():
         group.attrs[key] = val
@@ -77,54 +130,180 @@ def read_restart(state):
     if runtime_settings.force_overwrite:
         raise RuntimeError("To prevent data loss, force_overwrite cannot be used in restart runs")
 
-    statedict = dict(state.variables.items())
-    statedict.update(state.settings.items())
-    restart_filename = settings.restart_input_filename.format(**statedict)
+    restart_filename = _format_filename(state, settings.restart_input_filename)
+    restart_exists = os.path.isfile(restart_filename)
+
+    if os.path.isdir(restart_filename):
+        raise RuntimeError(
+            f"restart file {restart_filename} is a directory (e.g. a Zarr store), but restarts only support HDF5 files"
+        )
 
-    if not os.path.isfile(restart_filename):
+    h5tools.register_filters()
+
+    # use checkpoint instead of restart file if it is more recent
+    checkpoint_time = _get_checkpoint_time(state)
+    if checkpoint_time is not None and (not restart_exists or checkpoint_time > _get_restart_time(restart_filename)):
+        _read_checkpoint(state)
+        return state
+
+    if not restart_exists:
         raise IOError(f"restart file {restart_filename} not found")
 
     logger.info(f"Reading restart data from {restart_filename}")
 
-    with h5tools.threaded_io(restart_filename, "r") as infile, state.variables.unlock():
-        # core restart
-        restart_vars = {var: meta for var, meta in state.var_meta.items() if meta.write_to_restart and meta.active}
-        _, restart_data = read_from_h5(state.dimensions, restart_vars, infile, "core", settings.enable_cyclic_x)
+    with h5tools.threaded_io(restart_filename, "r") as infile:
+        static_filename = infile.attrs.get("static_restart_file")
+        restart_data = {
+            groupname: read_from_h5(dimensions, restart_vars, infile, groupname)[1]
+            for groupname, dimensions, restart_vars, _ in _get_restart_groups(state)
+        }
+
+    if static_filename is not None:
+        # path is stored relative to the restart file
+        static_filename = os.path.join(os.path.dirname(restart_filename), static_filename)
+        logger.info(f"Reading static restart data from {static_filename}")
+
+        with h5tools.threaded_io(static_filename, "r") as infile:
+            for groupname, dimensions, restart_vars, _ in _get_restart_groups(state):
+                if groupname in infile:
+                    _, static_data = read_from_h5(dimensions, restart_vars, infile, groupname)
+                    restart_data[groupname].update(static_data)
+
+    with state.variables.unlock():
+        for groupname, _, restart_vars, variables in _get_restart_groups(state):
+            for key in restart_vars.keys():
+                try:
+                    var_data = restart_data[groupname][key]
+                except KeyError:
+                    if groupname == "core":
+                        raise RuntimeError(f"No restart data found for variable {key} in {restart_filename}") from None
+
+                    raise RuntimeError(
+                        f'No restart data found for variable {key} in {restart_filename} (from diagnostic "{groupname}")'
+                    ) from None
+
+                setattr(variables, key, var_data)
+
+    return state
+
+
+def _get_restart_time(restart_filename):
+    with h5tools.threaded_io(restart_filename, "r") as infile:
+        return float(infile["core"]["time"][()])
+
+
+def _get_checkpoint_filename(state):
+    filename = _format_filename(state, state.settings.checkpoint_filename)
 
-        for key in restart_vars.keys():
-            try:
-                var_data = restart_data[key]
-            except KeyError:
-                raise RuntimeError(f"No restart data found for variable {key} in {restart_filename}") from None
+    if runtime_state.proc_num > 1:
+        # every process writes its own file
+        filename = f"{filename}.{runtime_state.proc_rank:04d}"
 
-            setattr(state.variables, key, var_data)
+    return filename
 
-        # diagnostic restarts
-        for diag_name, diagnostic in state.diagnostics.items():
-            if not diagnostic.var_meta:
-                # nothing to do
-                continue
 
-            dimensions = dict(state.dimensions)
-            if diagnostic.extra_dimensions:
-                dimensions.update(diagnostic.extra_dimensions)
+def _get_checkpoint_time(state):
+    """Model time of the checkpoint, or None if there is no valid checkpoint on all processes"""
+    from veros.core.operators import numpy as npx
 
-            restart_vars = {
-                var: meta for var, meta in diagnostic.var_meta.items() if meta.write_to_restart and meta.active
-            }
-            _, restart_data = read_from_h5(dimensions, restart_vars, infile, diag_name, settings.enable_cyclic_x)
+    if not state.settings.checkpoint_filename:
+        return None
 
+    import h5py
+
+    local_time = -np.inf
+
+    try:
+        with h5py.File(_get_checkpoint_filename(state), "r") as infile:
+            # checkpoints only hold the local data of each process
+            if tuple(infile.attrs["num_proc"]) == tuple(runtime_settings.num_proc):
+                local_time = float(infile.attrs["time"])
+    except (OSError, KeyError):
+        pass
+
+    min_time = float(global_min(npx.asarray(local_time)))
+    max_time = float(global_max(npx.asarray(local_time)))
+
+    if min_time == -np.inf or min_time != max_time:
+        return None
+
+    return min_time
+
+
+def _read_checkpoint(state):
+    import h5py
+    from veros.core.operators import numpy as npx
+
+    checkpoint_filename = _get_checkpoint_filename(state)
+    logger.info(f"Reading checkpoint data from {checkpoint_filename}")
+
+    with h5py.File(checkpoint_filename, "r") as infile, state.variables.unlock():
+        for groupname, _, restart_vars, variables in _get_restart_groups(state):
             for key in restart_vars.keys():
                 try:
-                    var_data = restart_data[key]
+                    var_data = infile[groupname][key][...]
                 except KeyError:
                     raise RuntimeError(
-                        f'No restart data found for variable {key} in {restart_filename} (from diagnostic "{diag_name}")'
+                        f'No checkpoint data found for variable {key} in {checkpoint_filename} (group "{groupname}")'
                     ) from None
 
-                setattr(diagnostic.variables, key, var_data)
+                setattr(variables, key, npx.asarray(var_data))
 
-    return state
+
+@do_not_disturb
+def write_checkpoint(state):
+    """Write local data of each process to a separate file (e.g. on node-local storage).
+
+    Checkpoints are cheap compared to restart files, but can only be read with the same
+    processor layout. :func:`read_restart` uses them if they are newer than the restart file.
+    """
+    vs = state.variables
+    settings = state.settings
+
+    if runtime_settings.diskless_mode:
+        return
+
+    if not settings.checkpoint_filename or not settings.checkpoint_frequency:
+        return
+
+    if not (vs.itt > 0 and vs.time % settings.checkpoint_frequency < settings.dt_tracer):
+        return
+
+    _prepare_diagnostics(state)
+    checkpoint_filename = _get_checkpoint_filename(state)
+
+    # checkpoints do not need MPI, so they can be written in the background on any number of processes
+    copy_data = writer.use_async_writer(collective=False)
+
+    checkpoint_data = {}
+    for groupname, _, restart_vars, variables in _get_restart_groups(state):
+        checkpoint_data[groupname] = {}
+
+        for var in restart_vars:
+            var_data = getattr(variables, var)
+            checkpoint_data[groupname][var] = np.array(var_data) if copy_data else var_data
+
+    attributes = dict(itt=int(vs.itt), time=float(vs.time), num_proc=runtime_settings.num_proc)
+
+    def write_job():
+        import h5py
+
+        logger.debug(f"Writing checkpoint {checkpoint_filename}")
+
+        tmp_filename = f"{checkpoint_filename}.tmp"
+
+        with h5py.File(tmp_filename, "w") as outfile:
+            outfile.attrs.update(attributes)
+
+            for groupname, group_data in checkpoint_data.items():
+                group = outfile.create_group(groupname)
+
+                for key, var_data in group_data.items():
+                    group.create_dataset(key, data=np.asarray(var_data))
+
+        os.replace(tmp_filename, checkpoint_filename)
+
+    writer.submit(write_job, collective=False)
 
 
 @do_not_disturb
@@ -145,31 +324,79 @@ def write_restart(state, force=False):
     if not write_now:
         return
 
-    statedict = dict(state.variables.items())
-    statedict.update(state.settings.items())
-    restart_filename = settings.restart_output_filename.format(**statedict)
-
-    logger.info(f"Writing restart file {restart_filename}")
-
-    with h5tools.threaded_io(restart_filename, "w") as outfile:
-        # core restart
-        vs = state.variables
-        restart_vars = {var: meta for var, meta in state.var_meta.items() if meta.write_to_restart and meta.active}
-        restart_data = {var: getattr(vs, var) for var in restart_vars}
-        write_to_h5(state.dimensions, restart_vars, restart_data, outfile, "core")
-
-        # diagnostic restarts
-        for diag_name, diagnostic in state.diagnostics.items():
-            if not diagnostic.var_meta:
-                # nothing to do
-                continue
-
-            dimensions = dict(state.dimensions)
-            if diagnostic.extra_dimensions:
-                dimensions.update(diagnostic.extra_dimensions)
-
-            restart_vars = {
-                var: meta for var, meta in diagnostic.var_meta.items() if meta.write_to_restart and meta.active
-            }
-            restart_data = {var: getattr(diagnostic.variables, var) for var in restart_vars}
-            write_to_h5(dimensions, restart_vars, restart_data, outfile, diag_name)
+    _prepare_diagnostics(state)
+    restart_filename = _format_filename(state, settings.restart_output_filename)
+
+    static_filename = None
+    if settings.restart_static_filename:
+        static_filename = _format_filename(state, settings.restart_static_filename)
+
+    def is_static(meta):
+        return static_filename is not None and not meta.time_dependent
+
+    # data is copied to the host if it is written in the background, since the state keeps changing
+    copy_data = writer.use_async_writer()
+
+    def snapshot(restart_vars, variables):
+        data = {}
+
+        for var in restart_vars:
+            var_data = getattr(variables, var)
+            data[var] = np.array(var_data) if copy_data else var_data
+
+        return data
+
+    static_groups, dynamic_groups = [], []
+    write_static = static_filename is not None and static_filename not in state.static_restart_files
+
+    for groupname, dimensions, restart_vars, variables in _get_restart_groups(state):
+        dimensions = dict(dimensions)
+
+        static_vars = {var: meta for var, meta in restart_vars.items() if is_static(meta)}
+        if write_static and static_vars:
+            static_groups.append((groupname, dimensions, static_vars, snapshot(static_vars, variables)))
+
+        dynamic_vars = {var: meta for var, meta in restart_vars.items() if not is_static(meta)}
+        dynamic_groups.append((groupname, dimensions, dynamic_vars, snapshot(dynamic_vars, variables)))
+
+    file_attributes = {}
+    if static_filename is not None:
+        file_attributes.update(
+            static_restart_file=os.path.relpath(static_filename, os.path.dirname(os.path.abspath(restart_filename)))
+        )
+
+    def write_job():
+        if write_static:
+            logger.info(f"Writing static restart file {static_filename}")
+            _write_restart_file(static_filename, static_groups)
+
+        logger.info(f"Writing restart file {restart_filename}")
+        _write_restart_file(restart_filename, dynamic_groups, file_attributes)
+
+    if write_static:
+        state.static_restart_files.add(static_filename)
+
+    writer.submit(write_job)
+
+    if force:
+        # make sure the final restart is on disk before returning
+        writer.wait()
+
+
+def _write_restart_file(filename, groups, attributes=None):
+    """Write restart data to a temporary file first and move it into place when done,
+    so there is never an incomplete file with the target name.
+    """
+    tmp_filename = f"{filename}.tmp"
+
+    with h5tools.threaded_io(tmp_filename, "w") as outfile:
+        if attributes:
+            outfile.attrs.update(attributes)
+
+        for groupname, dimensions, restart_vars, restart_data in groups:
+            write_to_h5(dimensions, restart_vars, restart_data, outfile, groupname)
+
+    if runtime_state.proc_rank == 0:
+        os.replace(tmp_filename, filename)
+
+    barrier()
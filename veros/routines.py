@@ -48,6 +48,7 @@ CURRENT_CONTEXT = threading.local()
 CURRENT_CONTEXT.is_dist_safe = True
 CURRENT_CONTEXT.routine_stack = RoutineStack()
 CURRENT_CONTEXT.mpi4jax_token = None
+CURRENT_CONTEXT.is_tiled = False
 
 
 @contextmanager
@@ -236,7 +237,7 @@ class VerosRoutine:
 # kernel
 
 
-def veros_kernel(function=None, *, static_args=()):
+def veros_kernel(function=None, *, static_args=(), tile_halo=None):
     """Decorator that marks a function as a kernel that can be JIT compiled if supported
     by the backend.
 
@@ -246,6 +247,10 @@ def veros_kernel(function=None, *, static_args=()):
     Parameters:
         static_args (Tuple[str]): Names of kernel arguments that should be static.
 
+        tile_halo (int): If given, the kernel may be executed tile by tile on the NumPy backend
+            (see the ``tile_shape`` runtime setting). All outputs must only depend on inputs within
+            ``tile_halo`` grid cells, and grid data must only be passed through the state object.
+
     Example:
         >>> from veros import veros_kernel, KernelOutput
         >>>
@@ -258,7 +263,7 @@ def veros_kernel(function=None, *, static_args=()):
     """
 
     def inner_decorator(function):
-        kernel = VerosKernel(function, static_args=static_args)
+        kernel = VerosKernel(function, static_args=static_args, tile_halo=tile_halo)
         kernel = functools.wraps(function)(kernel)
         return kernel
 
@@ -271,7 +276,7 @@ def veros_kernel(function=None, *, static_args=()):
 class VerosKernel:
     """Do not instantiate directly!"""
 
-    def __init__(self, function, static_args=()):
+    def __init__(self, function, static_args=(), tile_halo=None):
         """Do some parameter introspection."""
 
         # make sure function signature is in the form we need
@@ -303,6 +308,7 @@ class VerosKernel:
             self.static_argnums.append(arg_index)
 
         self.function = function
+        self.tile_halo = tile_halo
 
     def __call__(self, *args, **kwargs):
         from veros import runtime_settings, runtime_state
@@ -342,7 +348,7 @@ class VerosKernel:
         bound_args.apply_defaults()
 
         veros_state = None
-        for argval in bound_args.arguments.values():
+        for state_argnum, argval in enumerate(bound_args.arguments.values()):
             if isinstance(argval, VerosState):
                 veros_state = argval
                 break
@@ -358,6 +364,14 @@ class VerosKernel:
         else:
             timer = None
 
+        if called_with_state and self.tile_halo is not None:
+            from veros import tiling
+
+            if tiling.use_tiling(veros_state):
+                args = list(bound_args.arguments.values())
+                with enter_routine(self.name, self, timer):
+                    return tiling.run_tiled(self, args, state_argnum=state_argnum, halo=self.tile_halo)
+
         with ExitStack() as es:
             if called_with_state:
                 es.enter_context(veros_state.variables.unlock())
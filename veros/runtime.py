@@ -31,6 +31,23 @@ def parse_two_ints(v):
     return (int(v[0]), int(v[1]))
 
 
+def parse_tile_shape(v):
+    if v is None:
+        return None
+
+    if isinstance(v, str):
+        if not v:
+            return None
+        v = v.split(",")
+
+    tile_shape = parse_two_ints(v)
+
+    if any(t < 0 for t in tile_shape):
+        raise ValueError("tile sizes must be non-negative")
+
+    return tile_shape
+
+
 def parse_choice(choices, preserve_case=False):
     def validate(choice):
         if isinstance(choice, str) and not preserve_case:
@@ -80,6 +97,7 @@ def set_log_all_processes(val):
 DEVICES = ("cpu", "gpu", "tpu")
 FLOAT_TYPES = ("float64", "float32")
 LINEAR_SOLVERS = ("scipy", "scipy_jax", "petsc", "best")
+COMPRESSION_METHODS = ("gzip", "zstd", "lz4")
 
 
 # settings
@@ -101,12 +119,24 @@ AVAILABLE_SETTINGS = {
     "log_all_processes": RuntimeSetting(set_log_all_processes, False),
     "use_io_threads": RuntimeSetting(parse_bool, False),
     "io_timeout": RuntimeSetting(float, 20),
+    "io_queue_size": RuntimeSetting(int, 8),
+    "io_keep_files_open": RuntimeSetting(parse_bool, False),
+    "io_time_chunk_size": RuntimeSetting(int, 16),
+    "io_flush_interval": RuntimeSetting(int, 10),
+    "io_aggregators": RuntimeSetting(int, 0),
     "hdf5_gzip_compression": RuntimeSetting(parse_bool, True),
+    "restart_compression": RuntimeSetting(parse_choice(COMPRESSION_METHODS), "gzip"),
+    "output_compression": RuntimeSetting(parse_choice(COMPRESSION_METHODS), "gzip"),
     "force_overwrite": RuntimeSetting(parse_bool, False),
     "diskless_mode": RuntimeSetting(parse_bool, False),
     "pyom_compatibility_mode": RuntimeSetting(parse_bool, False),
     "setup_file": RuntimeSetting(str, None, read_from_env=False),
     "use_special_tdma": RuntimeSetting(parse_bool, None),
+    "tile_shape": RuntimeSetting(parse_tile_shape, None),
+    "tile_threads": RuntimeSetting(int, 1),
+    "mpi_shared_memory": RuntimeSetting(parse_bool, False),
+    "hierarchical_reductions": RuntimeSetting(parse_bool, False),
+    "validate_assignments": RuntimeSetting(parse_bool, True),
 }
 
 
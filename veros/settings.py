@@ -127,6 +127,15 @@ SETTINGS = {
     "enable_eke_superbee_advection": Setting(False, bool, ""),
     "enable_eke_upwind_advection": Setting(False, bool, ""),
     "enable_eke_isopycnal_diffusion": Setting(False, bool, "use K_gm also for isopycnal diffusivity"),
+    # Sanity checks
+    "sanity_check_frequency": Setting(
+        1, int, "Check for diverged solutions every N iterations (0 disables sanity checks)"
+    ),
+    "enable_deferred_sanity_check": Setting(
+        False,
+        bool,
+        "Evaluate sanity checks asynchronously and raise one iteration later (avoids a synchronization every step)",
+    ),
     # Restarts
     "restart_input_filename": Setting(
         None, optional(str), "File name of restart input. If not given, no restart data will be read."
@@ -137,6 +146,20 @@ SETTINGS = {
         "File name of restart output. May contain Python format syntax that is substituted with Veros attributes.",
     ),
     "restart_frequency": Setting(0, float, "Frequency (in seconds) to write restart data"),
+    "checkpoint_filename": Setting(
+        None,
+        optional(str),
+        "File name of checkpoints, which hold the local data of each process and are written more frequently "
+        "than restart files (e.g. to node-local storage). The newest valid checkpoint is used when restarting. "
+        "May contain Python format syntax, but should not depend on the current iteration.",
+    ),
+    "checkpoint_frequency": Setting(0, float, "Frequency (in seconds) to write checkpoints"),
+    "restart_static_filename": Setting(
+        None,
+        optional(str),
+        "File name for restart data that does not change during the run (not time dependent). "
+        "If given, it is written once and referenced by all restart files instead of being stored in each of them.",
+    ),
     # New
     "kappaH_min": Setting(0.0, float, "minimum value for vertical diffusivity"),
     "enable_kappaH_profile": Setting(
@@ -154,3 +177,11 @@ def check_setting_conflicts(settings):
         raise RuntimeError(
             "use TKE model only with implicit vertical friction (set enable_implicit_vert_fricton to True)"
         )
+
+    for setting in ("restart_input_filename", "restart_output_filename", "restart_static_filename"):
+        filename = getattr(settings, setting)
+        if filename and filename.rstrip("/").endswith(".zarr"):
+            raise RuntimeError(
+                f"{setting} points to a Zarr store, but restarts only support HDF5 files "
+                "(Zarr is only available for diagnostic output)"
+            )
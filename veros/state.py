@@ -164,6 +164,8 @@ class StaticDictProxy(Mapping):
 class VerosSettings(Lockable, StrictContainer):
     def __init__(self, settings_meta):
         self.__metadata__ = settings_meta
+        #: number of modifications, used to invalidate values derived from settings
+        self.__modifications__ = 0
         super().__init__(fields=settings_meta.keys())
 
         default_settings = {k: meta.type(meta.default) for k, meta in settings_meta.items()}
@@ -177,7 +179,8 @@ class VerosSettings(Lockable, StrictContainer):
 
         meta = self.__metadata__[key]
         val = meta.type(val)
-        return super().__setattr__(key, val)
+        super().__setattr__(key, val)
+        self.__modifications__ += 1
 
 
 class VerosVariables(Lockable, StrictContainer):
@@ -186,6 +189,7 @@ class VerosVariables(Lockable, StrictContainer):
     def __init__(self, var_meta, dimensions):
         self.__metadata__ = var_meta
         self.__dimensions__ = dimensions
+        self.__validation_tables__ = {}
 
         active_vars = [key for key, val in var_meta.items() if val.active]
         super().__init__(fields=active_vars)
@@ -217,33 +221,59 @@ class VerosVariables(Lockable, StrictContainer):
         return orig_getattr(attr)
 
     def __setattr__(self, key, val):
-        if key.startswith("_") or key not in self.__metadata__:
+        if key.startswith("_"):
             return super().__setattr__(key, val)
 
-        var = self.__metadata__[key]
+        try:
+            expected_shape, expected_dtype = self._get_validation_table()[key]
+        except KeyError:
+            if key in self.__metadata__:
+                raise RuntimeError(
+                    f"Variable {key} is not active in this configuration. Check your settings and try again."
+                ) from None
 
-        # check whether variable is active
-        if not var.active:
-            raise RuntimeError(
-                f"Variable {key} is not active in this configuration. Check your settings and try again."
-            )
+            return super().__setattr__(key, val)
 
-        # validate array type, shape and dtype
-        if var.dtype is not None:
-            expected_dtype = var.dtype
-        else:
-            expected_dtype = rs.float_type
+        if not rs.validate_assignments and hasattr(val, "shape") and hasattr(val, "dtype"):
+            # trusted mode, store arrays as they are
+            return super().__setattr__(key, val)
 
+        # validate array type, shape and dtype
         val = rst.backend_module.asarray(val, dtype=expected_dtype)
 
-        expected_shape = self._get_expected_shape(var.dims)
         if val.shape != expected_shape:
             raise ValueError(f"Got unexpected shape for variable {key} (expected: {expected_shape}, got: {val.shape})")
 
         return super().__setattr__(key, val)
 
-    def _get_expected_shape(self, dims):
-        return var_mod.get_shape(self.__dimensions__, dims)
+    def _get_validation_table(self):
+        """Expected shape and dtype of all active variables.
+
+        Shapes depend on whether we are inside a distributed context, so one table is kept
+        for each case. Tables are re-computed after a change of dimensions.
+        """
+        from veros.routines import CURRENT_CONTEXT
+
+        is_local = self._has_local_shape()
+        table_key = (is_local, CURRENT_CONTEXT.is_dist_safe)
+
+        try:
+            return self.__validation_tables__[table_key]
+        except KeyError:
+            pass
+
+        table = {}
+        for key in self.__fields__:
+            var = self.__metadata__[key]
+            expected_dtype = var.dtype if var.dtype is not None else rs.float_type
+            expected_shape = var_mod.get_shape(self.__dimensions__, var.dims, local=is_local)
+            table[key] = (expected_shape, expected_dtype)
+
+        self.__validation_tables__[table_key] = table
+        return table
+
+    def _has_local_shape(self):
+        return True
 
 
 class DistSafeVariableWrapper(VerosVariables):
@@ -310,8 +340,9 @@ class DistSafeVariableWrapper(VerosVariables):
             scattered_var = scatter(getattr(self, var), self.__dimensions__, self.__metadata__[var].dims)
             setattr(self.__parent_state__, var, scattered_var)
 
-    def _get_expected_shape(self, dims):
-        return var_mod.get_shape(self.__dimensions__, dims, local=rst.proc_rank != 0)
+    def _has_local_shape(self):
+        # gathered arrays are global on root
+        return rst.proc_rank != 0
 
     def __repr__(self):
         return f"{self.__class__.__qualname__}(parent_state={self.__parent_state__}, local_variables={self.__local_variables__})"
@@ -326,6 +357,7 @@ class VerosState:
 
         self._settings = VerosSettings(setting_meta)
         self._dimensions = dimensions
+        self._dimension_cache = None
 
         if diagnostics is not None:
             self._diagnostics = diagnostics
@@ -341,6 +373,9 @@ class VerosState:
         self.timers = defaultdict(timer_factory)
         self.profile_timers = defaultdict(timer_factory)
 
+        # static restart files that have already been written during this run
+        self.static_restart_files = set()
+
     def __repr__(self):
         from textwrap import indent
 
@@ -391,8 +426,14 @@ class VerosState:
 
     @property
     def dimensions(self):
-        concrete_dimensions = self._manifest_dimensions()
-        return StaticDictProxy(concrete_dimensions, self._dimensions)
+        # concrete dimensions only change with settings (or through resize_dimension)
+        settings_modifications = self._settings.__modifications__
+
+        if self._dimension_cache is None or self._dimension_cache[0] != settings_modifications:
+            concrete_dimensions = self._manifest_dimensions()
+            self._dimension_cache = (settings_modifications, StaticDictProxy(concrete_dimensions, self._dimensions))
+
+        return self._dimension_cache[1]
 
     @property
     def diagnostics(self):
@@ -492,6 +533,7 @@ def veros_variables_pytree_flatten(variables):
         "__metadata__",
         "__fields__",
         "__locked__",
+        "__validation_tables__",
     )
     leaves = list(variables.values())
     aux_data = (tuple(variables.fields()), tuple((attr, getattr(variables, attr)) for attr in aux_attrs))
@@ -520,6 +562,7 @@ def dist_safe_wrapper_pytree_flatten(variables):
         "__metadata__",
         "__fields__",
         "__locked__",
+        "__validation_tables__",
         "__local_variables__",
         "__parent_state__",
     )
@@ -552,7 +595,9 @@ def resize_dimension(state, dimension, new_size):
     This re-allocates all variables using the dimension to 0.
     """
     state._dimensions[dimension] = new_size
+    state._dimension_cache = None
     state.variables.__dimensions__[dimension] = new_size
+    state.variables.__validation_tables__.clear()
 
     with state.variables.unlock():
         for var in state.variables.fields():
@@ -0,0 +1,294 @@
+"""Tiled execution of kernels on the NumPy backend.
+
+Kernels that are marked as tileable (via ``@veros_kernel(tile_halo=...)``) are evaluated
+on horizontal tiles of the local domain instead of the full arrays. This keeps intermediate
+arrays small enough to stay in cache. Every tile carries a halo of ``tile_halo`` cells on
+each side (at least the 2 ghost cells that ``exchange_overlap`` uses), which is discarded
+when the results are stitched back together.
+
+If the ``tile_threads`` runtime setting is larger than 1, tiles are processed concurrently
+on a thread pool (NumPy releases the GIL inside ufuncs).
+"""
+
+import copy
+import threading
+from collections import defaultdict
+
+from veros import runtime_settings as rs, runtime_state as rst
+from veros.routines import CURRENT_CONTEXT
+from veros.distributed import SCATTERED_DIMENSIONS, get_chunk_bounds
+
+GHOST_WIDTH = 2
+
+
+def _split_axis(n, tile_size, halo):
+    """Split an axis of n interior cells (plus ghosts) into tiles.
+
+    Returns tuples of (tile_slice, owned_slice_global, owned_slice_local).
+    Owned regions partition the full axis including ghost cells (like process domains,
+    see :func:`veros.distributed.get_chunk_bounds`).
+    """
+    total = n + 2 * GHOST_WIDTH
+
+    if tile_size <= 0 or tile_size >= n:
+        return [(slice(0, total), slice(0, total), slice(0, total))]
+
+    num_tiles = -(-n // tile_size)
+    tiles = []
+
+    for i in range(num_tiles):
+        lower, upper = get_chunk_bounds(i, num_tiles, tile_size, n, include_overlap=True)
+        owned_start, owned_end = i * tile_size + lower, i * tile_size + upper
+
+        tile_start = max(0, owned_start - halo)
+        tile_end = min(total, owned_end + halo)
+
+        tiles.append(
+            (
+                slice(tile_start, tile_end),
+                slice(owned_start, owned_end),
+                slice(owned_start - tile_start, owned_end - tile_start),
+            )
+        )
+
+    return tiles
+
+
+def get_tile_slices(nx, ny, tile_shape, halo=GHOST_WIDTH, enable_cyclic_x=False):
+    """Compute tiles for a local domain of nx * ny interior cells.
+
+    Returns a list of ``(tile_idx, owned_global_idx, owned_local_idx)`` tuples, each being
+    a pair of slices for the x and y dimensions. Indices refer to arrays *including* ghost cells.
+
+    With cyclic boundaries, tiles always span the whole x-axis, so that boundary enforcement
+    inside kernels sees the full periodic domain.
+    """
+    if halo < GHOST_WIDTH:
+        raise ValueError(f"tile halo must be at least {GHOST_WIDTH} cells wide")
+
+    tx, ty = tile_shape
+
+    if enable_cyclic_x:
+        tx = 0
+
+    x_tiles = _split_axis(nx, tx, halo)
+    y_tiles = _split_axis(ny, ty, halo)
+
+    out = []
+    for tile_y, owned_gy, owned_ly in y_tiles:
+        for tile_x, owned_gx, owned_lx in x_tiles:
+            out.append(((tile_x, tile_y), (owned_gx, owned_gy), (owned_lx, owned_ly)))
+
+    return out
+
+
+def get_default_tile_shape(nx, ny, num_threads):
+    """Split the domain along y into one chunk per thread (like ``get_chunk_size``)."""
+    return (0, -(-ny // num_threads))
+
+
+def _grid_index(grid, idx):
+    """Build an index that applies (x, y) slices to an array with the given grid."""
+    return tuple(
+        idx[0] if dim in SCATTERED_DIMENSIONS[0] else idx[1] if dim in SCATTERED_DIMENSIONS[1] else slice(None)
+        for dim in grid
+    )
+
+
+def _slice_along_grid(arr, grid, idx):
+    if not grid:
+        return arr
+
+    return arr[_grid_index(grid, idx)]
+
+
+def _make_tile_state(state, tile_idx):
+    from veros.state import VerosVariables
+    from veros.timer import Timer
+
+    nxt = tile_idx[0].stop - tile_idx[0].start - 2 * GHOST_WIDTH
+    nyt = tile_idx[1].stop - tile_idx[1].start - 2 * GHOST_WIDTH
+
+    tile_dims = dict(state._dimensions)
+    for dim in SCATTERED_DIMENSIONS[0]:
+        tile_dims[dim] = nxt
+    for dim in SCATTERED_DIMENSIONS[1]:
+        tile_dims[dim] = nyt
+
+    tile_state = copy.copy(state)
+    tile_state._dimensions = tile_dims
+    tile_state._dimension_cache = None
+
+    # tiles may run concurrently, so they must not share timers
+    # (the tiled kernel call as a whole is timed by the caller)
+    tile_state.profile_timers = defaultdict(Timer)
+
+    parent_vars = state.variables
+    var_meta = parent_vars.__metadata__
+
+    # by-pass __init__ and set attributes manually (like the pytree unflatten)
+    tile_vars = VerosVariables.__new__(VerosVariables)
+    tile_vars.__metadata__ = var_meta
+    tile_vars.__dimensions__ = tile_state._manifest_dimensions()
+    tile_vars.__fields__ = parent_vars.__fields__
+    tile_vars.__field_types__ = {}
+    tile_vars.__validation_tables__ = {}
+    tile_vars.__locked__ = True
+
+    with tile_vars.unlock():
+        for key, val in parent_vars.items():
+            # slices are consistent by construction, so skip validation in VerosVariables.__setattr__
+            super(VerosVariables, tile_vars).__setattr__(key, _slice_along_grid(val, var_meta[key].dims, tile_idx))
+
+    tile_state._variables = tile_vars
+    return tile_state
+
+
+def _get_output_grid(name, val, var_meta):
+    if name is not None and name in var_meta and var_meta[name].dims is not None:
+        return var_meta[name].dims
+
+    if getattr(val, "ndim", 0) < 2:
+        raise ValueError(f"Kernel output {name or ''} has no horizontal dimensions and cannot be tiled")
+
+    # all grid arrays are laid out as (x, y, ...)
+    return ("xt", "yt") + (None,) * (val.ndim - 2)
+
+
+def _stitch(tile_outputs, tiles, full_shape, var_meta, name=None):
+    import numpy as np
+
+    first = tile_outputs[0]
+
+    if hasattr(first, "_fields"):
+        # KernelOutput
+        stitched = [
+            _stitch([out[i] for out in tile_outputs], tiles, full_shape, var_meta, name=field)
+            for i, field in enumerate(first._fields)
+        ]
+        return type(first)(*stitched)
+
+    if isinstance(first, (tuple, list)):
+        return type(first)(
+            _stitch([out[i] for out in tile_outputs], tiles, full_shape, var_meta) for i in range(len(first))
+        )
+
+    grid = _get_output_grid(name, first, var_meta)
+
+    out_shape = []
+    for dim, size in zip(grid, first.shape):
+        if dim in SCATTERED_DIMENSIONS[0]:
+            out_shape.append(full_shape[0])
+        elif dim in SCATTERED_DIMENSIONS[1]:
+            out_shape.append(full_shape[1])
+        else:
+            out_shape.append(size)
+
+    out = np.empty(out_shape, dtype=first.dtype)
+
+    for tile_out, (_, owned_global, owned_local) in zip(tile_outputs, tiles):
+        out[_grid_index(grid, owned_global)] = tile_out[_grid_index(grid, owned_local)]
+
+    return out
+
+
+def use_tiling(state):
+    """Check whether tiled execution is enabled and possible for the given state."""
+    from veros.state import VerosState, VerosVariables
+
+    if rs.backend != "numpy":
+        return False
+
+    if rs.tile_shape is None and rs.tile_threads <= 1:
+        return False
+
+    # kernels may exchange overlap internally, which is not possible on tiles
+    if rst.proc_num > 1:
+        return False
+
+    if getattr(CURRENT_CONTEXT, "is_tiled", False):
+        return False
+
+    if not isinstance(state, VerosState) or type(state._variables) is not VerosVariables:
+        return False
+
+    return True
+
+
+_executor = None
+_executor_threads = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker_context():
+    from veros.routines import RoutineStack
+    from veros.timer import timer_context
+
+    # thread-local context is not inherited by worker threads
+    CURRENT_CONTEXT.is_dist_safe = True
+    CURRENT_CONTEXT.routine_stack = RoutineStack()
+    CURRENT_CONTEXT.mpi4jax_token = None
+    CURRENT_CONTEXT.is_tiled = True
+    timer_context.active = True
+
+
+def get_executor(num_threads):
+    """Return the shared thread pool used to run tiles, (re-)creating it if necessary."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    global _executor, _executor_threads
+
+    with _executor_lock:
+        if _executor is None or _executor_threads != num_threads:
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+
+            _executor = ThreadPoolExecutor(
+                max_workers=num_threads, thread_name_prefix="veros-tile", initializer=_init_worker_context
+            )
+            _executor_threads = num_threads
+
+    return _executor
+
+
+def run_tiled(kernel, args, state_argnum, halo=GHOST_WIDTH):
+    """Execute kernel(*args) tile by tile and stitch the results together.
+
+    The kernel must only access grid data through the Veros state object at position
+    ``state_argnum``, and every returned array must only depend on inputs within
+    ``halo`` cells.
+    """
+    state = args[state_argnum]
+    dimensions = state.dimensions
+    nx, ny = dimensions["xt"], dimensions["yt"]
+
+    num_threads = max(rs.tile_threads, 1)
+
+    tile_shape = rs.tile_shape
+    if tile_shape is None:
+        tile_shape = get_default_tile_shape(nx, ny, num_threads)
+
+    tiles = get_tile_slices(nx, ny, tile_shape, halo=halo, enable_cyclic_x=state.settings.enable_cyclic_x)
+
+    def run_tile(tile_idx):
+        tile_args = list(args)
+        tile_args[state_argnum] = _make_tile_state(state, tile_idx)
+        return kernel(*tile_args)
+
+    tile_indices = [tile_idx for tile_idx, _, _ in tiles]
+
+    if num_threads > 1 and len(tiles) > 1:
+        tile_outputs = list(get_executor(num_threads).map(run_tile, tile_indices))
+    else:
+        CURRENT_CONTEXT.is_tiled = True
+        try:
+            if len(tiles) == 1:
+                # kernel must not be tiled again
+                return kernel(*args)
+
+            tile_outputs = [run_tile(tile_idx) for tile_idx in tile_indices]
+        finally:
+            CURRENT_CONTEXT.is_tiled = False
+
+    full_shape = (nx + 2 * GHOST_WIDTH, ny + 2 * GHOST_WIDTH)
+    return _stitch(tile_outputs, tiles, full_shape, state.var_meta)
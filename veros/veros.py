@@ -41,6 +41,7 @@ class VerosSetup(metaclass=abc.ABCMeta):
 
         self._plugin_interfaces = tuple(load_plugin(p) for p in self.__veros_plugins__)
         self._setup_done = False
+        self._pending_sanity_check = None
 
         self.state = get_default_state(plugin_interfaces=self._plugin_interfaces)
 
@@ -238,7 +239,7 @@ class VerosSetup(metaclass=abc.ABCMeta):
     @veros_routine
     def step(self, state):
         from veros import diagnostics, restart
-        from veros.core import idemix, eke, tke, momentum, thermodynamics, advection, utilities, isoneutral, numerics
+        from veros.core import idemix, eke, tke, momentum, thermodynamics, advection, utilities
 
         self._ensure_setup_done()
 
@@ -247,6 +248,7 @@ class VerosSetup(metaclass=abc.ABCMeta):
 
         with state.timers["diagnostics"]:
             restart.write_restart(state)
+            restart.write_checkpoint(state)
 
         with state.timers["main"]:
             with state.timers["forcing"]:
@@ -308,12 +310,9 @@ class VerosSetup(metaclass=abc.ABCMeta):
         self.after_timestep(state)
 
         with state.timers["diagnostics"]:
-            if not numerics.sanity_check(state):
-                raise RuntimeError(f"solution diverged at iteration {vs.itt}")
+            self._sanity_check(state)
 
-            isoneutral.isoneutral_diag_streamfunction(state)
-            diagnostics.diagnose(state)
-            diagnostics.output(state)
+            diagnostics.step(state)
 
         # NOTE: benchmarks parse this, do not change / remove
         logger.debug(" Time step took {:.2f}s", state.timers["main"].last_time)
@@ -321,6 +320,34 @@ class VerosSetup(metaclass=abc.ABCMeta):
         # permutate time indices
         vs.taum1, vs.tau, vs.taup1 = vs.tau, vs.taup1, vs.taum1
 
+    def _sanity_check(self, state):
+        from veros.core import numerics
+
+        vs = state.variables
+        settings = state.settings
+
+        # evaluate result of check started in previous iteration
+        self._finish_sanity_check()
+
+        if settings.sanity_check_frequency <= 0 or vs.itt % settings.sanity_check_frequency:
+            return
+
+        if settings.enable_deferred_sanity_check:
+            self._pending_sanity_check = (vs.itt, numerics.start_sanity_check(state))
+        elif not numerics.sanity_check(state):
+            raise RuntimeError(f"solution diverged at iteration {vs.itt}")
+
+    def _finish_sanity_check(self):
+        if self._pending_sanity_check is None:
+            return
+
+        itt, pending_check = self._pending_sanity_check
+        self._pending_sanity_check = None
+
+        (is_sane,) = pending_check.wait()
+        if not is_sane:
+            raise RuntimeError(f"solution diverged at iteration {itt}")
+
     def run(self, show_progress_bar=None):
         """Main routine of the simulation.
 
@@ -332,7 +359,7 @@ class VerosSetup(metaclass=abc.ABCMeta):
                 By default, only show if stdout is a terminal and Veros is running on a single process.
 
         """
-        from veros import restart
+        from veros import restart, diagnostics
 
         self._ensure_setup_done()
 
@@ -359,6 +386,8 @@ class VerosSetup(metaclass=abc.ABCMeta):
 
                     pbar.advance_time(settings.dt_tracer)
 
+                self._finish_sanity_check()
+
         except:  # noqa: E722
             logger.critical(f"Stopping integration at iteration {vs.itt}")
             raise
@@ -368,6 +397,7 @@ class VerosSetup(metaclass=abc.ABCMeta):
 
         finally:
             restart.write_restart(self.state, force=True)
+            diagnostics.flush(self.state)
             self._timing_summary()
 
     def _timing_summary(self):